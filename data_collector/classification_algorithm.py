@@ -1,4 +1,191 @@
+import hashlib
+import logging
+import os
+import re
+import time
+
+import numpy as np
+
+from utils.units import Task
+from utils.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Labels a post can get; only USABLE posts stay eligible for selection
+USABLE = "usable"
+NSFW = "nsfw"
+OFF_TOPIC = "off_topic"
+
+# Seed examples whose embeddings are averaged into one centroid per label
+DEFAULT_LABEL_EXAMPLES = {
+    USABLE: [
+        "AITA for refusing to go to my sister's wedding after she insulted my partner at dinner?",
+        "My roommate kept eating my food, so I finally confronted him and it did not go well.",
+        "I found out my coworker had been taking credit for my work for two years.",
+        "TIFU by sending a message about my boss to my boss.",
+        "My parents want me to give up my college fund for my brother. Am I wrong to say no?",
+    ],
+    NSFW: [
+        "Explicit description of a sexual encounter with graphic detail.",
+        "NSFW adult content, nudity and explicit photos.",
+        "Graphic gore, a violent injury described in disturbing detail.",
+    ],
+    OFF_TOPIC: [
+        "Weekly discussion thread and reminder of the subreddit rules.",
+        "Moderator announcement: new flair system and posting guidelines.",
+        "Check out my YouTube channel, link in the comments, please subscribe.",
+        "[removed]",
+        "[deleted]",
+    ],
+}
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: hashed bag of words and word bigrams, L2-normalized.
+    Needs no network or model files, so classification can be exercised offline and reproducibly.
+    """
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9']+", text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket, sign = self._bucket(token)
+                vectors[row, bucket] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+class OpenAIEmbedder:
+    """Embeds through the OpenAI embeddings endpoint, many inputs per request."""
+    def __init__(self, model: str = "text-embedding-3-small", client=None):
+        if client is None:
+            from scripts.LLM import LLMClient
+            client = LLMClient()
+        self.client = client
+        self.model = model
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return np.asarray(self.client.generate_embeddings(texts, model=self.model), dtype=np.float32)
+
+
 class ClassificationAlgorithm:
-    """Classifies posts or videos based on collected data."""
-    def classify(self, task):
-        return task  # Logic to classify posts or videos 
\ No newline at end of file
+    """
+    Classifies posts by cosine similarity of their embeddings to labelled centroids.
+
+    Post embeddings are looked up in a persistent VectorStore keyed by PostId and only the missing
+    ones are embedded, in batches. Posts labelled anything but usable (or flagged over_18 by Reddit)
+    are made ineligible for selection. When embedding fails the posts are left unlabelled and eligible.
+    """
+    def __init__(self, embedder=None, store: VectorStore = None, store_dir: str = "data/embeddings",
+                 label_examples: dict[str, list[str]] = None, batch_size: int = 256, max_chars: int = 6000):
+        """
+        :param embedder: Object with a `model` name and `embed(texts) -> float32 matrix`; OpenAI when None.
+        :param store: Vector store for post and centroid embeddings; <store_dir>/<model> when None.
+        :param store_dir: Parent directory of the per-model vector stores.
+        :param label_examples: Example texts per label, averaged into the label centroids.
+        :param batch_size: Texts per embedding request.
+        :param max_chars: Post text is cut to this length before embedding.
+        """
+        self.embedder = embedder
+        self.store = store
+        self.store_dir = store_dir
+        self.label_examples = label_examples or DEFAULT_LABEL_EXAMPLES
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self._centroids = None
+
+    def _ensure_ready(self):
+        # Created on first use so constructing the pipeline needs no API key or disk access
+        if self.embedder is None:
+            self.embedder = OpenAIEmbedder()
+        if self.store is None:
+            self.store = VectorStore(os.path.join(self.store_dir, self.embedder.model), model=self.embedder.model)
+
+    def embed(self, ids: list[str], texts: list[str]) -> np.ndarray:
+        """Vectors for ids, embedding (in batches) and storing only those not stored yet."""
+        self._ensure_ready()
+        found, stored = self.store.get_many(ids)
+        found_rows = {vector_id: row for row, vector_id in enumerate(found)}
+        missing = [index for index, vector_id in enumerate(ids) if vector_id not in found_rows]
+        if missing:
+            start = time.perf_counter()
+            for offset in range(0, len(missing), self.batch_size):
+                batch = missing[offset:offset + self.batch_size]
+                vectors = self.embedder.embed([texts[index] for index in batch])
+                self.store.add([ids[index] for index in batch], vectors)
+            logger.info(
+                f"Embedded {len(missing)} texts in {-(-len(missing) // self.batch_size)} requests "
+                f"({time.perf_counter() - start:.2f}s), {len(found)} served from the vector store"
+            )
+            found, stored = self.store.get_many(ids)
+            found_rows = {vector_id: row for row, vector_id in enumerate(found)}
+        return stored[[found_rows[vector_id] for vector_id in ids]]
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    def centroids(self) -> tuple[list[str], np.ndarray]:
+        """Label names and their unit-length centroid vectors."""
+        if self._centroids is None:
+            labels = list(self.label_examples)
+            ids, texts, owners = [], [], []
+            for label, examples in self.label_examples.items():
+                for example in examples:
+                    ids.append("label:" + hashlib.sha256(example.encode("utf-8")).hexdigest())
+                    texts.append(example)
+                    owners.append(labels.index(label))
+            vectors = self._normalize(self.embed(ids, texts))
+            owners = np.asarray(owners)
+            centroids = np.stack([vectors[owners == index].mean(axis=0) for index in range(len(labels))])
+            self._centroids = (labels, self._normalize(centroids))
+        return self._centroids
+
+    def classify(self, task: Task):
+        reddit_datas = [reddit_data for reddit_data in task.reddit_datas.reddit_datas if len(reddit_data)]
+        if not reddit_datas:
+            return task
+
+        ids, texts = [], []
+        for reddit_data in reddit_datas:
+            columns = reddit_data.columns
+            ids.extend(columns.ids)
+            texts.extend(
+                f"{title or ''}\n\n{selftext or ''}"[:self.max_chars]
+                for title, selftext in zip(columns.strings["title"], columns.strings["selftext"])
+            )
+
+        try:
+            labels, centroids = self.centroids()
+            similarities = self._normalize(self.embed(ids, texts)) @ centroids.T
+        except Exception as e:
+            # Classification only narrows the pool, so a failed embedding request must not fail the task
+            logger.error(f"Could not classify {len(ids)} posts, leaving them eligible: {e}")
+            return task
+        best = similarities.argmax(axis=1)
+
+        offset = 0
+        counts = dict.fromkeys(labels, 0)
+        for reddit_data in reddit_datas:
+            columns = reddit_data.columns
+            rows = best[offset:offset + len(columns)]
+            offset += len(columns)
+            # Reddit's own NSFW flag always wins
+            post_labels = [NSFW if over_18 else labels[row] for row, over_18 in zip(rows, columns.column('over_18'))]
+            eligible = np.fromiter((label == USABLE for label in post_labels), dtype=np.bool_, count=len(post_labels))
+            reddit_data.set_labels(post_labels, eligible)
+            for label in post_labels:
+                counts[label] = counts.get(label, 0) + 1
+        logger.info(f"Classified {len(ids)} posts: {counts}")
+        return task
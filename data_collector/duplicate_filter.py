@@ -0,0 +1,78 @@
+import logging
+import time
+
+import numpy as np
+
+from utils.minhash_lsh import MinHashLSHIndex, estimate_jaccard
+from utils.units import Task
+
+logger = logging.getLogger(__name__)
+
+
+class NearDuplicateFilter:
+    """
+    Drops reposts and copy-pasted stories before selection.
+
+    A post is a near-duplicate when the estimated Jaccard similarity of its body to a stored post
+    (from the LSH index) or to a better-ranked post of the same task reaches task.near_duplicate_threshold.
+    Near-duplicates are marked ineligible, so PostSelector never picks them.
+    """
+    def __init__(self, index: MinHashLSHIndex):
+        """
+        :param index: LSH index of the bodies of stored posts.
+        """
+        self.index = index
+
+    def filter(self, task: Task) -> Task:
+        threshold = task.near_duplicate_threshold
+        if threshold is None:
+            return task
+        reddit_datas = [reddit_data for reddit_data in task.reddit_datas.reddit_datas if len(reddit_data)]
+        # Only posts that are still candidates for selection, best ranked first
+        rows = [
+            (reddit_data, row)
+            for reddit_data in reddit_datas
+            for row in np.flatnonzero(reddit_data.columns.eligible)
+        ]
+        if not rows:
+            return task
+        rows.sort(key=lambda item: item[0].columns.rank[item[1]] if item[0].columns.rank is not None else 0)
+
+        start = time.perf_counter()
+        post_ids = [reddit_data.columns.ids[row] for reddit_data, row in rows]
+        signatures, has_signature = self.index.hasher.signatures(
+            reddit_data.columns.strings["selftext"][row] for reddit_data, row in rows
+        )
+        matches = self.index.query(signatures, threshold, exclude_ids=post_ids)
+
+        # Posts of this task are not stored yet, so repeats among them are found with an in-memory bucket map
+        keys = self.index.bucket_keys(signatures)
+        buckets: dict[int, list[int]] = {}
+        duplicate_of = {}
+        for position, (post_id, match) in enumerate(zip(post_ids, matches)):
+            if not has_signature[position]:
+                continue
+            if match is None:
+                earlier = {other for key in keys[position] for other in buckets.get(int(key), ())}
+                if earlier:
+                    earlier = sorted(earlier)
+                    similarities = estimate_jaccard(signatures[position], signatures[earlier])
+                    best = int(similarities.argmax())
+                    if similarities[best] >= threshold:
+                        match = (post_ids[earlier[best]], float(similarities[best]))
+            if match is not None:
+                duplicate_of[post_id] = match[0]
+                logger.info(f"Post {post_id} repeats {match[0]} (estimated Jaccard {match[1]:.2f}), dropping it")
+                continue
+            for key in keys[position]:
+                buckets.setdefault(int(key), []).append(position)
+
+        for reddit_data in reddit_datas:
+            found = {post_id: original for post_id, original in duplicate_of.items() if post_id in reddit_data.columns.index}
+            if found:
+                reddit_data.mark_duplicates(found)
+        logger.info(
+            f"Checked {len(rows)} posts for near-duplicates in {(time.perf_counter() - start) * 1000:.1f}ms: "
+            f"{len(duplicate_of)} dropped"
+        )
+        return task
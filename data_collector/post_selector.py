@@ -1,14 +1,44 @@
 from abc import ABC, abstractmethod
-from utils.units import Task
+from itertools import islice
+from utils.units import Task, RedditData
 from utils.units import PostSelectionStrategyEnum
-import pandas as pd
-import uuid
+from utils.post_store import PostColumns
+import heapq
+import numpy as np
+
+
+def top_k_rows(keys: np.ndarray, k: int) -> np.ndarray:
+    """
+    Rows of the k largest keys, best first, in O(n + k log k).
+    Ties keep listing order, including at the cut-off; NaN keys rank last.
+    """
+    keys = np.nan_to_num(np.asarray(keys, dtype=np.float64), nan=-np.inf)
+    n = len(keys)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        kth = np.partition(keys, n - k)[n - k]
+        above = np.flatnonzero(keys > kth)
+        ties = np.flatnonzero(keys == kth)[:k - len(above)]
+        rows = np.concatenate([above, ties])
+    else:
+        rows = np.arange(n)
+    return rows[np.lexsort((rows, -keys[rows]))]
+
 
 class PostSelector:
     """Selects posts for further processing."""
+    def __init__(self, duplicate_filter=None):
+        """
+        :param duplicate_filter: Optional NearDuplicateFilter; near-duplicates it finds are never selected.
+        """
+        self.duplicate_filter = duplicate_filter
+
     def select(self, task: Task):
+        if self.duplicate_filter is not None:
+            task = self.duplicate_filter.filter(task)
         post_selection_strategy = PostSelectionStrategyFactory().get_strategy(task)
-        task = post_selection_strategy.select(task)  # Logic to select posts 
+        task = post_selection_strategy.select(task)  # Logic to select posts
         return task
 
 class PostSelectionStrategy(ABC):
@@ -17,34 +47,82 @@ class PostSelectionStrategy(ABC):
     def select(self, task: Task):
         return task
 
-class MostUpvotedPostStrategy(PostSelectionStrategy):
+
+class TopKPostStrategy(PostSelectionStrategy):
+    """
+    Selects the top k posts of every subreddit by a per-post key computed on the columns,
+    then optionally keeps only the best task.max_total_posts across subreddits.
+    k is task.posts_per_subreddit, overridden per subreddit by task.posts_per_subreddit_overrides.
+    """
+
+    @abstractmethod
+    def key(self, columns: PostColumns) -> np.ndarray:
+        """Ranking key per row; higher is better, NaN ranks last."""
+
+    def _candidates(self, reddit_data: RedditData, k: int) -> list[tuple[float, str]]:
+        columns = reddit_data.columns
+        keys = np.nan_to_num(self.key(columns), nan=-np.inf)
+        # Posts the classifier rejected are never candidates
+        rows = np.flatnonzero(columns.eligible)
+        return [(float(keys[row]), columns.ids[row]) for row in rows[top_k_rows(keys[rows], k)]]
+
     def select(self, task: Task):
+        candidates = {}
         for subreddit, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items():
-            pandas_data = reddit_data.to_pandas_dataframe(filter_out=False)
-            # TODO: these top_x values should come from config ans should be diff for each individual subreddit
-            top_10_posts = pandas_data.sort_values(by='ups', ascending=False).head(3)
-            top_10_post_id = list(top_10_posts['id'].values)
-            for post_id in top_10_post_id:
-                reddit_data.post_data_dict.get(post_id).filtered_out = False
-        return task
+            k = task.posts_per_subreddit_overrides.get(subreddit, task.posts_per_subreddit)
+            candidates[subreddit] = self._candidates(reddit_data, k)
 
+        if task.max_total_posts is not None:
+            # Per-subreddit lists are already sorted, so a k-way merge yields the global order lazily
+            merged = heapq.merge(
+                *[[(key, subreddit, post_id) for key, post_id in posts] for subreddit, posts in candidates.items()],
+                key=lambda candidate: -candidate[0]
+            )
+            selected = {}
+            for _, subreddit, post_id in islice(merged, task.max_total_posts):
+                selected.setdefault(subreddit, []).append(post_id)
+        else:
+            selected = {subreddit: [post_id for _, post_id in posts] for subreddit, posts in candidates.items()}
 
-class MostRecentPostStrategy(PostSelectionStrategy):
-    def select(self, task: Task):
+        for subreddit, post_ids in selected.items():
+            task.reddit_datas.get_reddit_data(subreddit).select_posts(post_ids)
         return task
 
 
-class MostControversialPostStrategy(PostSelectionStrategy):
-    def select(self, task: Task):
-        return task
+class MostUpvotedPostStrategy(TopKPostStrategy):
+    def key(self, columns: PostColumns) -> np.ndarray:
+        keys = columns.column('ups').astype(np.float64)
+        if 'ups' in columns.missing:
+            keys[columns.missing['ups']] = np.nan
+        return keys
+
+
+class MostRecentPostStrategy(TopKPostStrategy):
+    def key(self, columns: PostColumns) -> np.ndarray:
+        return columns.column('created_utc')
+
+
+class MostControversialPostStrategy(TopKPostStrategy):
+    """Lots of votes and comments with a low upvote ratio: (ups + 1) * (num_comments + 1) / upvote_ratio."""
+    MIN_UPVOTE_RATIO = 0.05
+
+    def key(self, columns: PostColumns) -> np.ndarray:
+        ups = columns.column('ups').astype(np.float64)
+        num_comments = columns.column('num_comments').astype(np.float64)
+        # A missing ratio counts as unanimous, i.e. not controversial
+        upvote_ratio = np.nan_to_num(columns.column('upvote_ratio'), nan=1.0)
+        return (ups + 1.0) * (num_comments + 1.0) / np.clip(upvote_ratio, self.MIN_UPVOTE_RATIO, 1.0)
+
 
 class PostSelectionStrategyFactory:
+    STRATEGIES = {
+        PostSelectionStrategyEnum.MOST_UPVOTED: MostUpvotedPostStrategy,
+        PostSelectionStrategyEnum.MOST_RECENT: MostRecentPostStrategy,
+        PostSelectionStrategyEnum.MOST_CONTROVERSIAL: MostControversialPostStrategy,
+    }
+
     def get_strategy(self, task: Task)->PostSelectionStrategy:
-        if task.post_selection_strategy == PostSelectionStrategyEnum.MOST_UPVOTED:
-            return MostUpvotedPostStrategy()
-        elif task.post_selection_strategy == PostSelectionStrategyEnum.MOST_RECENT:
-            return MostRecentPostStrategy()
-        elif task.post_selection_strategy == PostSelectionStrategyEnum.MOST_CONTROVERSIAL:
-            return MostControversialPostStrategy()
-        else:
-            raise ValueError(f"Invalid post selection strategy: {task.post_selection_strategy}")
\ No newline at end of file
+        strategy = self.STRATEGIES.get(task.post_selection_strategy)
+        if strategy is None:
+            raise ValueError(f"Invalid post selection strategy: {task.post_selection_strategy}")
+        return strategy()
@@ -1,11 +1,151 @@
-from abc import ABC, abstractmethod
+import logging
+import time
+from typing import Callable
+
+import numpy as np
+
 from utils.units import Task
 
+logger = logging.getLogger(__name__)
+
+# Reddit's hot ranking epoch (2005-12-08) and the seconds per order of magnitude of score
+HOT_EPOCH = 1134028003
+HOT_DECAY_SECONDS = 45000
+WILSON_Z = 1.96  # 95% confidence
+
+
+class ScoreBatch:
+    """Numeric columns of every post in a task, concatenated, with the subreddit of each row as a group id."""
+    def __init__(self, task: Task, now: float = None):
+        reddit_datas = [reddit_data for reddit_data in task.reddit_datas.reddit_datas if len(reddit_data)]
+        self.reddit_datas = reddit_datas
+        self.sizes = np.array([len(reddit_data) for reddit_data in reddit_datas], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)])
+        self.group = np.repeat(np.arange(len(reddit_datas)), self.sizes)
+        self.group_count = len(reddit_datas)
+        self.now = time.time() if now is None else now
+
+        def concat(field: str, dtype=np.float64) -> np.ndarray:
+            if not reddit_datas:
+                return np.empty(0, dtype=dtype)
+            return np.concatenate([reddit_data.columns.column(field).astype(dtype) for reddit_data in reddit_datas])
+
+        self.ups = concat('ups')
+        self.score = concat('score')
+        self.num_comments = concat('num_comments')
+        self.created_utc = concat('created_utc')
+        self.upvote_ratio = concat('upvote_ratio')
+
+    def __len__(self) -> int:
+        return len(self.group)
+
+    def split(self, values: np.ndarray) -> list[np.ndarray]:
+        """Per-subreddit slices of a batch-wide array, in the order of self.reddit_datas."""
+        return [values[start:end] for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+# Registered scores: name -> function of a ScoreBatch returning one float64 per row (higher is better)
+SCORES: dict[str, Callable[[ScoreBatch], np.ndarray]] = {}
+
+
+def register_score(name: str):
+    """Register a vectorized score. Functions must work on whole arrays, never loop over posts."""
+    def decorator(function: Callable[[ScoreBatch], np.ndarray]):
+        SCORES[name] = function
+        return function
+    return decorator
+
+
+@register_score("hot")
+def hot_score(batch: ScoreBatch) -> np.ndarray:
+    """Reddit's hot ranking: log10 of the net score plus a bonus that grows with post time."""
+    score = batch.score
+    order = np.log10(np.maximum(np.abs(score), 1.0))
+    sign = np.sign(score)
+    seconds = np.nan_to_num(batch.created_utc, nan=HOT_EPOCH) - HOT_EPOCH
+    return sign * order + seconds / HOT_DECAY_SECONDS
+
+
+@register_score("wilson")
+def wilson_lower_bound(batch: ScoreBatch) -> np.ndarray:
+    """Lower bound of the 95% Wilson interval of the upvote ratio, with the vote count recovered from ups / ratio."""
+    ratio = np.clip(np.nan_to_num(batch.upvote_ratio, nan=0.0), 0.0, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        votes = np.where(ratio > 0, np.maximum(batch.ups, 0.0) / ratio, 0.0)
+    z2 = WILSON_Z * WILSON_Z
+    safe_votes = np.maximum(votes, 1.0)
+    bound = (
+        ratio + z2 / (2 * safe_votes)
+        - WILSON_Z * np.sqrt((ratio * (1 - ratio) + z2 / (4 * safe_votes)) / safe_votes)
+    ) / (1 + z2 / safe_votes)
+    return np.where(votes > 0, bound, 0.0)
+
+
+@register_score("comment_velocity")
+def comment_velocity(batch: ScoreBatch) -> np.ndarray:
+    """Comments per hour since the post was created (at least one minute of age)."""
+    hours = np.maximum((batch.now - batch.created_utc) / 3600.0, 1.0 / 60.0)
+    return np.nan_to_num(batch.num_comments / hours, nan=0.0)
+
+
+@register_score("engagement_zscore")
+def engagement_zscore(batch: ScoreBatch) -> np.ndarray:
+    """Z-score of log(1 + ups + comments) within the post's subreddit."""
+    engagement = np.log1p(np.maximum(batch.ups, 0.0) + np.maximum(batch.num_comments, 0.0))
+    counts = np.maximum(np.bincount(batch.group, minlength=batch.group_count), 1)
+    means = np.bincount(batch.group, weights=engagement, minlength=batch.group_count) / counts
+    deviations = engagement - means[batch.group]
+    stds = np.sqrt(np.bincount(batch.group, weights=deviations * deviations, minlength=batch.group_count) / counts)
+    stds = stds[batch.group]
+    return np.divide(deviations, stds, out=np.zeros_like(deviations), where=stds > 0)
+
+
+def rank_within_groups(values: np.ndarray, group: np.ndarray) -> np.ndarray:
+    """1-based rank of each row within its group by descending value; ties keep row order."""
+    # lexsort is stable, so equal values stay in row order
+    order = np.lexsort((-values, group))
+    group_starts = np.searchsorted(group[order], group[order], side="left")
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(len(values)) - group_starts + 1
+    return ranks
+
+
 class RankingAlgorithm:
-    """Ranks classified posts for selection."""
+    """
+    Ranks classified posts for selection.
+    Every registered score is computed for all posts of the task in one vectorized pass; posts are
+    ranked within their subreddit by the primary score.
+    """
+    def __init__(self, primary_score: str = "hot", scores: list[str] = None, now: float = None):
+        """
+        :param primary_score: Registered score that defines Rank and is stored as RankingAlgorithm.
+        :param scores: Registered scores to compute; all of them when None.
+        :param now: Reference time for age-based scores; the current time when None.
+        """
+        self.score_names = list(scores or SCORES)
+        if primary_score not in self.score_names:
+            self.score_names.append(primary_score)
+        unknown = [name for name in self.score_names if name not in SCORES]
+        if unknown:
+            raise ValueError(f"Unknown ranking scores: {unknown}")
+        self.primary_score = primary_score
+        self.now = now
+
     def rank(self, task: Task):
+        batch = ScoreBatch(task, self.now)
+        if not len(batch):
+            return task
+
+        start = time.perf_counter()
+        scores = {name: SCORES[name](batch) for name in self.score_names}
+        ranks = rank_within_groups(np.nan_to_num(scores[self.primary_score], nan=-np.inf), batch.group)
+        logger.info(
+            f"Scored {len(batch)} posts with {len(scores)} scores in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
 
-        # for subreddit, processed_reddit_data in task.processed_reddit_data.items():
-        #     processed_reddit_data['rank'] = range(1, len(processed_reddit_data) + 1)
-        #     task.processed_reddit_data[subreddit] = processed_reddit_data
-        return task  # Logic to rank posts
+        split_scores = {name: batch.split(values) for name, values in scores.items()}
+        for index, (reddit_data, subreddit_ranks) in enumerate(zip(batch.reddit_datas, batch.split(ranks))):
+            reddit_data.set_scores(
+                {name: values[index] for name, values in split_scores.items()}, subreddit_ranks, self.primary_score
+            )
+        return task
@@ -1,9 +1,17 @@
-from utils.units import Task, RedditData, RedditDataList
+from utils.units import Task, RedditData, RedditDataList, ListingTypeEnum
 from utils.data_base import LocalDatabase
+from utils.rate_limiter import TokenBucket
+from utils.response_archive import ResponseArchive
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import requests
+import json
+import random
+import threading
 import time
+import uuid
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -18,62 +26,344 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class RedditDataCollector:
-    def __init__(self, db: LocalDatabase = None):
+    # Status codes worth retrying: throttling and transient server errors
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    # Listing endpoint and fixed query parameters for each listing type
+    LISTING_ENDPOINTS = {
+        ListingTypeEnum.HOT: ("hot", {}),
+        ListingTypeEnum.NEW: ("new", {}),
+        ListingTypeEnum.TOP_DAY: ("top", {"t": "day"}),
+    }
+
+    def __init__(self, db: LocalDatabase = None, reddit_base_url: str = "https://www.reddit.com",
+                 max_workers: int = 4, requests_per_minute: float = 60, user_agent: str = "python:reddit-video-pipeline:v1.0",
+                 max_pages: int = 3, page_size: int = 50, archive: ResponseArchive = None,
+                 replay: bool = False, replay_run_id: str = None):
+        """
+        :param db: Database used to skip posts that were already stored.
+        :param reddit_base_url: Root of the Reddit API; point it at a local fake server for testing.
+        :param max_workers: Subreddits fetched concurrently; also the size of the connection pool.
+        :param requests_per_minute: Request budget before the server's X-Ratelimit headers take over.
+        :param user_agent: Reddit throttles generic user agents much harder.
+        :param max_pages: Deepest page followed through the `after` cursor of each listing.
+        :param page_size: Posts requested per page (Reddit caps this at 100).
+        :param archive: Where raw listing responses are archived; nothing is archived when None.
+        :param replay: Serve collect() from the archive instead of the network. Replayed posts are not
+            filtered against stored posts and record no fetch stats, so a replay is the same every time.
+        :param replay_run_id: Archived run to replay; defaults to each subreddit's latest run.
+        """
+        if replay and archive is None:
+            raise ValueError("Replay mode needs a response archive")
+        if max_pages < 1:
+            raise ValueError(f"max_pages must be at least 1, got {max_pages}")
         self.db = db
-        self.reddit_base_url = "https://www.reddit.com"
+        self.archive = archive
+        self.replay = replay
+        self.replay_run_id = replay_run_id
+        self.run_id = None
+        self.max_pages = max_pages
+        self.page_size = page_size
+        self.reddit_base_url = reddit_base_url
+        self.max_workers = max_workers
         self.max_retries = 3
         self.base_delay = 1  # Base delay in seconds
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_workers)
+        # One keep-alive session shared by the worker threads, with a pooled connection per worker
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats_lock = threading.Lock()
+        self.latencies = []
+        self.retries = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.not_modified = 0
+        if self.db is not None:
+            # Older databases predate the cursor table
+            self.db.execute_write("""
+                CREATE TABLE IF NOT EXISTS ListingCursor (
+                    SubredditName VARCHAR(255),
+                    Listing VARCHAR(100),
+                    LastSeenPostId VARCHAR(20),
+                    ETag TEXT,
+                    LastModified TEXT,
+                    UpdatedAt REAL,
+                    PRIMARY KEY (SubredditName, Listing)
+                )
+            """)
         logger.info("RedditDataCollector initialized")
     
     def _make_reddit_request(self, url: str) -> Dict[str, Any]:
         """
-        Make a request to Reddit API with retry logic and exponential backoff.
+        Make a request to Reddit API and return the decoded JSON body.
+
+        Args:
+            url: The Reddit API URL to request
+
+        Returns:
+            Dict containing the JSON response data
+
+        Raises:
+            requests.RequestException: If all retries are exhausted
+        """
+        return self._send_reddit_request(url).json()
+
+    def _send_reddit_request(self, url: str, params: Optional[Dict[str, Any]] = None,
+                             headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        Make a request to Reddit API through the shared rate limiter, retrying with jittered exponential backoff.
         
         Args:
             url: The Reddit API URL to request
+            params: Query parameters
+            headers: Extra request headers, e.g. conditional request validators
             
         Returns:
-            Dict containing the JSON response data
+            The response; a 304 Not Modified is returned as is
             
         Raises:
             requests.RequestException: If all retries are exhausted
         """
-        logger.debug(f"Making request to: {url}")
+        logger.debug(f"Making request to: {url} {params or ''}")
         for attempt in range(self.max_retries):
             try:
                 logger.debug(f"Attempt {attempt + 1}/{self.max_retries}")
-                response = requests.get(url, timeout=30)
+                self.rate_limiter.acquire()
+                request_start = time.perf_counter()
+                response = self.session.get(url, params=params, headers=headers, timeout=30)
+                latency = time.perf_counter() - request_start
+                self.rate_limiter.update_from_headers(response.headers)
+                with self._stats_lock:
+                    self.latencies.append(latency)
+                    self.bytes_received += len(response.content)
+                if response.status_code in self.RETRY_STATUS_CODES:
+                    retry_after = response.headers.get("Retry-After")
+                    if retry_after is not None:
+                        try:
+                            self.rate_limiter.pause(float(retry_after))
+                        except ValueError:
+                            pass
                 response.raise_for_status()  # Raise an exception for bad status codes
-                logger.debug(f"Request successful on attempt {attempt + 1}")
-                return response.json()
+                logger.debug(f"Request successful on attempt {attempt + 1} in {latency:.3f}s")
+                return response
             except (requests.RequestException, requests.Timeout) as e:
                 logger.warning(f"Request failed on attempt {attempt + 1}/{self.max_retries}: {e}")
-                if attempt == self.max_retries - 1:  # Last attempt
+                status_code = e.response.status_code if getattr(e, "response", None) is not None else None
+                if attempt == self.max_retries - 1 or (status_code is not None and status_code not in self.RETRY_STATUS_CODES):
                     logger.error(f"All retry attempts exhausted for URL: {url}")
+                    with self._stats_lock:
+                        self.failures += 1
                     raise e
                 
-                # Calculate delay with exponential backoff
-                delay = self.base_delay * (2 ** attempt)
-                logger.info(f"Retrying in {delay} seconds...")
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                delay = random.uniform(0, self.base_delay * (2 ** attempt))
+                logger.info(f"Retrying in {delay:.2f} seconds...")
+                with self._stats_lock:
+                    self.retries += 1
                 time.sleep(delay)
-    
+
+    def fetch_stats(self) -> dict:
+        """Latency percentiles, retries and throttling of the requests made so far."""
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            retries, failures = self.retries, self.failures
+            bytes_received, not_modified = self.bytes_received, self.not_modified
+
+        def percentile(fraction: float) -> float:
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+
+        return {
+            "requests": len(latencies),
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "retries": retries,
+            "failures": failures,
+            "bytes_received": bytes_received,
+            "not_modified": not_modified,
+            **self.rate_limiter.stats(),
+        }
+
+    def _seen_post_ids(self, data: Dict[str, Any]) -> set:
+        """Return the ids in a listing response that are already stored, probing only those ids."""
+        post_ids = [
+            child.get("data", {}).get("id") for child in data.get("data", {}).get("children", [])
+        ]
+        post_ids = [post_id for post_id in post_ids if post_id is not None]
+        if not post_ids or self.db is None:
+            return set()
+        return self.db.find_existing("RedditPostTable", "PostId", post_ids)
+
+    def _load_cursors(self, subreddits: list[str]) -> Dict[tuple, tuple]:
+        """Return {(subreddit, listing): (last seen post id, etag, last modified)} for the given subreddits."""
+        if self.db is None or not subreddits:
+            return {}
+        rows = self.db.execute_read(
+            f"SELECT SubredditName, Listing, LastSeenPostId, ETag, LastModified FROM ListingCursor "
+            f"WHERE SubredditName IN ({', '.join(['?'] * len(subreddits))})",
+            tuple(subreddits)
+        )
+        return {(subreddit, listing): (last_seen, etag, last_modified) for subreddit, listing, last_seen, etag, last_modified in rows}
+
+    def _collect_listing(self, subreddit: str, listing_type: ListingTypeEnum, cursor: Optional[tuple]):
+        """
+        Page through one listing until the last post seen on the previous run, the end of the listing or max_pages.
+        Returns (children, pending cursor, requests sent), with no pending cursor when the listing was not modified.
+        The pending cursor is (subreddit, listing, newest fetched post id, ETag, Last-Modified); DataSaver
+        stores it in the transaction that saves the task, so a task that fails never moves the cursor.
+        """
+        path, fixed_params = self.LISTING_ENDPOINTS[listing_type]
+        url = f"{self.reddit_base_url}/r/{subreddit}/{path}.json"
+        last_seen_id, etag, last_modified = cursor or (None, None, None)
+        children = []
+        after = None
+        for page in range(self.max_pages):
+            params = {**fixed_params, "limit": self.page_size}
+            headers = {}
+            if after:
+                params["after"] = after
+            elif etag or last_modified:
+                # Only the first page is worth validating: if it is unchanged there is nothing new below it
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+            response = self._send_reddit_request(url, params, headers)
+            if response.status_code == 304:
+                with self._stats_lock:
+                    self.not_modified += 1
+                logger.info(f"r/{subreddit}/{path} not modified since last run")
+                return [], None, page + 1
+            if page == 0:
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            if self.archive is not None:
+                self.archive.append(self.run_id, subreddit, listing_type.value, page, response.content)
+
+            listing = response.json().get("data", {})
+            page_children = listing.get("children", [])
+            page_ids = [child.get("data", {}).get("id") for child in page_children]
+            if last_seen_id is not None and last_seen_id in page_ids:
+                if listing_type == ListingTypeEnum.NEW:
+                    # Newest first: everything from the last seen post on was collected before
+                    page_children = page_children[:page_ids.index(last_seen_id)]
+                children.extend(page_children)
+                break
+            children.extend(page_children)
+            after = listing.get("after")
+            if not after:
+                break
+
+        newest_id = children[0].get("data", {}).get("id") if children else last_seen_id
+        pending_cursor = (subreddit, listing_type.value, newest_id, etag, last_modified)
+        return children, pending_cursor, page + 1
+
+    @staticmethod
+    def _merge_listings(listings: list[list[dict]]) -> Dict[str, Any]:
+        """Merge listing children into one listing response, keeping the first occurrence of each post."""
+        children = {}
+        for listing_children in listings:
+            for child in listing_children:
+                post_id = child.get("data", {}).get("id")
+                if post_id is not None:
+                    children.setdefault(post_id, child)
+        return {"kind": "Listing", "data": {"children": list(children.values())}}
+
+    def _collect_subreddit(self, subreddit: str, listing_types: list[ListingTypeEnum], cursors: Dict[tuple, tuple]):
+        """
+        Fetch every listing of a subreddit.
+        Returns a merged listing response, the pending cursors and the number of requests sent.
+        """
+        listings = []
+        cursor_rows = []
+        requests_sent = 0
+        for listing_type in listing_types:
+            listing_children, cursor_row, listing_requests = self._collect_listing(
+                subreddit, listing_type, cursors.get((subreddit, listing_type.value))
+            )
+            listings.append(listing_children)
+            requests_sent += listing_requests
+            if cursor_row is not None:
+                cursor_rows.append(cursor_row)
+        return self._merge_listings(listings), cursor_rows, requests_sent
+
+    def _replay_subreddit(self, subreddit: str, listing_types: list[ListingTypeEnum], cursors: Dict[tuple, tuple]):
+        """Rebuild a subreddit's merged listing response from the archive, without network access."""
+        wanted = {listing_type.value for listing_type in listing_types}
+        listings = [
+            json.loads(response.body).get("data", {}).get("children", [])
+            for response in self.archive.responses(subreddit, self.replay_run_id)
+            if response.listing in wanted
+        ]
+        if not listings:
+            logger.warning(f"No archived responses to replay for r/{subreddit}")
+        return self._merge_listings(listings), [], 0
+
     """Collects data from Reddit based on subreddits."""
     def collect(self, task: Task):
         logger.info(f"Starting data collection for task with {len(task.possible_subreddits)} subreddits")
         reddit_data_list = RedditDataList([])
-        distinct_available_post_id_df = self.db.execute_read_df("SELECT DISTINCT PostId FROM RedditPostTable")
-        distinct_available_post_ids = set(distinct_available_post_id_df['PostId']) if 'PostId' in distinct_available_post_id_df.columns else set()
-        
-        for i, subreddit in enumerate(task.possible_subreddits, 1):
-            logger.info(f"Processing subreddit {i}/{len(task.possible_subreddits)}: r/{subreddit}")
-            url = f"{self.reddit_base_url}/r/{subreddit}/hot.json?limit=50"
-            try:
-                data = self._make_reddit_request(url)
-                reddit_data_list.add_reddit_data(RedditData(subreddit, data, distinct_available_post_ids))
-                logger.info(f"Successfully collected data from r/{subreddit}")
-            except requests.RequestException as e:
-                logger.error(f"Failed to collect data from r/{subreddit}: {e}")
-                continue  # Skip this subreddit and continue with others
+        collect_start = time.perf_counter()
+        stats_before = self.fetch_stats()
+        listing_types = task.listing_types or [ListingTypeEnum.HOT]
+        cursors = {} if self.replay else self._load_cursors(task.possible_subreddits)
+        cursor_rows = []
+        new_posts = 0
+        task.subreddit_fetch_stats = {}
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        fetch_subreddit = self._replay_subreddit if self.replay else self._collect_subreddit
+        if self.replay:
+            logger.info(f"Replaying archived responses (run {self.replay_run_id or 'latest per subreddit'})")
+
+        # Fetch concurrently; parse and dedup against the database on this thread, in subreddit order
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [
+                pool.submit(fetch_subreddit, subreddit, listing_types, cursors)
+                for subreddit in task.possible_subreddits
+            ]
+            for i, (subreddit, future) in enumerate(zip(task.possible_subreddits, futures), 1):
+                logger.info(f"Processing subreddit {i}/{len(task.possible_subreddits)}: r/{subreddit}")
+                try:
+                    data, subreddit_cursor_rows, requests_sent = future.result()
+                    # A replay yields the archived posts whatever was saved since, so it stays deterministic
+                    seen_post_ids = set() if self.replay else self._seen_post_ids(data)
+                    reddit_data = RedditData(subreddit, data, seen_post_ids)
+                    reddit_data_list.add_reddit_data(reddit_data)
+                    cursor_rows.extend(subreddit_cursor_rows)
+                    new_posts += len(reddit_data)
+                    if not self.replay:
+                        # Replayed runs fetch nothing, so they stay out of the subreddit yield table
+                        task.subreddit_fetch_stats[subreddit] = {
+                            "requests": requests_sent,
+                            "posts_fetched": len(data["data"]["children"]),
+                            "new_posts": len(reddit_data),
+                        }
+                    logger.info(f"Successfully collected data from r/{subreddit}")
+                except requests.RequestException as e:
+                    logger.error(f"Failed to collect data from r/{subreddit}: {e}")
+                    if not self.replay:
+                        # At least one request was spent on it
+                        task.subreddit_fetch_stats[subreddit] = {"requests": 1, "posts_fetched": 0, "new_posts": 0}
+                    continue  # Skip this subreddit and continue with others
+
+        if self.archive is not None and not self.replay:
+            self.archive.flush()
+        # Cursors only move once the task is saved (DataSaver), so a task that fails later is fetched again
+        task.listing_cursors = cursor_rows if self.db is not None else []
+
+        stats = self.fetch_stats()
+        requests_made = stats["requests"] - stats_before["requests"]
+        bytes_received = stats["bytes_received"] - stats_before["bytes_received"]
+        logger.info(
+            f"Fetched {len(task.possible_subreddits)} subreddits in {time.perf_counter() - collect_start:.2f}s: "
+            f"{requests_made} requests, {bytes_received / 1024:.0f} KiB, {new_posts} new posts "
+            f"({requests_made / max(new_posts, 1):.2f} requests and {bytes_received / 1024 / max(new_posts, 1):.1f} KiB per new post), "
+            f"{stats['not_modified'] - stats_before['not_modified']} not modified, "
+            f"p50 {stats['latency_p50'] * 1000:.0f}ms, p95 {stats['latency_p95'] * 1000:.0f}ms, "
+            f"{stats['retries'] - stats_before['retries']} retries, "
+            f"{stats['throttle_events']} throttled ({stats['throttled_seconds']:.1f}s)"
+        )
         
         task.reddit_datas = reddit_data_list
         logger.info(f"Data collection completed. Collected data from {len(reddit_data_list.reddit_datas)} subreddits")
@@ -1,7 +1,89 @@
+import logging
+import math
+
 from utils.units import Task
+from utils.subreddit_yield import SubredditYield, SubredditYieldStats
+
+logger = logging.getLogger(__name__)
+
 
 class SubredditFinder:
-    """Finds relevant subreddits for data collection."""
+    """
+    Finds relevant subreddits for data collection.
+
+    Candidates (task.candidate_subreddits) are scored with UCB1 on their yield per fetch request:
+    the mean yield so far, scaled to the best candidate, plus an exploration bonus that shrinks as a
+    subreddit is run more often. Subreddits never run score highest, so every candidate is tried.
+    The best scored candidates are kept, in score order, while their expected requests fit
+    task.subreddit_fetch_budget.
+    """
+    REWARDS = ("videos", "selected", "new_posts")
+
+    def __init__(self, yield_stats: SubredditYieldStats = None, reward: str = "videos",
+                 exploration: float = 1.0, requests_per_listing: int = 3):
+        """
+        :param yield_stats: Yield table; without it every candidate is used in the given order.
+        :param reward: What a run yields: videos produced, posts selected or new posts.
+        :param exploration: Weight of the UCB exploration bonus; 0 always picks the best known subreddits.
+        :param requests_per_listing: Requests expected per listing for a subreddit with no history
+            (the collector's max_pages).
+        """
+        if reward not in self.REWARDS:
+            raise ValueError(f"Unknown reward {reward!r}, expected one of {self.REWARDS}")
+        self.yield_stats = yield_stats
+        self.reward = reward
+        self.exploration = exploration
+        self.requests_per_listing = requests_per_listing
+
+    def _yield_per_request(self, stats: SubredditYield) -> float:
+        produced = {
+            "videos": stats.videos_produced,
+            "selected": stats.posts_selected,
+            "new_posts": stats.new_posts,
+        }[self.reward]
+        return produced / max(stats.requests, 1)
+
+    def scores(self, candidates: list[str], yields: dict[str, SubredditYield]) -> dict[str, float]:
+        """UCB1 score per candidate; infinite for candidates that were never run."""
+        means = {subreddit: self._yield_per_request(yields[subreddit]) for subreddit in candidates if subreddit in yields}
+        # Yields per request are on no fixed scale, so they are scaled to the best one before the bonus is added
+        best_mean = max(means.values(), default=0.0) or 1.0
+        total_runs = sum(yields[subreddit].runs for subreddit in means) + 1
+        scores = {}
+        for subreddit in candidates:
+            stats = yields.get(subreddit)
+            if stats is None or not stats.runs:
+                scores[subreddit] = math.inf
+            else:
+                bonus = self.exploration * math.sqrt(2 * math.log(total_runs) / stats.runs)
+                scores[subreddit] = means[subreddit] / best_mean + bonus
+        return scores
+
     def find(self, task: Task):
-        task.possible_subreddits = ["AmItheAsshole"]
-        return task  # Logic to find subreddits 
\ No newline at end of file
+        candidates = list(dict.fromkeys(task.candidate_subreddits))
+        if self.yield_stats is None:
+            task.possible_subreddits = candidates
+            return task
+
+        yields = self.yield_stats.get(candidates)
+        scores = self.scores(candidates, yields)
+        unseen_requests = self.requests_per_listing * max(len(task.listing_types), 1)
+        budget = task.subreddit_fetch_budget
+
+        chosen, planned_requests = [], 0.0
+        # sorted is stable, so equal scores (e.g. all unseen) keep the candidate order
+        for subreddit in sorted(candidates, key=lambda subreddit: -scores[subreddit]):
+            stats = yields.get(subreddit)
+            expected = stats.requests_per_run if stats is not None and stats.runs else unseen_requests
+            if budget is not None and chosen and planned_requests + expected > budget:
+                continue
+            chosen.append(subreddit)
+            planned_requests += expected
+
+        task.possible_subreddits = chosen
+        logger.info(
+            f"Chose {len(chosen)} of {len(candidates)} subreddits (~{planned_requests:.0f} requests"
+            f"{f' of {budget}' if budget is not None else ''}): "
+            + ", ".join(f"r/{subreddit} ({scores[subreddit]:.2f})" for subreddit in chosen)
+        )
+        return task
@@ -4,16 +4,29 @@ from data_collector.classification_algorithm import ClassificationAlgorithm
 from data_collector.post_selector import PostSelector
 from data_collector.channel_finder import ChannelFinder
 from data_collector.ranking_algorithm import RankingAlgorithm
+from data_collector.duplicate_filter import NearDuplicateFilter
 
 from video_pipeline.text_generator import TextGenerator
 from video_pipeline.audio_synthesizer import AudioSynthesizer
 from video_pipeline.video_selection_algorithm import VideoSelectionAlgorithm
-from video_pipeline.video_editor import VideoEditor
+from video_pipeline.video_editor import VideoEditor, render_job
 from video_pipeline.video_uploader import VideoUploader
 from video_pipeline.video_downloader import VideoDownloader
 
-from utils.units import Task
+from utils.units import Task, ExecutorModeEnum
 from utils.data_base import LocalDatabase, DataSaver
+from utils.llm_cache import LLMResponseCache
+from utils.audio_store import AudioStore
+from utils.transcription_cache import TranscriptionCache
+from utils.response_archive import ResponseArchive
+from utils.minhash_lsh import MinHashLSHIndex
+from utils.subreddit_yield import SubredditYieldStats
+from utils.checkpoint_store import CheckpointStore, FAILED
+from utils.stage_executor import Stage, StreamingStageExecutor, PostWorkItem
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import queue
 import uuid
 import logging
 import time
@@ -33,30 +46,73 @@ logger = logging.getLogger(__name__)
 
 # Main pipeline orchestrator
 class VideoGenerationPipeline:
-    def __init__(self, db_path: str = 'database.db'):
+    # Worker counts for the per-post stages in streaming mode. Text, audio and video
+    # selection are I/O bound and run on threads; rendering runs on processes.
+    DEFAULT_STAGE_WORKERS = {
+        "generate_text": 4,
+        "synthesize_audio": 4,
+        "select_video": 1,
+        "edit_video": max(1, (os.cpu_count() or 1) // 4),
+    }
+
+    def __init__(self, db_path: str = 'database.db',
+                 executor_mode: ExecutorModeEnum = ExecutorModeEnum.SEQUENTIAL,
+                 stage_workers: dict = None, queue_size: int = 8, replay_responses: bool = False,
+                 resume: bool = False):
+        """
+        :param resume: Reload tasks that have a checkpoint (by task name) instead of collecting and selecting
+            again, and skip every per-post stage whose checkpointed output is still valid.
+        """
         logger.info("Initializing VideoGenerationPipeline")
+        self.resume = resume
+        self.executor_mode = executor_mode
+        self.stage_workers = {**self.DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+        self.queue_size = queue_size
         try:
             self.db = LocalDatabase(db_path)
-            self.data_saver = DataSaver(self.db)
-            self.subreddit_finder = SubredditFinder()
-            self.reddit_collector = RedditDataCollector(self.db)
-            self.classifier = ClassificationAlgorithm()
+            self.checkpoints = CheckpointStore(os.path.join(os.path.dirname(os.path.abspath(db_path)), 'checkpoints.db'))
+            self.duplicate_index = MinHashLSHIndex(self.db)
+            self.data_saver = DataSaver(self.db, duplicate_index=self.duplicate_index)
+            self.reddit_collector = RedditDataCollector(
+                self.db,
+                archive=ResponseArchive(os.path.join(os.path.dirname(os.path.abspath(db_path)), 'response_archive')),
+                replay=replay_responses,
+            )
+            self.yield_stats = SubredditYieldStats(self.db)
+            self.subreddit_finder = SubredditFinder(
+                self.yield_stats, requests_per_listing=self.reddit_collector.max_pages
+            )
+            self.classifier = ClassificationAlgorithm(
+                store_dir=os.path.join(os.path.dirname(os.path.abspath(db_path)), 'embeddings')
+            )
             self.ranker = RankingAlgorithm()
-            self.post_selector = PostSelector()
-            self.text_generator = TextGenerator()
-            self.audio_synth = AudioSynthesizer()
+            self.post_selector = PostSelector(duplicate_filter=NearDuplicateFilter(self.duplicate_index))
+            # The narration cache lives next to the main database
+            self.llm_cache = LLMResponseCache(os.path.join(os.path.dirname(os.path.abspath(db_path)), 'llm_cache.db'))
+            self.text_generator = TextGenerator(cache=self.llm_cache)
+            self.audio_synth = AudioSynthesizer(store=AudioStore())
             self.video_selector = VideoSelectionAlgorithm()
-            self.video_editor = VideoEditor()
+            self.video_editor = VideoEditor(
+                transcription_cache=TranscriptionCache(
+                    os.path.join(os.path.dirname(os.path.abspath(db_path)), 'transcription_cache.db')
+                ),
+                render_workers=self.stage_workers["edit_video"],
+            )
             self.uploader = VideoUploader()
             self.channel_finder = ChannelFinder()
-            self.video_downloader = VideoDownloader()
+            self.video_downloader = VideoDownloader(self.video_selector.library)
             logger.info("All pipeline components initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize pipeline components: {str(e)}")
             raise
 
     def run(self, task_list: list[Task]):
-        logger.info(f"Starting pipeline execution with {len(task_list)} tasks")
+        logger.info(f"Starting pipeline execution with {len(task_list)} tasks ({self.executor_mode.value} mode)")
+        if self.executor_mode == ExecutorModeEnum.STREAMING:
+            return self._run_streaming(task_list)
+        return self._run_sequential(task_list)
+
+    def _run_sequential(self, task_list: list[Task]):
         start_time = time.time()
         
         successful_tasks = 0
@@ -68,50 +124,68 @@ class VideoGenerationPipeline:
             logger.info(f"Processing task {i}/{len(task_list)}: {task.__class__.__name__}")
             
             try:
-                if task.should_find_subreddit == True:
-                    logger.info(f"Task {i}: Finding subreddit")
-                    task = self.subreddit_finder.find(task)
-                    logger.info(f"Task {i}: Subreddit finding completed")
-                    
-                if task.should_collect_reddit_data == True:
-                    logger.info(f"Task {i}: Collecting Reddit data")
-                    task = self.reddit_collector.collect(task)
-                    logger.info(f"Task {i}: Reddit data collection completed")
-                    
-                if task.should_classify == True:
-                    logger.info(f"Task {i}: Classifying content")
-                    task = self.classifier.classify(task)
-                    logger.info(f"Task {i}: Classification completed")
-                    
-                if task.should_rank == True:
-                    logger.info(f"Task {i}: Ranking content")
-                    task = self.ranker.rank(task)
-                    logger.info(f"Task {i}: Ranking completed")
-                    
-                if task.should_select_post == True:
-                    logger.info(f"Task {i}: Selecting post")
-                    task = self.post_selector.select(task)
-                    logger.info(f"Task {i}: Post selection completed")
-                    
+                if self.resume and self.checkpoints.restore_task(task):
+                    logger.info(f"Task {i}: Resumed from checkpoint, skipping collection and selection")
+                else:
+                    if task.should_find_subreddit == True:
+                        logger.info(f"Task {i}: Finding subreddit")
+                        task = self.subreddit_finder.find(task)
+                        logger.info(f"Task {i}: Subreddit finding completed")
+
+                    if task.should_collect_reddit_data == True:
+                        logger.info(f"Task {i}: Collecting Reddit data")
+                        task = self.reddit_collector.collect(task)
+                        logger.info(f"Task {i}: Reddit data collection completed")
+
+                    if task.should_classify == True:
+                        logger.info(f"Task {i}: Classifying content")
+                        task = self.classifier.classify(task)
+                        logger.info(f"Task {i}: Classification completed")
+
+                    if task.should_rank == True:
+                        logger.info(f"Task {i}: Ranking content")
+                        task = self.ranker.rank(task)
+                        logger.info(f"Task {i}: Ranking completed")
+
+                    if task.should_select_post == True:
+                        logger.info(f"Task {i}: Selecting post")
+                        task = self.post_selector.select(task)
+                        self.checkpoints.save_selection(task)
+                        logger.info(f"Task {i}: Post selection completed")
+
+                per_post_start = time.time()
                 if task.should_generate_text == True:
                     logger.info(f"Task {i}: Generating text")
-                    task = self.text_generator.generate(task)
+                    done = self._completed_posts(task, "generate_text")
+                    task = self.text_generator.generate(task, skip_post_ids=done)
+                    self.checkpoints.record_stage(task, "generate_text", done)
                     logger.info(f"Task {i}: Text generation completed")
                     
                 if task.should_synthesize_audio == True:
                     logger.info(f"Task {i}: Synthesizing audio")
-                    task = self.audio_synth.synthesize(task)
+                    done = self._completed_posts(task, "synthesize_audio")
+                    task = self.audio_synth.synthesize(task, skip_post_ids=done)
+                    self.checkpoints.record_stage(task, "synthesize_audio", done)
                     logger.info(f"Task {i}: Audio synthesis completed")
                     
                 if task.should_select_video == True:
                     logger.info(f"Task {i}: Selecting video")
-                    task = self.video_selector.select_video(task)
+                    done = self._completed_posts(task, "select_video")
+                    task = self.video_selector.select_video(task, skip_post_ids=done)
+                    self.checkpoints.record_stage(task, "select_video", done)
                     logger.info(f"Task {i}: Video selection completed")
                     
                 if task.should_edit_video == True:
                     logger.info(f"Task {i}: Editing video")
-                    task = self.video_editor.edit(task)
+                    done = self._completed_posts(task, "edit_video")
+                    task = self.video_editor.edit(task, skip_post_ids=done)
+                    self.checkpoints.record_stage(task, "edit_video", done)
                     logger.info(f"Task {i}: Video editing completed")
+
+                # Stages run over all selected posts at once here, so each post is charged an equal share
+                selected_posts = task.reddit_datas.get_all_posts()
+                for post in selected_posts:
+                    task.post_seconds[post.id] = (time.time() - per_post_start) / len(selected_posts)
                     
                 if task.should_upload == True:
                     logger.info(f"Task {i}: Uploading video")
@@ -122,6 +196,7 @@ class VideoGenerationPipeline:
                     logger.info(f"Task {i}: Uploading video")
                     task = self.data_saver.save_task(task)
                     logger.info(f"Task {i}: Video upload completed")
+                self._record_yield(task)
 
                 task_duration = time.time() - task_start_time
                 logger.info(f"Task {i} completed successfully in {task_duration:.2f} seconds")
@@ -136,5 +211,201 @@ class VideoGenerationPipeline:
         total_duration = time.time() - start_time
         logger.info(f"Pipeline execution completed in {total_duration:.2f} seconds")
         logger.info(f"Results: {successful_tasks} successful, {failed_tasks} failed out of {len(task_list)} total tasks")
+        self._report_throughput(task_list, total_duration)
         
         # Channel finder and downloader can be integrated as needed
+
+    def _run_task_level_stages(self, task: Task, i: int) -> Task:
+        """Run the stages that need every post of the task at once (find, collect, classify, rank, select)."""
+        if self.resume and self.checkpoints.restore_task(task):
+            logger.info(f"Task {i}: Resumed from checkpoint, skipping collection and selection")
+            return task
+        if task.should_find_subreddit == True:
+            logger.info(f"Task {i}: Finding subreddit")
+            task = self.subreddit_finder.find(task)
+        if task.should_collect_reddit_data == True:
+            logger.info(f"Task {i}: Collecting Reddit data")
+            task = self.reddit_collector.collect(task)
+        if task.should_classify == True:
+            logger.info(f"Task {i}: Classifying content")
+            task = self.classifier.classify(task)
+        if task.should_rank == True:
+            logger.info(f"Task {i}: Ranking content")
+            task = self.ranker.rank(task)
+        if task.should_select_post == True:
+            logger.info(f"Task {i}: Selecting post")
+            task = self.post_selector.select(task)
+            self.checkpoints.save_selection(task)
+        return task
+
+    def _completed_posts(self, task: Task, stage: str) -> set:
+        """Posts whose output of stage can be reused; always empty unless resuming."""
+        return self.checkpoints.completed(task, stage) if self.resume else set()
+
+    def _skip_stage(self, item: PostWorkItem, stage: str) -> bool:
+        return self.resume and CheckpointStore.is_valid(item.post_data, stage)
+
+    def _finalize_task(self, task: Task, i: int, rendered: dict) -> Task:
+        """Run the task-level stages that follow the per-post stages (upload, save)."""
+        # Checkpoints of the task's last posts may still be buffered
+        self.checkpoints.flush()
+        if task.should_edit_video == True:
+            task.success = all(rendered.values()) if rendered else False
+        if task.should_upload == True:
+            logger.info(f"Task {i}: Uploading video")
+            task = self.uploader.upload(task)
+        if task.save_to_db == True:
+            logger.info(f"Task {i}: Saving to database")
+            task = self.data_saver.save_task(task)
+        self._record_yield(task)
+        return task
+
+    def _record_yield(self, task: Task):
+        """Add what each fetched subreddit of a finished task yielded to the subreddit yield table."""
+        runs = []
+        for subreddit, fetch_stats in task.subreddit_fetch_stats.items():
+            reddit_data = task.reddit_datas.subreddit_to_reddit_data.get(subreddit)
+            selected = reddit_data.get_all_posts() if reddit_data is not None else []
+            runs.append({
+                "subreddit": subreddit,
+                **fetch_stats,
+                "posts_selected": len(selected),
+                "videos_produced": sum(1 for post in selected if post.final_video_path),
+                "processing_seconds": sum(task.post_seconds.get(post.id, 0.0) for post in selected),
+            })
+        self.yield_stats.record(runs)
+
+    def _build_streaming_stages(self, render_pool: ProcessPoolExecutor) -> list[Stage]:
+        def generate_text(item: PostWorkItem) -> PostWorkItem:
+            if item.task.should_generate_text == True and not self._skip_stage(item, "generate_text"):
+                self.text_generator.generate_post(item.post_data, item.subreddit)
+                self.checkpoints.record(item.task.name, item.post_data, "generate_text")
+            return item
+
+        def synthesize_audio(item: PostWorkItem) -> PostWorkItem:
+            if item.task.should_synthesize_audio == True and not self._skip_stage(item, "synthesize_audio"):
+                self.audio_synth.synthesize_post(item.post_data, item.subreddit, item.task.name)
+                self.checkpoints.record(item.task.name, item.post_data, "synthesize_audio")
+            return item
+
+        def select_video(item: PostWorkItem) -> PostWorkItem:
+            if item.task.should_select_video == True and not self._skip_stage(item, "select_video"):
+                self.video_selector.select_post_video(item.post_data)
+                self.checkpoints.record(item.task.name, item.post_data, "select_video")
+            return item
+
+        def edit_video(item: PostWorkItem) -> PostWorkItem:
+            if item.task.should_edit_video == True and not self._skip_stage(item, "edit_video"):
+                # Transcribe here, where the caches live; only the render job crosses into the worker process
+                job = self.video_editor.prepare_render_job(item.post_data, item.task.render_backend)
+                if job is None:
+                    item.failed = True
+                    self.checkpoints.record(item.task.name, item.post_data, "edit_video", FAILED)
+                    return item
+                _, success, render_seconds = render_pool.submit(render_job, job).result()
+                item.stage_durations["render"] = render_seconds
+                if success:
+                    item.post_data.final_video_path = job.output_path
+                item.failed = not success
+                self.checkpoints.record(item.task.name, item.post_data, "edit_video")
+            return item
+
+        return [
+            Stage("generate_text", generate_text, self.stage_workers["generate_text"]),
+            Stage("synthesize_audio", synthesize_audio, self.stage_workers["synthesize_audio"]),
+            Stage("select_video", select_video, self.stage_workers["select_video"]),
+            Stage("edit_video", edit_video, self.stage_workers["edit_video"]),
+        ]
+
+    def _run_streaming(self, task_list: list[Task]):
+        """
+        Run task-level stages per task on the calling thread and stream the selected
+        posts through the per-post stages, so rendering of one post overlaps with
+        narration and synthesis of the next ones.
+        """
+        start_time = time.time()
+        successful_tasks = 0
+        failed_tasks = 0
+
+        # Per-task bookkeeping shared with the executor's sink thread
+        pending_posts: dict[int, int] = {}
+        rendered: dict[int, dict] = {}
+        completed_tasks: queue.Queue = queue.Queue()
+        task_start_times: dict[int, float] = {}
+        task_index = {id(task): i for i, task in enumerate(task_list, 1)}
+
+        def on_post_done(item: PostWorkItem):
+            i = task_index[id(item.task)]
+            rendered[i][item.post_data.id] = not item.failed
+            # "render" is also timed inside edit_video, so only the stage timings are added up
+            item.task.post_seconds[item.post_data.id] = sum(item.stage_durations.get(stage, 0.0) for stage in self.stage_workers)
+            timings = ", ".join(f"{name}={duration:.2f}s" for name, duration in item.stage_durations.items())
+            logger.info(f"Task {i}: post {item.post_data.id} finished ({'ok' if not item.failed else 'failed'}; {timings})")
+            pending_posts[i] -= 1
+            if pending_posts[i] == 0:
+                completed_tasks.put(item.task)
+
+        def finalize_completed():
+            nonlocal successful_tasks, failed_tasks
+            while True:
+                try:
+                    task = completed_tasks.get_nowait()
+                except queue.Empty:
+                    return
+                i = task_index[id(task)]
+                try:
+                    self._finalize_task(task, i, rendered[i])
+                    logger.info(f"Task {i} completed successfully in {time.time() - task_start_times[i]:.2f} seconds")
+                    successful_tasks += 1
+                except Exception as e:
+                    logger.error(f"Task {i} failed after {time.time() - task_start_times[i]:.2f} seconds: {str(e)}")
+                    failed_tasks += 1
+
+        # Workers are spawned rather than forked because the stage threads are already running
+        render_pool = ProcessPoolExecutor(
+            max_workers=self.stage_workers["edit_video"], mp_context=multiprocessing.get_context("spawn")
+        )
+        with render_pool:
+            executor = StreamingStageExecutor(self._build_streaming_stages(render_pool), on_post_done, self.queue_size)
+            executor.start()
+
+            for i, task in enumerate(task_list, 1):
+                task_start_times[i] = time.time()
+                logger.info(f"Processing task {i}/{len(task_list)}: {task.__class__.__name__}")
+                try:
+                    task = self._run_task_level_stages(task, i)
+                    task_index[id(task)] = i
+                except Exception as e:
+                    logger.error(f"Task {i} failed after {time.time() - task_start_times[i]:.2f} seconds: {str(e)}")
+                    failed_tasks += 1
+                    continue
+
+                posts = [
+                    (subreddit, post_data)
+                    for subreddit, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items()
+                    for post_data in reddit_data.get_all_posts()
+                ]
+                rendered[i] = {}
+                if not posts:
+                    completed_tasks.put(task)
+                else:
+                    pending_posts[i] = len(posts)
+                    for subreddit, post_data in posts:
+                        executor.submit(PostWorkItem(task, subreddit, post_data))
+                finalize_completed()
+
+            executor.close()
+
+        finalize_completed()
+
+        total_duration = time.time() - start_time
+        logger.info(f"Pipeline execution completed in {total_duration:.2f} seconds")
+        logger.info(f"Results: {successful_tasks} successful, {failed_tasks} failed out of {len(task_list)} total tasks")
+        self._report_throughput(task_list, total_duration)
+
+    def _report_throughput(self, task_list: list[Task], total_duration: float):
+        videos = sum(
+            1 for task in task_list for post in task.reddit_datas.get_all_posts() if post.final_video_path
+        )
+        videos_per_hour = videos / total_duration * 3600 if total_duration > 0 else 0.0
+        logger.info(f"Throughput: {videos} videos in {total_duration:.2f} seconds ({videos_per_hour:.1f} videos/hour)")
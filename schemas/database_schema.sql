@@ -60,3 +60,41 @@ CREATE TABLE VideoTable (
     VideoPath TEXT,
     MediaPath TEXT
 );
+
+CREATE TABLE ListingCursor (
+    SubredditName VARCHAR(255),
+    Listing VARCHAR(100),
+    LastSeenPostId VARCHAR(20),
+    ETag TEXT,
+    LastModified TEXT,
+    UpdatedAt REAL,
+    PRIMARY KEY (SubredditName, Listing)
+);
+
+CREATE TABLE MinHashSignature (
+    PostId VARCHAR(20) PRIMARY KEY,
+    Signature BLOB
+);
+
+CREATE TABLE MinHashBucket (
+    BucketKey INTEGER,
+    PostId VARCHAR(20),
+    PRIMARY KEY (BucketKey, PostId)
+) WITHOUT ROWID;
+
+CREATE TABLE MinHashIndexMeta (
+    Key VARCHAR(100) PRIMARY KEY,
+    Value TEXT
+);
+
+CREATE TABLE SubredditYield (
+    SubredditName VARCHAR(255) PRIMARY KEY,
+    Runs INT,
+    Requests INT,
+    PostsFetched INT,
+    NewPosts INT,
+    PostsSelected INT,
+    VideosProduced INT,
+    ProcessingSeconds REAL,
+    LastRunAt REAL
+);
@@ -1,16 +1,70 @@
 import os
+import re
+import threading
 import openai
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from utils.llm_cache import LLMResponseCache
+from utils import mp3
+
+
+NARRATION_SYSTEM_PROMPT = "You are a YouTube Shorts scriptwriter. Your output will be used directly for AI voiceover."
+
+
+def build_narration_prompt(title: str, body: str) -> str:
+    return (
+        f"Rewrite the following Reddit post to be used directly in a YouTube Shorts voiceover. "
+        f"Start with a hook and make it flow like natural speech. No titles, no subreddit mention, no intro text. "
+        f"Just return the final script:\n\n"
+        f"Title: {title}\n\n"
+        f"Body:\n{body}"
+    )
+
+
+def split_narration(text: str, max_chars: int = 1000) -> list[str]:
+    """
+    Split a narration into chunks of at most max_chars, cutting at sentence boundaries.
+    Sentences longer than max_chars are cut at word boundaries instead.
+    """
+    sentences = [sentence for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence]
+    pieces = []
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def _get_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment.")
+    return api_key
 
 
 class LLMClient:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment.")
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self, cache: LLMResponseCache = None):
+        self.client = openai.OpenAI(api_key=_get_api_key())
+        self.cache = cache
 
-    # General-purpose chat completion
+    # General-purpose chat completion, served from the response cache when possible
     def chat(self, system_prompt: str, user_prompt: str, model: str = "gpt-3.5-turbo") -> str:
+        if self.cache is not None:
+            key = LLMResponseCache.make_key(system_prompt, user_prompt, model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
         response = self.client.chat.completions.create(
             model=model,
             messages=[
@@ -18,21 +72,16 @@ class LLMClient:
                 {"role": "user", "content": user_prompt}
             ]
         )
-        return response.choices[0].message.content.strip()
+        content = response.choices[0].message.content.strip()
+        if self.cache is not None:
+            self.cache.put(key, model, content)
+        return content
 
     # Generate narration specifically for Reddit post
     def generate_narration(self, title: str, body: str, subreddit: str) -> str:
-        prompt = (
-            f"Rewrite the following Reddit post to be used directly in a YouTube Shorts voiceover. "
-            f"Start with a hook and make it flow like natural speech. No titles, no subreddit mention, no intro text. "
-            f"Just return the final script:\n\n"
-            f"Title: {title}\n\n"
-            f"Body:\n{body}"
-        )
-
         return self.chat(
-            system_prompt="You are a YouTube Shorts scriptwriter. Your output will be used directly for AI voiceover.",
-            user_prompt=prompt
+            system_prompt=NARRATION_SYSTEM_PROMPT,
+            user_prompt=build_narration_prompt(title, body)
         )
 
         
@@ -44,6 +93,14 @@ class LLMClient:
         )
         return response.data[0].embedding
 
+    # Embeddings for many texts in one request, in input order
+    def generate_embeddings(self, texts: list[str], model: str = "text-embedding-3-small") -> list[list[float]]:
+        response = self.client.embeddings.create(
+            model=model,
+            input=texts
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
     # Text-to-speech (TTS)
     def synthesize_speech(self, text: str, output_path: str, voice: str = "onyx", model: str = "tts-1"):
         response = self.client.audio.speech.create(
@@ -53,3 +110,84 @@ class LLMClient:
         )
         response.stream_to_file(output_path)
         return output_path
+
+    # Text-to-speech for a single chunk, returned in memory
+    def synthesize_speech_bytes(self, text: str, voice: str = "onyx", model: str = "tts-1") -> bytes:
+        response = self.client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text
+        )
+        return response.content
+
+    # Chunked text-to-speech: sentence-aligned chunks are voiced concurrently and stitched in order
+    def synthesize_speech_chunked(self, text: str, output_path: str, voice: str = "onyx", model: str = "tts-1",
+                                  max_chunk_chars: int = 1000, max_workers: int = 4,
+                                  on_chunk: Callable[[int, float, bytes], None] = None) -> list[float]:
+        """
+        Synthesize text as concurrent chunk requests and write them to output_path in order.
+        :param on_chunk: Called as on_chunk(index, duration, frames) with the mp3 frames of each chunk, in
+            narration order, as soon as it and every chunk before it are voiced.
+        :return: Exact duration in seconds of each chunk, in narration order.
+        """
+        chunks = split_narration(text, max_chunk_chars)
+        durations: list[float] = [0.0] * len(chunks)
+        finished: dict[int, bytes] = {}
+        next_to_write = 0
+        lock = threading.Lock()
+
+        with open(output_path, "wb") as output, ThreadPoolExecutor(max_workers=max_workers) as pool:
+            def voice_chunk(index: int):
+                nonlocal next_to_write
+                frames = mp3.audio_frames(self.synthesize_speech_bytes(chunks[index], voice, model))
+                with lock:
+                    finished[index] = frames
+                    # Append every chunk that now extends the contiguous prefix
+                    while next_to_write in finished:
+                        chunk_frames = finished.pop(next_to_write)
+                        output.write(chunk_frames)
+                        output.flush()
+                        durations[next_to_write] = mp3.scan(chunk_frames).duration
+                        if on_chunk is not None:
+                            on_chunk(next_to_write, durations[next_to_write], chunk_frames)
+                        next_to_write += 1
+
+            for future in [pool.submit(voice_chunk, index) for index in range(len(chunks))]:
+                future.result()
+        return durations
+
+
+class AsyncLLMClient:
+    """asyncio counterpart of LLMClient, backed by openai.AsyncOpenAI."""
+    def __init__(self, cache: LLMResponseCache = None):
+        self.client = openai.AsyncOpenAI(api_key=_get_api_key())
+        self.cache = cache
+
+    # General-purpose chat completion, served from the response cache when possible
+    async def chat(self, system_prompt: str, user_prompt: str, model: str = "gpt-3.5-turbo") -> str:
+        if self.cache is not None:
+            key = LLMResponseCache.make_key(system_prompt, user_prompt, model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        )
+        content = response.choices[0].message.content.strip()
+        if self.cache is not None:
+            self.cache.put(key, model, content)
+        return content
+
+    # Generate narration specifically for Reddit post
+    async def generate_narration(self, title: str, body: str, subreddit: str) -> str:
+        return await self.chat(
+            system_prompt=NARRATION_SYSTEM_PROMPT,
+            user_prompt=build_narration_prompt(title, body)
+        )
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,81 @@
+"""
+Compare the caption compositor against one full-frame TextClip per word.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_captions [--seconds 10] [--words-per-second 3] [--width 1080] [--height 1920]
+
+Each renderer runs in a fresh process so its peak RSS is measured in isolation.
+Frames are produced with get_frame() only, so encoding cost is excluded.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+from moviepy import ColorClip, CompositeVideoClip, TextClip
+
+from video_pipeline.caption_layer import CaptionLayer
+
+
+def _make_words(seconds: float, words_per_second: float) -> list[tuple[str, float, float]]:
+    vocabulary = ["so", "my", "roommate", "decided", "to", "eat", "the", "entire", "birthday", "cake", "AITA"]
+    step = 1.0 / words_per_second
+    count = int(seconds * words_per_second)
+    return [(vocabulary[i % len(vocabulary)], i * step, (i + 1) * step) for i in range(count)]
+
+
+def _build_clip(renderer: str, words, size, seconds):
+    background = ColorClip(size=size, color=(30, 60, 90), duration=seconds)
+    if renderer == "compositor":
+        return CaptionLayer(words, size).apply(background)
+    text_clips = [
+        TextClip(text=word, font_size=70, color='white', size=size)
+        .with_position('center').with_start(start).with_duration(end - start)
+        for word, start, end in words
+    ]
+    return CompositeVideoClip([background] + text_clips)
+
+
+def _run(renderer: str, seconds: float, words_per_second: float, size, fps: int, results):
+    words = _make_words(seconds, words_per_second)
+    setup_start = time.perf_counter()
+    clip = _build_clip(renderer, words, size, seconds)
+    setup_seconds = time.perf_counter() - setup_start
+
+    frame_count = int(seconds * fps)
+    render_start = time.perf_counter()
+    for index in range(frame_count):
+        clip.get_frame(index / fps)
+    render_seconds = time.perf_counter() - render_start
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results[renderer] = (setup_seconds, frame_count / render_seconds, peak_rss_mb)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--words-per-second", type=float, default=3.0)
+    parser.add_argument("--width", type=int, default=1080)
+    parser.add_argument("--height", type=int, default=1920)
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Manager().dict()
+    for renderer in ("text_clip", "compositor"):
+        process = context.Process(
+            target=_run,
+            args=(renderer, args.seconds, args.words_per_second, (args.width, args.height), args.fps, results)
+        )
+        process.start()
+        process.join()
+
+    print(f"{'renderer':<12}{'setup (s)':>12}{'frames/sec':>14}{'peak RSS (MB)':>16}")
+    for renderer, (setup_seconds, frames_per_second, peak_rss_mb) in results.items():
+        print(f"{renderer:<12}{setup_seconds:>12.2f}{frames_per_second:>14.1f}{peak_rss_mb:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure near-duplicate lookups in MinHashLSHIndex as the stored history grows.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_near_duplicates [--stored 10000 100000] [--queries 200] [--threshold 0.8]
+
+For every history size a database with that many synthetic post bodies is created and the index is
+bootstrapped from RedditPostTable.Content. Half of the queries are stored bodies with a few words
+edited (reposts), the other half are new bodies. The report shows query time per post, how many
+reposts were caught and how many new posts were wrongly flagged.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from utils.data_base import LocalDatabase
+from utils.minhash_lsh import MinHashLSHIndex
+
+VOCABULARY = np.array([f"w{index}" for index in range(5000)])
+
+
+def _body(rng: np.random.Generator, words: int = 250) -> str:
+    return " ".join(VOCABULARY[rng.integers(len(VOCABULARY), size=words)])
+
+
+def _edit(rng: np.random.Generator, body: str, edits: int) -> str:
+    words = body.split()
+    for position in rng.choice(len(words), size=edits, replace=False):
+        words[position] = VOCABULARY[rng.integers(len(VOCABULARY))]
+    return " ".join(words)
+
+
+def _create_database(db_path: str, bodies: list[str]):
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(os.path.dirname(__file__), "..", "schemas", "database_schema.sql")) as f:
+        conn.executescript(f.read())
+    conn.executemany(
+        "INSERT INTO RedditPostTable (PostId, Content, SubredditName) VALUES (?, ?, ?)",
+        ((f"p{index:08x}", body, "AmItheAsshole") for index, body in enumerate(bodies))
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(stored: int, queries: int, threshold: float, edits: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    bodies = [_body(rng) for _ in range(stored)]
+    reposts = [_edit(rng, bodies[index], edits) for index in rng.choice(stored, size=queries // 2, replace=False)]
+    fresh = [_body(rng) for _ in range(queries - len(reposts))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "database.db")
+        _create_database(db_path, bodies)
+        db = LocalDatabase(db_path)
+        index = MinHashLSHIndex(db)
+
+        start = time.perf_counter()
+        index.bootstrap()
+        bootstrap_seconds = time.perf_counter() - start
+
+        signatures, _ = index.hasher.signatures(reposts + fresh)
+        start = time.perf_counter()
+        matches = index.query(signatures, threshold)
+        query_seconds = time.perf_counter() - start
+        db.close()
+
+    return {
+        "stored": stored,
+        "bootstrap_s": bootstrap_seconds,
+        "query_ms_per_post": query_seconds * 1000 / queries,
+        "reposts_caught": sum(match is not None for match in matches[:len(reposts)]) / len(reposts),
+        "false_positives": sum(match is not None for match in matches[len(reposts):]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stored", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--edits", type=int, default=5, help="Words replaced in each repost (of 250)")
+    args = parser.parse_args()
+
+    print(f"{'stored':>10} {'bootstrap s':>12} {'query ms/post':>14} {'reposts caught':>15} {'false positives':>16}")
+    for stored in args.stored:
+        result = run(stored, args.queries, args.threshold, args.edits)
+        print(
+            f"{result['stored']:>10} {result['bootstrap_s']:>12.2f} {result['query_ms_per_post']:>14.3f} "
+            f"{result['reposts_caught']:>15.0%} {result['false_positives']:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
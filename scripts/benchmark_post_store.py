@@ -0,0 +1,96 @@
+"""
+Measure memory and selection latency of RedditData's columnar post store against one PostData per post.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_post_store [--subreddits 200] [--posts-per-subreddit 50] [--repeat 5]
+
+Listings are generated with the ~100 fields Reddit sends per post. "models" builds a PostData for
+every post and selects the top 3 by ups through a DataFrame, as RedditData and MostUpvotedPostStrategy
+did; "columns" is the current RedditData plus MostUpvotedPostStrategy. Memory is what tracemalloc sees
+allocated by parsing, with the raw listings excluded.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+
+from data_collector.post_selector import MostUpvotedPostStrategy
+from utils.units import PostData, RedditData, RedditDataList, Task
+
+
+def _make_listing(subreddit: str, count: int, rng: random.Random) -> dict:
+    children = []
+    for index in range(count):
+        post_id = f"{subreddit[:4]}{index:05d}{rng.randrange(1 << 20):05x}"
+        post = {f"extra_field_{field}": None for field in range(85)}
+        post.update({
+            "id": post_id, "title": f"Title of {post_id} " * 3, "selftext": "Some story text. " * rng.randint(20, 200),
+            "subreddit": subreddit, "ups": rng.randint(0, 50000), "score": rng.randint(0, 50000),
+            "num_comments": rng.randint(0, 3000), "created_utc": 1.7e9 + rng.random() * 1e6,
+            "author_fullname": f"t2_{rng.randrange(5000)}", "author": f"user{rng.randrange(5000)}",
+            "permalink": f"/r/{subreddit}/comments/{post_id}/", "upvote_ratio": rng.random(),
+            "is_self": True, "over_18": rng.random() < 0.1, "spoiler": False,
+        })
+        children.append({"kind": "t3", "data": post})
+    return {"kind": "Listing", "data": {"children": children}}
+
+
+def _parse_models(listings: dict) -> dict:
+    return {
+        subreddit: {child["data"]["id"]: PostData(**child["data"]) for child in listing["data"]["children"]}
+        for subreddit, listing in listings.items()
+    }
+
+
+def _select_models(parsed: dict):
+    for posts in parsed.values():
+        frame = pd.DataFrame([post.model_dump() for post in posts.values()])
+        for post_id in frame.sort_values(by='ups', ascending=False).head(3)['id'].values:
+            posts[post_id].filtered_out = False
+
+
+def _parse_columns(listings: dict) -> Task:
+    task = Task(name="benchmark")
+    task.reddit_datas = RedditDataList([RedditData(subreddit, listing, set()) for subreddit, listing in listings.items()])
+    return task
+
+
+def _select_columns(task: Task):
+    MostUpvotedPostStrategy().select(task)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subreddits", type=int, default=200)
+    parser.add_argument("--posts-per-subreddit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    listings = {f"sub{index}": _make_listing(f"sub{index}", args.posts_per_subreddit, rng) for index in range(args.subreddits)}
+    total_posts = args.subreddits * args.posts_per_subreddit
+    per_10k = 10000 / total_posts
+
+    print(f"{total_posts} posts in {args.subreddits} subreddits")
+    print(f"{'store':<10}{'MB per 10k':>12}{'parse (ms)':>12}{'select (ms)':>13}")
+    for name, parse, select in (("models", _parse_models, _select_models), ("columns", _parse_columns, _select_columns)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        parsed = parse(listings)
+        parse_ms = (time.perf_counter() - start) * 1000
+        held_mb = tracemalloc.get_traced_memory()[0] / (1 << 20)
+        tracemalloc.stop()
+
+        select_ms = float("inf")
+        for _ in range(args.repeat):
+            parsed = parse(listings)
+            start = time.perf_counter()
+            select(parsed)
+            select_ms = min(select_ms, (time.perf_counter() - start) * 1000)
+        print(f"{name:<10}{held_mb * per_10k:>12.1f}{parse_ms:>12.1f}{select_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
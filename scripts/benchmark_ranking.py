@@ -0,0 +1,80 @@
+"""
+Time RankingAlgorithm's vectorized scores on a large task.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_ranking [--posts 100000] [--subreddits 1000] [--repeat 5]
+
+Reports the best of --repeat runs for each registered score, for the whole rank() call (scores,
+per-subreddit ranks and write-back), and for a per-post Python loop computing only the hot score,
+as the reference a new formula must stay well below.
+"""
+import argparse
+import math
+import random
+import time
+
+from data_collector.ranking_algorithm import HOT_DECAY_SECONDS, HOT_EPOCH, SCORES, RankingAlgorithm, ScoreBatch
+from utils.units import RedditData, RedditDataList, Task
+
+
+def _make_task(posts: int, subreddits: int, rng: random.Random) -> Task:
+    per_subreddit = posts // subreddits
+    now = time.time()
+    reddit_datas = []
+    for index in range(subreddits):
+        subreddit = f"sub{index}"
+        children = [{"data": {
+            "id": f"{index}_{row}", "title": "title", "selftext": "text", "subreddit": subreddit,
+            "ups": rng.randint(0, 50000), "score": rng.randint(-100, 50000), "num_comments": rng.randint(0, 3000),
+            "created_utc": now - rng.random() * 86400 * 3, "upvote_ratio": rng.random(),
+        }} for row in range(per_subreddit)]
+        reddit_datas.append(RedditData(subreddit, {"data": {"children": children}}, set()))
+    task = Task(name="benchmark")
+    task.reddit_datas = RedditDataList(reddit_datas)
+    return task
+
+
+def _hot_loop(task: Task) -> list[float]:
+    values = []
+    for reddit_data in task.reddit_datas.reddit_datas:
+        columns = reddit_data.columns
+        for score, created_utc in zip(columns.column('score').tolist(), columns.column('created_utc').tolist()):
+            order = math.log10(max(abs(score), 1))
+            sign = 1 if score > 0 else -1 if score < 0 else 0
+            values.append(sign * order + (created_utc - HOT_EPOCH) / HOT_DECAY_SECONDS)
+    return values
+
+
+def _best_ms(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--subreddits", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    task = _make_task(args.posts, args.subreddits, random.Random(0))
+    batch = ScoreBatch(task)
+    print(f"{len(batch)} posts in {batch.group_count} subreddits")
+    print(f"{'step':<28}{'ms':>10}")
+    print(f"{'build batch':<28}{_best_ms(lambda: ScoreBatch(task), args.repeat):>10.2f}")
+    for name, score in SCORES.items():
+        print(f"{'score: ' + name:<28}{_best_ms(lambda: score(batch), args.repeat):>10.2f}")
+    print(f"{'rank() total':<28}{_best_ms(lambda: RankingAlgorithm().rank(task), args.repeat):>10.2f}")
+    print(f"{'hot, per-post Python loop':<28}{_best_ms(lambda: _hot_loop(task), args.repeat):>10.2f}")
+
+    reference = _hot_loop(task)
+    vectorized = SCORES["hot"](batch)
+    assert max(abs(a - b) for a, b in zip(reference, vectorized.tolist())) < 1e-9, "hot score mismatch"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare seen-post lookups for RedditDataCollector on a large RedditPostTable.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_seen_posts [--stored 1000000] [--subreddits 10] [--per-listing 50]
+
+"full scan" loads SELECT DISTINCT PostId into a DataFrame and a set, as collect() used to;
+"probe" asks LocalDatabase.find_existing about the ids of each listing only. Half of each
+listing's ids are already stored so both paths return non-trivial answers.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from utils.data_base import LocalDatabase
+
+
+def _create_database(db_path: str, stored: int):
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(os.path.dirname(__file__), "..", "schemas", "database_schema.sql")) as f:
+        conn.executescript(f.read())
+    conn.executemany(
+        "INSERT INTO RedditPostTable (PostId, SubredditName) VALUES (?, ?)",
+        ((f"p{index:08x}", "AmItheAsshole") for index in range(stored))
+    )
+    conn.commit()
+    conn.close()
+
+
+def _listings(stored: int, subreddits: int, per_listing: int) -> list[list[str]]:
+    listings = []
+    for listing in range(subreddits):
+        seen = [f"p{(listing * per_listing + index) * 7919 % stored:08x}" for index in range(per_listing // 2)]
+        new = [f"new{listing}_{index}" for index in range(per_listing - len(seen))]
+        listings.append(seen + new)
+    return listings
+
+
+def _full_scan(db: LocalDatabase, listings):
+    df = db.execute_read_df("SELECT DISTINCT PostId FROM RedditPostTable")
+    seen = set(df['PostId'])
+    return [seen.intersection(listing) for listing in listings]
+
+
+def _probe(db: LocalDatabase, listings):
+    return [db.find_existing("RedditPostTable", "PostId", listing) for listing in listings]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stored", type=int, default=1000000)
+    parser.add_argument("--subreddits", type=int, default=10)
+    parser.add_argument("--per-listing", type=int, default=50)
+    args = parser.parse_args()
+
+    listings = _listings(args.stored, args.subreddits, args.per_listing)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "seen.db")
+        build_start = time.perf_counter()
+        _create_database(db_path, args.stored)
+        print(f"Built database with {args.stored} posts in {time.perf_counter() - build_start:.1f}s")
+
+        db = LocalDatabase(db_path)
+        results = {}
+        print(f"{'method':<12}{'seconds':>10}{'peak MB':>10}")
+        for name, lookup in (("full scan", _full_scan), ("probe", _probe)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            results[name] = lookup(db, listings)
+            seconds = time.perf_counter() - start
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+            tracemalloc.stop()
+            print(f"{name:<12}{seconds:>10.4f}{peak_mb:>10.1f}")
+        db.close()
+
+    assert results["full scan"] == results["probe"], "lookups disagree"
+
+
+if __name__ == "__main__":
+    main()
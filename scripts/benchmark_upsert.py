@@ -0,0 +1,97 @@
+"""
+Measure upsert throughput of LocalDatabase against the previous row-at-a-time path.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_upsert [--rows 10000]
+
+Each run writes --rows rows into each of OpInfo, RedditPostTable and PostProductionTable of a
+fresh database built from schemas/database_schema.sql, then repeats the save so the second pass
+exercises the ON CONFLICT update path. "before" builds the SQL per row and commits after every
+row on a rollback-journal database, as LocalDatabase did; "after" is the current bulk API.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from utils.data_base import LocalDatabase
+
+
+def _create_schema(db_path: str):
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(os.path.dirname(__file__), "..", "schemas", "database_schema.sql")) as f:
+        conn.executescript(f.read())
+    conn.close()
+
+
+def _make_rows(count: int) -> dict:
+    op_rows, post_rows, prod_rows = [], [], []
+    for index in range(count):
+        post_id = f"p{index:07d}"
+        op_rows.append({'OpInfoId': f"t2_{index:07d}", 'OpName': f"user{index}", 'OpFollowers': None})
+        post_rows.append({
+            'PostId': post_id, 'Content': "lorem ipsum " * 40, 'Type': None, 'MediaPath': None,
+            'SubredditName': "AmItheAsshole", 'Rank': None, 'RankingAlgorithm': None,
+            'EngagmentTableId': None, 'OpInfoId': f"user{index}", 'PostProductionTableId': None
+        })
+        prod_rows.append({
+            'PostProductionTableId': str(uuid.uuid4()), 'PostId': post_id, 'ChannelId': None, 'Tags': None,
+            'Description': None, 'Credit': None, 'Title': None, 'Rank': None, 'RankingAlgorithm': None,
+            'AudioPath': None, 'VideoPath': None, 'FinalVideoPath': None, 'Narration': "narration " * 30,
+            'DateOfPosting': None, 'ViewCount': None, 'Likes': None, 'YouTubeAnalytics': None
+        })
+    return {'OpInfo': op_rows, 'RedditPostTable': post_rows, 'PostProductionTable': prod_rows}
+
+
+_PRIMARY_KEYS = {"OpInfo": "OpInfoId", "RedditPostTable": "PostId", "PostProductionTable": "PostProductionTableId"}
+
+
+def _save_before(db_path: str, tables: dict):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for table_name, data in tables.items():
+        primary_key = _PRIMARY_KEYS[table_name]
+        for row in data:
+            query = f"""
+            INSERT INTO {table_name} ({', '.join(row.keys())})
+            VALUES ({', '.join(['?' for _ in row.keys()])})
+            ON CONFLICT ({primary_key})
+            DO UPDATE SET {', '.join([f"{col}=excluded.{col}" for col in row.keys() if col != primary_key])}
+            """
+            cursor.execute(query, tuple(row.values()))
+            conn.commit()
+    conn.close()
+
+
+def _save_after(db_path: str, tables: dict):
+    db = LocalDatabase(db_path)
+    with db.transaction():
+        for table_name, data in tables.items():
+            db.execute_upsert(table_name, data)
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    tables = _make_rows(args.rows)
+    total_rows = sum(len(data) for data in tables.values())
+
+    print(f"{'path':<8}{'pass':<8}{'seconds':>10}{'rows/sec':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, save in (("before", _save_before), ("after", _save_after)):
+            db_path = os.path.join(tmp, f"{name}.db")
+            _create_schema(db_path)
+            for label in ("insert", "update"):
+                start = time.perf_counter()
+                save(db_path, tables)
+                seconds = time.perf_counter() - start
+                print(f"{name:<8}{label:<8}{seconds:>10.2f}{total_rows / seconds:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
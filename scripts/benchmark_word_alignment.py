@@ -0,0 +1,75 @@
+"""
+Compare the local word aligner against whisper-1 on latency and timing accuracy.
+
+Usage (from the repository root):
+    python -m scripts.benchmark_word_alignment <audio.mp3> <narration.txt> [<audio.mp3> <narration.txt> ...]
+
+Whisper's word timings are used as the reference. Words are matched between the two
+outputs by normalized text, and the start/end differences of matched words are reported.
+"""
+import difflib
+import sys
+import time
+
+import numpy as np
+
+from scripts.LLM import LLMClient
+from video_pipeline.word_aligner import LocalWordAligner
+
+
+def _normalize(word: str) -> str:
+    return "".join(ch for ch in word.lower() if ch.isalnum())
+
+
+def compare(reference_words, candidate_words) -> dict:
+    reference_tokens = [_normalize(word.word) for word in reference_words]
+    candidate_tokens = [_normalize(word.word) for word in candidate_words]
+    matcher = difflib.SequenceMatcher(a=reference_tokens, b=candidate_tokens, autojunk=False)
+    start_errors, end_errors = [], []
+    for block in matcher.get_matching_blocks():
+        for offset in range(block.size):
+            reference, candidate = reference_words[block.a + offset], candidate_words[block.b + offset]
+            start_errors.append(abs(reference.start - candidate.start))
+            end_errors.append(abs(reference.end - candidate.end))
+    start_errors, end_errors = np.array(start_errors), np.array(end_errors)
+    return {
+        "matched_words": f"{len(start_errors)}/{len(reference_words)}",
+        "mean_start_error_s": float(start_errors.mean()) if len(start_errors) else float("nan"),
+        "p90_start_error_s": float(np.percentile(start_errors, 90)) if len(start_errors) else float("nan"),
+        "mean_end_error_s": float(end_errors.mean()) if len(end_errors) else float("nan"),
+        "within_100ms": float((start_errors <= 0.1).mean()) if len(start_errors) else float("nan"),
+        "within_250ms": float((start_errors <= 0.25).mean()) if len(start_errors) else float("nan"),
+    }
+
+
+def main(argv: list[str]):
+    if len(argv) < 2 or len(argv) % 2:
+        print(__doc__)
+        sys.exit(1)
+
+    llm = LLMClient()
+    aligner = LocalWordAligner()
+    for audio_path, narration_path in zip(argv[0::2], argv[1::2]):
+        with open(narration_path, "r") as f:
+            narration = f.read()
+
+        whisper_start = time.perf_counter()
+        with open(audio_path, "rb") as audio_file:
+            reference = llm.client.audio.transcriptions.create(
+                file=audio_file, model="whisper-1", response_format="verbose_json", timestamp_granularities=["word"]
+            )
+        whisper_latency = time.perf_counter() - whisper_start
+
+        local_start = time.perf_counter()
+        candidate = aligner.align(audio_path, narration)
+        local_latency = time.perf_counter() - local_start
+
+        print(f"{audio_path}:")
+        print(f"  whisper-1 latency: {whisper_latency:.3f}s ({len(reference.words)} words)")
+        print(f"  local     latency: {local_latency:.3f}s ({len(candidate.words)} words)")
+        for name, value in compare(reference.words, candidate.words).items():
+            print(f"  {name}: {value if isinstance(value, str) else round(value, 3)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
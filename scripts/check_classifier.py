@@ -0,0 +1,98 @@
+"""
+Offline check of ClassificationAlgorithm with the local HashingEmbedder.
+
+Usage (from the repository root):
+    python -m scripts.check_classifier
+
+Classifies a handful of posts close to the seed examples against a vector store in a temporary
+directory and checks that:
+  - each post gets the label of the examples it resembles, and only usable posts stay eligible;
+  - a post flagged over_18 by Reddit is labelled nsfw whatever its text;
+  - classifying again with a reopened vector store embeds nothing;
+  - when the embedder fails, the task still finishes with every post unlabelled and eligible.
+Exits non-zero on the first failed check.
+"""
+import argparse
+import logging
+import tempfile
+
+import numpy as np
+
+from data_collector.classification_algorithm import ClassificationAlgorithm, HashingEmbedder, USABLE, NSFW, OFF_TOPIC
+from utils.units import Task, RedditData, RedditDataList
+
+# (id, title, selftext, over_18, expected label)
+POSTS = [
+    ("p1", "AITA for refusing to go to my sister's wedding?", "She insulted my partner at dinner.", False, USABLE),
+    ("p2", "TIFU by sending a message about my boss to my boss", "", False, USABLE),
+    ("p3", "Weekly discussion thread", "Reminder of the subreddit rules and posting guidelines.", False, OFF_TOPIC),
+    ("p4", "Check out my YouTube channel", "Link in the comments, please subscribe.", False, OFF_TOPIC),
+    ("p5", "NSFW adult content", "Explicit photos and nudity.", False, NSFW),
+    ("p6", "My roommate kept eating my food", "So I finally confronted him and it did not go well.", True, NSFW),
+]
+
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder that counts the texts it embeds."""
+    def __init__(self, dim: int = 256):
+        super().__init__(dim)
+        self.embedded = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+class FailingEmbedder:
+    model = "failing"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise RuntimeError("embeddings endpoint unavailable")
+
+
+def _task() -> Task:
+    listing = {"data": {"children": [
+        {"data": {"id": post_id, "title": title, "selftext": selftext, "subreddit": "check", "over_18": over_18}}
+        for post_id, title, selftext, over_18, _ in POSTS
+    ]}}
+    task = Task(name="check-classifier")
+    task.reddit_datas = RedditDataList([RedditData("check", listing, set())])
+    return task
+
+
+def _check(condition: bool, message: str):
+    if not condition:
+        raise SystemExit(f"FAILED: {message}")
+    print(f"ok: {message}")
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    expected = [label for *_, label in POSTS]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embedder = CountingEmbedder()
+        columns = ClassificationAlgorithm(embedder=embedder, store_dir=tmp).classify(_task()).reddit_datas.reddit_datas[0].columns
+        _check(list(columns.labels) == expected, f"labels {list(columns.labels)} match {expected}")
+        _check(list(columns.eligible) == [label == USABLE for label in expected], "only usable posts are eligible")
+        _check(columns.labels[-1] == NSFW, "over_18 forces nsfw")
+        first_run = embedder.embedded
+
+        embedder = CountingEmbedder()
+        columns = ClassificationAlgorithm(embedder=embedder, store_dir=tmp).classify(_task()).reddit_datas.reddit_datas[0].columns
+        _check(first_run > 0 and embedder.embedded == 0,
+               f"reopened vector store embeds nothing ({first_run} texts on the first run)")
+        _check(list(columns.labels) == expected, "labels are the same from stored vectors")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        task = ClassificationAlgorithm(embedder=FailingEmbedder(), store_dir=tmp).classify(_task())
+        reddit_data = task.reddit_datas.reddit_datas[0]
+        _check(bool(np.all(reddit_data.columns.eligible)), "posts stay eligible when embedding fails")
+        _check(all(reddit_data.get_post(post_id).classification is None for post_id, *_ in POSTS),
+               "posts stay unlabelled when embedding fails")
+    print("Classifier check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Local stand-in for the Reddit listing API, for exercising RedditDataCollector without the network.
+
+Usage (from the repository root):
+    python -m scripts.fake_reddit_server [--port 8765] [--latency 0.05] [--throttle-every 7]
+                                         [--window-requests 600] [--window-seconds 60] [--check]
+
+Serves /r/<subreddit>/{hot,new,top}.json with generated posts, paged with `limit`/`after`, and
+Reddit's X-Ratelimit-Used, X-Ratelimit-Remaining and X-Ratelimit-Reset headers. Pages carry an
+ETag and Last-Modified and answer 304 to a matching If-None-Match/If-Modified-Since. Every
+--throttle-every'th request is answered with 429 and Retry-After.
+
+With --check the script is a test of RedditDataCollector: the server runs in the background with a
+tight rate-limit window, and a collector backed by a temporary database fetches a batch of
+subreddits three times: a cold run, a run with nothing new and a run after a few posts were
+published. A second batch is then collected as the pipeline does, saving only PostSelector's top
+posts, and must still get 304s and only the newly published posts afterwards. It checks paging,
+304 handling, retries of the injected 429s, listing cursors and that the rate limiter stays within
+the server window, and exits non-zero if any check fails. The window options do not
+apply to --check.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# --check: a server window tight enough that the collector's rate limiter has to follow it,
+# and listings that take several pages
+CHECK_WINDOW_REQUESTS = 40
+CHECK_WINDOW_SECONDS = 5
+CHECK_SUBREDDITS = 12
+CHECK_WORKERS = 4
+CHECK_MAX_PAGES = 3
+CHECK_PAGE_SIZE = 50
+CHECK_PUBLISHED = 5
+
+
+class FakeRedditState:
+    def __init__(self, latency: float, throttle_every: int, window_requests: int, window_seconds: float,
+                 posts_per_subreddit: int = 120):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.window_requests = window_requests
+        self.window_seconds = window_seconds
+        self.posts_per_subreddit = posts_per_subreddit
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled = 0
+        # Requests beyond window_requests, i.e. ones the client's rate limiter should have held back
+        self.window_overruns = 0
+        self.window_start = time.monotonic()
+        self.window_used = 0
+        # Newest first, per subreddit, with the time of the last publish
+        self.posts = {}
+        self.modified_at = {}
+
+    def next_request(self) -> tuple[bool, int, float]:
+        """Count a request; return (throttle it, requests left in the window, seconds until reset)."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window_seconds:
+                self.window_start, self.window_used = now, 0
+            self.request_count += 1
+            self.window_used += 1
+            throttle = bool(self.throttle_every) and self.request_count % self.throttle_every == 0
+            if self.window_used > self.window_requests:
+                self.window_overruns += 1
+                throttle = True
+            if throttle:
+                self.throttled += 1
+            remaining = max(0, self.window_requests - self.window_used)
+            reset = self.window_seconds - (now - self.window_start)
+            return throttle, remaining, reset
+
+    def _make_post(self, subreddit: str, index: int) -> dict:
+        post_id = f"{subreddit.lower()[:6]}{index:05d}"
+        return {"kind": "t3", "data": {
+            "id": post_id,
+            "title": f"Post {index} in r/{subreddit}",
+            "selftext": f"Body of post {index}. " * 20,
+            "subreddit": subreddit,
+            "ups": 10 * index % 997,
+            "score": 10 * index % 997,
+            "num_comments": index % 89,
+            "created_utc": time.time(),
+            "author_fullname": f"t2_{post_id}",
+            "author": f"author_{post_id}",
+            "permalink": f"/r/{subreddit}/comments/{post_id}/",
+            "upvote_ratio": 0.9,
+            "is_self": True,
+            "over_18": False,
+            "spoiler": False,
+        }}
+
+    def _posts_of(self, subreddit: str) -> list[dict]:
+        if subreddit not in self.posts:
+            self.posts[subreddit] = [self._make_post(subreddit, index) for index in reversed(range(self.posts_per_subreddit))]
+            self.modified_at[subreddit] = int(time.time())
+        return self.posts[subreddit]
+
+    def publish(self, count: int):
+        """Add `count` new posts to the top of every known subreddit."""
+        with self.lock:
+            for subreddit, posts in self.posts.items():
+                first = len(posts)
+                self.posts[subreddit] = [self._make_post(subreddit, first + i) for i in reversed(range(count))] + posts
+                # Last-Modified has one-second resolution; make sure it moves
+                self.modified_at[subreddit] = max(int(time.time()), self.modified_at[subreddit] + 1)
+
+    def listing(self, subreddit: str, listing: str, limit: int, after: str = None) -> tuple[dict, int]:
+        """Return one page of a listing and the subreddit's last modification time."""
+        with self.lock:
+            posts = list(self._posts_of(subreddit))
+            modified_at = self.modified_at[subreddit]
+        if listing == "top":
+            posts.sort(key=lambda post: -post["data"]["score"])
+        start = 0
+        if after:
+            names = [f"t3_{post['data']['id']}" for post in posts]
+            start = names.index(after) + 1 if after in names else len(posts)
+        page = posts[start:start + limit]
+        next_after = f"t3_{page[-1]['data']['id']}" if page and start + limit < len(posts) else None
+        return {"kind": "Listing", "data": {"after": next_after, "before": None, "children": page}}, modified_at
+
+
+def make_handler(state: FakeRedditState):
+    class FakeRedditHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) != 3 or parts[0] != "r" or parts[2] not in ("hot.json", "new.json", "top.json"):
+                self.send_error(404)
+                return
+            time.sleep(state.latency)
+            throttle, remaining, reset = state.next_request()
+            if throttle:
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            query = parse_qs(parsed.query)
+            limit = min(100, int(query.get("limit", ["25"])[0]))
+            after = query.get("after", [None])[0]
+            listing, modified_at = state.listing(parts[1], parts[2][:-len(".json")], limit, after)
+            body = json.dumps(listing).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if_modified_since = self.headers.get("If-Modified-Since")
+            not_modified = self.headers.get("If-None-Match") == etag
+            if not not_modified and if_modified_since and self.headers.get("If-None-Match") is None:
+                not_modified = modified_at <= parsedate_to_datetime(if_modified_since).timestamp()
+
+            self.send_response(304 if not_modified else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(modified_at, usegmt=True))
+            self.send_header("X-Ratelimit-Used", str(state.window_requests - remaining))
+            self.send_header("X-Ratelimit-Remaining", str(remaining))
+            self.send_header("X-Ratelimit-Reset", str(int(reset)))
+            if not_modified:
+                self.end_headers()
+                return
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeRedditHandler
+
+
+def start_server(state: FakeRedditState, port: int = 0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _check(state: FakeRedditState, server: ThreadingHTTPServer) -> list[str]:
+    """Run the collector against the server; return a description of every failed check."""
+    from data_collector.post_selector import PostSelector
+    from data_collector.reddit_data_collector import RedditDataCollector
+    from utils.data_base import LocalDatabase, DataSaver
+    from utils.units import Task, ListingTypeEnum
+
+    # Importing the collector configures INFO logging; keep the report readable
+    logging.getLogger().setLevel(logging.WARNING)
+    host, port = server.server_address
+    subreddits = [f"fake{index}" for index in range(CHECK_SUBREDDITS)]
+    listing_types = [ListingTypeEnum.NEW, ListingTypeEnum.HOT]
+    failures = []
+
+    def expect(condition: bool, message: str):
+        print(f"{'ok' if condition else 'FAILED'}: {message}")
+        if not condition:
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "check.db")
+        with open(os.path.join(os.path.dirname(__file__), "..", "schemas", "database_schema.sql")) as f:
+            schema = f.read()
+        db = LocalDatabase(db_path)
+        db.conn.executescript(schema)
+        data_saver = DataSaver(db)
+        collector = RedditDataCollector(db, reddit_base_url=f"http://{host}:{port}", max_workers=CHECK_WORKERS,
+                                        requests_per_minute=600, max_pages=CHECK_MAX_PAGES, page_size=CHECK_PAGE_SIZE)
+        collector.base_delay = 0.2
+
+        def run(name: str, subreddits: list[str], listing_types: list, top_k: bool = False) -> tuple[dict, int]:
+            """Collect the subreddits and save every collected post, or only PostSelector's top k when top_k."""
+            task = Task(name=f"fake-reddit-check-{name}")
+            task.possible_subreddits = subreddits
+            task.listing_types = listing_types
+            before = collector.fetch_stats()
+            start = time.perf_counter()
+            task = collector.collect(task)
+            elapsed = time.perf_counter() - start
+            after = collector.fetch_stats()
+
+            missing = set(subreddits) - set(task.reddit_datas.subreddit_to_reddit_data)
+            expect(not missing, f"{name}: every subreddit collected (missing {sorted(missing)})")
+            posts = sum(len(reddit_data) for reddit_data in task.reddit_datas.reddit_datas)
+            if top_k:
+                task = PostSelector().select(task)
+            else:
+                for reddit_data in task.reddit_datas.reddit_datas:
+                    reddit_data.select_posts(reddit_data.columns.ids)
+            data_saver.save_task(task)
+            delta = {key: after[key] - before[key] for key in ("requests", "bytes_received", "not_modified", "retries")}
+            print(f"{name:<12}{elapsed:>9.2f}{delta['requests']:>10}{delta['bytes_received'] / 1024:>9.0f}"
+                  f"{posts:>8}{delta['not_modified']:>6}{delta['retries']:>9}")
+            return delta, posts
+
+        print(f"{'run':<12}{'seconds':>9}{'requests':>10}{'KiB':>9}{'posts':>8}{'304s':>6}{'retries':>9}")
+        # Cold: every post is reached by paging, through injected 429s and a tight server window
+        stats, posts = run("cold", subreddits, listing_types)
+        expect(posts == state.posts_per_subreddit * len(subreddits),
+               f"cold: paging reached all {state.posts_per_subreddit} posts of every subreddit ({posts} in total)")
+        expect(stats["retries"] > 0 and state.throttled > 0, "cold: injected 429s were retried")
+
+        # Unchanged: every listing is answered with 304 and nothing is refetched
+        stats, posts = run("unchanged", subreddits, listing_types)
+        expect(stats["not_modified"] == len(subreddits) * len(listing_types) and posts == 0,
+               f"unchanged: every listing not modified ({stats['not_modified']} 304s, {posts} posts)")
+
+        # Published: only the new posts come back
+        state.publish(CHECK_PUBLISHED)
+        stats, posts = run("published", subreddits, listing_types)
+        expect(posts == CHECK_PUBLISHED * len(subreddits),
+               f"published: {CHECK_PUBLISHED} new posts per subreddit ({posts} in total)")
+
+        # Top k: as in a pipeline run, only the selected posts are saved; the cursors still cover everything fetched
+        top_k_subreddits = [f"topk{index}" for index in range(CHECK_SUBREDDITS)]
+        new_only = [ListingTypeEnum.NEW]
+        cold_stats, posts = run("topk-cold", top_k_subreddits, new_only, top_k=True)
+        stats, posts = run("topk-again", top_k_subreddits, new_only, top_k=True)
+        expect(stats["not_modified"] == len(top_k_subreddits) and stats["requests"] < cold_stats["requests"],
+               f"top k: unchanged listings not modified after saving only the selection "
+               f"({stats['not_modified']} 304s, {stats['requests']} requests vs {cold_stats['requests']})")
+        state.publish(CHECK_PUBLISHED)
+        stats, posts = run("topk-new", top_k_subreddits, new_only, top_k=True)
+        expect(posts == CHECK_PUBLISHED * len(top_k_subreddits),
+               f"top k: only the {CHECK_PUBLISHED} published posts per subreddit are fetched ({posts} in total)")
+        db.close()
+
+    # Requests already in flight when the window ran out can overshoot it by at most one per worker
+    print(f"Server saw {state.request_count} requests, throttled {state.throttled}, "
+          f"{state.window_overruns} beyond its window")
+    expect(state.window_overruns <= CHECK_WORKERS,
+           f"rate limiter kept within the server window ({state.window_overruns} overruns)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-every", type=int, default=7, help="0 disables injected 429s")
+    parser.add_argument("--window-requests", type=int, default=600)
+    parser.add_argument("--window-seconds", type=float, default=60)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    if args.check:
+        state = FakeRedditState(args.latency, args.throttle_every, CHECK_WINDOW_REQUESTS, CHECK_WINDOW_SECONDS)
+        server = start_server(state)
+        failures = _check(state, server)
+        server.shutdown()
+        if failures:
+            raise SystemExit(f"{len(failures)} checks failed")
+        print("All checks passed")
+        return
+    state = FakeRedditState(args.latency, args.throttle_every, args.window_requests, args.window_seconds)
+    server = start_server(state, args.port)
+    print(f"Fake Reddit API listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
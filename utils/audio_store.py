@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from utils import mp3
+
+logger = logging.getLogger(__name__)
+
+
+class AudioStore:
+    """
+    Content-addressed store of synthesized narration audio.
+    Files are keyed by a hash of (narration, voice, model) and handed out to
+    per-task paths through hardlinks, so the same narration is only voiced once.
+    """
+    def __init__(self, root_dir: str = os.path.join("generated_audio", ".store"), max_bytes: int = 2 * 1024 ** 3,
+                 stale_part_seconds: float = 3600.0):
+        """
+        :param root_dir: Directory holding the stored mp3s and their index.
+        :param max_bytes: Least recently used files are evicted once the store grows beyond this size.
+        :param stale_part_seconds: Partial writes untouched for this long are left over from a crash and deleted.
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.stale_part_seconds = stale_part_seconds
+        os.makedirs(root_dir, exist_ok=True)
+        # Shared by the streaming executor's worker threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root_dir, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS AudioStoreEntry (
+                AudioHash TEXT PRIMARY KEY,
+                Path TEXT,
+                SizeBytes INT,
+                Duration REAL,
+                ChunkDurations TEXT,
+                CreatedAt REAL,
+                LastAccessedAt REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS IdxAudioStoreEntryLastAccessedAt ON AudioStoreEntry (LastAccessedAt)")
+        self.conn.commit()
+        # Files are only indexed once complete (commit()) and lookup() re-checks each one it hands out,
+        # so startup only clears out partial writes instead of re-reading every stored file
+        self.remove_stale_parts()
+
+    @staticmethod
+    def make_key(text: str, voice: str, model: str) -> str:
+        payload = json.dumps([text, voice, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.root_dir, f"{key}.mp3")
+
+    def temp_path(self, key: str) -> str:
+        """Path a producer should write to before calling commit(); never read from directly."""
+        return self._path_for(key) + f".{threading.get_ident()}.part"
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Return the stored path for key, or None if it is missing or truncated.
+        Truncated files are dropped so the caller synthesizes them again.
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT Path FROM AudioStoreEntry WHERE AudioHash = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            path = row[0]
+            if not mp3.is_complete(path):
+                logger.warning(f"Stored audio {path} is missing or truncated, discarding it")
+                self._remove_locked(key, path)
+                return None
+            self.conn.execute("UPDATE AudioStoreEntry SET LastAccessedAt = ? WHERE AudioHash = ?", (time.time(), key))
+            self.conn.commit()
+            return path
+
+    def chunk_durations(self, key: str) -> Optional[list[float]]:
+        """Per-chunk durations recorded when the stored file was voiced in chunks."""
+        with self._lock:
+            row = self.conn.execute("SELECT ChunkDurations FROM AudioStoreEntry WHERE AudioHash = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def commit(self, key: str, temp_path: str, chunk_durations: list[float] = None) -> str:
+        """
+        Verify a freshly written file and move it into the store.
+        :param chunk_durations: Per-chunk durations to keep alongside the file, if it was voiced in chunks.
+        :raises ValueError: If the file is not a complete mp3.
+        """
+        info = mp3.read_info(temp_path)
+        if not info.complete:
+            os.remove(temp_path)
+            raise ValueError(f"Synthesized audio {temp_path} is truncated ({info})")
+        path = self._path_for(key)
+        os.replace(temp_path, path)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO AudioStoreEntry (AudioHash, Path, SizeBytes, Duration, ChunkDurations, CreatedAt, LastAccessedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (AudioHash)
+                DO UPDATE SET Path=excluded.Path, SizeBytes=excluded.SizeBytes, Duration=excluded.Duration,
+                              ChunkDurations=excluded.ChunkDurations, LastAccessedAt=excluded.LastAccessedAt
+                """,
+                (key, path, os.path.getsize(path), info.duration,
+                 json.dumps(chunk_durations) if chunk_durations else None, now, now)
+            )
+            self.conn.commit()
+        # The caller links the new file next, so it is never the one evicted
+        self.evict(keep=key)
+        return path
+
+    def link_to(self, key: str, dest_path: str) -> str:
+        """
+        Expose the stored file at dest_path, via a hardlink where the filesystem allows it.
+        Holds the lock, so the file cannot be evicted halfway through.
+        :raises FileNotFoundError: If the file is no longer stored (e.g. evicted since lookup()).
+        """
+        source = self._path_for(key)
+        with self._lock:
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Stored audio {source} was evicted")
+            if os.path.exists(dest_path):
+                if os.path.samefile(source, dest_path):
+                    return dest_path
+                os.remove(dest_path)
+            try:
+                os.link(source, dest_path)
+            except OSError:
+                shutil.copyfile(source, dest_path)
+        return dest_path
+
+    def evict(self, keep: str = None) -> int:
+        """
+        Remove least recently used files until the store fits in max_bytes.
+        Hardlinked task copies stay valid since only the store's link is removed.
+        :param keep: Key that must not be evicted.
+        :return: Number of evicted files.
+        """
+        evicted = 0
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(SizeBytes), 0) FROM AudioStoreEntry").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            for key, path, size in self.conn.execute(
+                "SELECT AudioHash, Path, SizeBytes FROM AudioStoreEntry ORDER BY LastAccessedAt ASC"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self._remove_locked(key, path)
+                total -= size
+                evicted += 1
+        logger.info(f"Evicted {evicted} least recently used audio files from {self.root_dir}")
+        return evicted
+
+    def remove_stale_parts(self) -> int:
+        """
+        Delete partial writes older than stale_part_seconds. Newer ones may still be written by
+        another thread or process, which keeps touching them with every chunk it appends.
+        :return: Number of deleted files.
+        """
+        cutoff = time.time() - self.stale_part_seconds
+        removed = 0
+        for name in os.listdir(self.root_dir):
+            if not name.endswith(".part"):
+                continue
+            path = os.path.join(self.root_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                # Committed or cleaned up by its writer meanwhile
+                continue
+        if removed:
+            logger.warning(f"Deleted {removed} stale partial audio files from {self.root_dir}")
+        return removed
+
+    def verify(self) -> int:
+        """
+        Read every stored file and drop index entries whose file is missing or truncated, then delete
+        stale partial writes. Reads the whole store, so it is a maintenance call, not run at startup.
+        :return: Number of discarded files.
+        """
+        discarded = 0
+        with self._lock:
+            for key, path in self.conn.execute("SELECT AudioHash, Path FROM AudioStoreEntry").fetchall():
+                if not mp3.is_complete(path):
+                    self._remove_locked(key, path)
+                    discarded += 1
+        if discarded:
+            logger.warning(f"Discarded {discarded} truncated audio files from {self.root_dir}")
+        return discarded + self.remove_stale_parts()
+
+    def _remove_locked(self, key: str, path: str):
+        self.conn.execute("DELETE FROM AudioStoreEntry WHERE AudioHash = ?", (key,))
+        self.conn.commit()
+        if os.path.exists(path):
+            os.remove(path)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from utils import mp3, mp4
+from utils.units import Task, PostData, RedditData, RedditDataList
+
+logger = logging.getLogger(__name__)
+
+# PostData fields each per-post stage produces; a checkpoint stores them so a resumed run can put them back
+STAGE_FIELDS = {
+    "generate_text": ("narration",),
+    "synthesize_audio": ("synthesized_audio_file_path", "narration_chunks", "audio_chunk_durations"),
+    "select_video": ("video_file_path", "video_start_offset"),
+    "edit_video": ("final_video_path",),
+}
+# Field holding the file a stage wrote, checked on resume; stages without one are valid when their fields are set
+STAGE_ARTIFACTS = {
+    "synthesize_audio": "synthesized_audio_file_path",
+    "select_video": "video_file_path",
+    "edit_video": "final_video_path",
+}
+DONE = "done"
+FAILED = "failed"
+
+
+class CheckpointStore:
+    """
+    Durable per-post, per-stage progress of pipeline tasks.
+
+    After post selection the selected posts of a task are snapshotted; after each per-post stage the
+    stage's status, artifact path and output fields are recorded. Records are buffered and written in
+    batches (at batch_size records or flush_interval seconds, and on flush()) to a WAL database with
+    synchronous=NORMAL, so stage threads never wait on an fsync. A resumed run restores the snapshot
+    and skips every stage whose recorded output is still valid.
+    """
+    def __init__(self, db_path: str = "checkpoints.db", batch_size: int = 64, flush_interval: float = 1.0):
+        """
+        :param db_path: SQLite file holding the checkpoints.
+        :param batch_size: Buffered records that trigger a write.
+        :param flush_interval: Seconds after which buffered records are written by the next record() call.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: list[tuple] = []
+        self._last_flush = time.monotonic()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS TaskSelection (
+                TaskName VARCHAR(255),
+                PostId VARCHAR(20),
+                Subreddit VARCHAR(255),
+                Post TEXT,
+                PRIMARY KEY (TaskName, PostId)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS PostStageCheckpoint (
+                TaskName VARCHAR(255),
+                PostId VARCHAR(20),
+                Stage VARCHAR(100),
+                Status VARCHAR(20),
+                ArtifactPath TEXT,
+                Output TEXT,
+                UpdatedAt REAL,
+                PRIMARY KEY (TaskName, PostId, Stage)
+            )
+        """)
+        self.conn.commit()
+
+    def save_selection(self, task: Task) -> None:
+        """Snapshot the selected posts of a task, replacing any earlier snapshot and checkpoints under the same name."""
+        rows = [
+            (task.name, post.id, subreddit, post.model_dump_json())
+            for subreddit, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items()
+            for post in reddit_data.get_all_posts()
+        ]
+        with self._lock:
+            self.conn.execute("DELETE FROM TaskSelection WHERE TaskName = ?", (task.name,))
+            self.conn.execute("DELETE FROM PostStageCheckpoint WHERE TaskName = ?", (task.name,))
+            self.conn.executemany("INSERT INTO TaskSelection (TaskName, PostId, Subreddit, Post) VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def restore_task(self, task: Task) -> bool:
+        """
+        Rebuild the selected posts of a task from its snapshot, with the output of every stage whose
+        checkpoint is still valid applied to them.
+        :return: False when the task has no snapshot.
+        """
+        with self._lock:
+            selection = self.conn.execute(
+                "SELECT PostId, Subreddit, Post FROM TaskSelection WHERE TaskName = ?", (task.name,)
+            ).fetchall()
+        if not selection:
+            return False
+
+        posts_by_subreddit: dict[str, list[dict]] = {}
+        for _, subreddit, post in selection:
+            posts_by_subreddit.setdefault(subreddit, []).append(json.loads(post))
+        reddit_data_list = RedditDataList([])
+        for subreddit, posts in posts_by_subreddit.items():
+            reddit_data = RedditData(subreddit, {"data": {"children": [{"data": post} for post in posts]}}, set())
+            reddit_data.select_posts([post["id"] for post in posts])
+            for post in posts:
+                model = reddit_data.get_post(post["id"])
+                # Ranking, classification and any stage output present at selection time
+                for field, value in post.items():
+                    setattr(model, field, value)
+            reddit_data_list.add_reddit_data(reddit_data)
+        task.reddit_datas = reddit_data_list
+
+        restored = 0
+        posts = {post.id: post for post in task.reddit_datas.get_all_posts()}
+        for post_id, stage, output in self._done(task.name):
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            for field, value in json.loads(output).items():
+                setattr(post, field, value)
+            restored += 1
+        logger.info(f"Restored task {task.name}: {len(posts)} posts, {restored} completed stages")
+        return True
+
+    def _done(self, task_name: str) -> list[tuple[str, str, str]]:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT PostId, Stage, Output FROM PostStageCheckpoint WHERE TaskName = ? AND Status = ?",
+                (task_name, DONE)
+            ).fetchall()
+
+    @staticmethod
+    def is_valid(post: PostData, stage: str) -> bool:
+        """
+        Whether a post holds usable output of a stage: its fields are set and its artifact is complete.
+        Audio must end on an mp3 frame boundary and mp4 video must have its boxes written out to the
+        end of the file, so a write cut short by a crash is produced again.
+        """
+        if not getattr(post, STAGE_FIELDS[stage][0]):
+            return False
+        artifact = STAGE_ARTIFACTS.get(stage)
+        if artifact is None:
+            return True
+        path = getattr(post, artifact)
+        if stage == "synthesize_audio":
+            return mp3.is_complete(path)
+        if path.lower().endswith(mp4.MP4_EXTENSIONS):
+            return mp4.is_complete(path)
+        return os.path.isfile(path) and os.path.getsize(path) > 0
+
+    def completed(self, task: Task, stage: str) -> set[str]:
+        """Ids of the task's selected posts whose output of stage is valid and need not be produced again."""
+        return {post.id for post in task.reddit_datas.get_all_posts() if self.is_valid(post, stage)}
+
+    def record(self, task_name: str, post: PostData, stage: str, status: Optional[str] = None) -> None:
+        """
+        Buffer the checkpoint of one post after a stage; the status is derived from the output when not given.
+        """
+        if status is None:
+            status = DONE if self.is_valid(post, stage) else FAILED
+        artifact = STAGE_ARTIFACTS.get(stage)
+        output = json.dumps({field: getattr(post, field) for field in STAGE_FIELDS[stage]})
+        row = (task_name, post.id, stage, status, getattr(post, artifact) if artifact else None, output, time.time())
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def record_stage(self, task: Task, stage: str, skip_post_ids: set = None) -> None:
+        """Buffer the checkpoints of every selected post of a task after a task-level stage, then write them."""
+        skip_post_ids = skip_post_ids or set()
+        for post in task.reddit_datas.get_all_posts():
+            if post.id not in skip_post_ids:
+                self.record(task.name, post, stage)
+        self.flush()
+
+    def _flush_locked(self):
+        if self._pending:
+            self.conn.executemany(
+                "INSERT INTO PostStageCheckpoint (TaskName, PostId, Stage, Status, ArtifactPath, Output, UpdatedAt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (TaskName, PostId, Stage) DO UPDATE SET Status = excluded.Status, "
+                "ArtifactPath = excluded.ArtifactPath, Output = excluded.Output, UpdatedAt = excluded.UpdatedAt",
+                self._pending
+            )
+            self.conn.commit()
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        """Write every buffered checkpoint."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
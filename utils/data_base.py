@@ -1,20 +1,53 @@
 import sqlite3
 import logging
+import time
 import uuid
-from typing import Any, List, Tuple, Optional
-from utils.units import Task, RedditData, RedditDataList
+from contextlib import contextmanager
+from typing import Any, Iterable, List, Tuple, Optional
+from utils.units import Task, PostData, RedditData, RedditDataList
 import pandas as pd
 
 class LocalDatabase:
+    # Stays below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds (999)
+    MAX_IN_PARAMETERS = 900
+
     def __init__(self, db_path: str = 'database.db'):
         """
         Initialize the database connection.
         :param db_path: Path to the SQLite database file.
         """
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, cached_statements=256)
+        # WAL lets readers run during a save, and with synchronous=NORMAL a commit no longer waits on an fsync
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-65536")
+        self.conn.execute("PRAGMA busy_timeout=5000")
         self.cursor = self.conn.cursor()
-        self.table_name_to_primary_key = {"opinfo":"OpInfoId", "redditposttable":"PostId", "postproductiontable":"PostProductionTableId"}
+        self.table_name_to_primary_key = {"opinfo":"OpInfoId", "redditposttable":"PostId", "postproductiontable":"PostProductionTableId", "listingcursor":"SubredditName, Listing",
+                                          "minhashsignature":"PostId", "minhashbucket":"BucketKey, PostId", "minhashindexmeta":"Key"}
+        # Upsert SQL per (table, columns); sqlite3 keeps the prepared statement for each string
+        self._upsert_statements = {}
+        self._transaction_depth = 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group every write made inside the block into a single transaction, committed on exit
+        and rolled back if the block raises. Nested blocks join the outermost transaction.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self.conn.commit()
 
     def execute_write(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> None:
         """
@@ -26,23 +59,51 @@ class LocalDatabase:
             self.cursor.execute(query, params)
         else:
             self.cursor.execute(query)
-        self.conn.commit()
+        if not self._transaction_depth:
+            self.conn.commit()
+
+    def _upsert_statement(self, table_name: str, columns: Tuple[str, ...]) -> str:
+        key = (table_name, columns)
+        query = self._upsert_statements.get(key)
+        if query is None:
+            primary_key = self.table_name_to_primary_key.get(table_name.lower())
+            updates = [f"{col}=excluded.{col}" for col in columns if col != primary_key]
+            conflict = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+            query = f"""
+            INSERT INTO {table_name} ({', '.join(columns)})
+            VALUES ({', '.join(['?' for _ in columns])})
+            ON CONFLICT ({primary_key})
+            {conflict}
+            """
+            self._upsert_statements[key] = query
+        return query
 
     def execute_upsert(self, table_name: str, data:List[dict]) -> None:
         """
-        Execute an insert query.
+        Insert or update rows in bulk.
+        Rows are grouped by their column set and each group is written with one executemany call,
+        all inside a single transaction (or the caller's, when called within transaction()).
         :param table_name: Name of the table to insert into.
         :param data: List of dictionaries containing the data to insert.
         """
-        primary_key = self.table_name_to_primary_key.get(table_name.lower())
+        groups = {}
         for row in data:
-            query = f"""
-            INSERT INTO {table_name} ({', '.join(row.keys())})
-            VALUES ({', '.join(['?' for _ in row.keys()])})
-            ON CONFLICT ({primary_key})
-            DO UPDATE SET {', '.join([f"{col}=excluded.{col}" for col in row.keys() if col != primary_key])}
-            """
-            self.execute_write(query, tuple(row.values()))
+            columns, rows = groups.setdefault(frozenset(row), (tuple(row), []))
+            rows.append(tuple(row[col] for col in columns))
+
+        with self.transaction():
+            for columns, rows in groups.values():
+                self.execute_upsert_rows(table_name, columns, rows)
+
+    def execute_upsert_rows(self, table_name: str, columns: Tuple[str, ...], rows: Iterable[tuple]) -> None:
+        """
+        Insert or update rows that share one column set, with a single executemany call.
+        :param table_name: Name of the table to insert into.
+        :param columns: Column names, in the order of the values in each row.
+        :param rows: Tuples of values; may be a generator.
+        """
+        with self.transaction():
+            self.cursor.executemany(self._upsert_statement(table_name, tuple(columns)), rows)
     
     def execute_read(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> List[Tuple[Any, ...]]:
         """
@@ -57,6 +118,24 @@ class LocalDatabase:
             self.cursor.execute(query)
         return self.cursor.fetchall()
 
+    def find_existing(self, table_name: str, column: str, values: Iterable[Any]) -> set:
+        """
+        Return the subset of values already present in table_name.column.
+        Probes with parameterized IN (...) lookups, so the cost depends on the number of values
+        rather than the size of the table when the column is indexed (e.g. a primary key).
+        :param table_name: Name of the table to probe.
+        :param column: Column to match values against.
+        :param values: Candidate values.
+        :return: Set of the values that exist.
+        """
+        values = list(dict.fromkeys(values))
+        existing = set()
+        for offset in range(0, len(values), self.MAX_IN_PARAMETERS):
+            chunk = values[offset:offset + self.MAX_IN_PARAMETERS]
+            query = f"SELECT {column} FROM {table_name} WHERE {column} IN ({', '.join(['?'] * len(chunk))})"
+            existing.update(value for value, in self.conn.execute(query, chunk))
+        return existing
+
     def execute_read_df(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> pd.DataFrame:
         """
         Execute a read (SELECT) query and return the results as a pandas DataFrame.
@@ -76,9 +155,26 @@ class LocalDatabase:
         self.conn.close()
 
 class DataSaver:
-    def __init__(self, db: LocalDatabase, logger: Optional[logging.Logger] = None):
+    OP_INFO_COLUMNS = ('OpInfoId', 'OpName', 'OpFollowers')
+    REDDIT_POST_COLUMNS = (
+        'PostId', 'Content', 'Type', 'MediaPath', 'SubredditName', 'Rank', 'RankingAlgorithm',
+        'EngagmentTableId', 'OpInfoId', 'PostProductionTableId'
+    )
+    POST_PRODUCTION_COLUMNS = (
+        'PostProductionTableId', 'PostId', 'AudioPath', 'VideoPath', 'FinalVideoPath', 'Narration',
+        'Rank', 'RankingAlgorithm', 'ChannelId', 'Tags', 'Description', 'Credit', 'Title',
+        'DateOfPosting', 'ViewCount', 'Likes', 'YouTubeAnalytics'
+    )
+
+    def __init__(self, db: LocalDatabase, logger: Optional[logging.Logger] = None, duplicate_index=None):
+        """
+        :param db: Database to write to.
+        :param logger: Logger; the module logger when None.
+        :param duplicate_index: Optional MinHashLSHIndex, updated with the body of every saved post.
+        """
         self.db = db
         self.logger = logger or logging.getLogger(__name__)
+        self.duplicate_index = duplicate_index
 
     def save_task(self, task: Task) -> Task:
         """
@@ -90,8 +186,11 @@ class DataSaver:
         total_posts_saved = 0
 
         try:
-            for subreddit_name, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items():
-                total_posts_saved += self._save_single_subreddit(subreddit_name, reddit_data)
+            # One transaction for the whole task: a single commit instead of one per row
+            with self.db.transaction():
+                for subreddit_name, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items():
+                    total_posts_saved += self._save_single_subreddit(subreddit_name, reddit_data)
+                self._save_listing_cursors(task.listing_cursors)
 
             self.logger.info(f"Database save completed successfully. Total posts saved: {total_posts_saved}")
         except Exception as exc:
@@ -107,86 +206,81 @@ class DataSaver:
         """
         self.logger.info(f"Processing data for subreddit: {subreddit_name}")
 
-        pandas_data = reddit_data.to_pandas_dataframe()
+        posts = reddit_data.get_all_posts()
+        op_rows, post_rows, post_prod_rows = self._build_rows(posts, subreddit_name)
 
-        op_rows = self._build_op_info_rows(pandas_data)
         if op_rows:
             self.logger.info(f"Inserting {len(op_rows)} OpInfo records for subreddit {subreddit_name}")
-            self.db.execute_upsert('OpInfo', op_rows)
+            self.db.execute_upsert_rows('OpInfo', self.OP_INFO_COLUMNS, op_rows)
 
-        post_rows = self._build_reddit_post_rows(pandas_data, subreddit_name)
         if post_rows:
             self.logger.info(f"Inserting {len(post_rows)} RedditPostTable records for subreddit {subreddit_name}")
-            self.db.execute_upsert('RedditPostTable', post_rows)
-
-        post_prod_rows = self._build_post_prod_rows(pandas_data)
+            self.db.execute_upsert_rows('RedditPostTable', self.REDDIT_POST_COLUMNS, post_rows)
+            if self.duplicate_index is not None:
+                # Same transaction as the posts, so the index never lists a post that was rolled back
+                self.duplicate_index.add([post.id for post in posts], [post.selftext for post in posts])
 
         if post_prod_rows:
             self.logger.info(f"Inserting {len(post_prod_rows)} PostProductionTable records for subreddit {subreddit_name}")
-            self.db.execute_upsert('PostProductionTable', post_prod_rows)
+            self.db.execute_upsert_rows('PostProductionTable', self.POST_PRODUCTION_COLUMNS, post_prod_rows)
 
         return len(post_rows)
-    
-    def _build_post_prod_rows(self, pandas_data)-> List[dict]:
-        """
-        Construct rows for the PostProductionTable from a DataFrame of Reddit posts.
-        """
-        post_prod_details: List[dict] = []
-
-        for _, row in pandas_data.iterrows():
-            post_prod_details.append({
-                'PostProductionTableId': str(uuid.uuid4()),
-                'PostId': row['id'],
-                'ChannelId': None,  # Not available in Reddit data
-                'Tags': None,  # Not available in Reddit data
-                'Description': None,
-                'Credit': None,
-                'Title': None,
-                'Rank': None,  # Not available in Reddit data
-                'RankingAlgorithm': None,  # Not available in Reddit data
-                'AudioPath': row.get('synthesized_audio_file_path', None),
-                'VideoPath': row.get('video_file_path', None),
-                'FinalVideoPath': row.get('final_video_path', None),
-                'Narration': row.get('narration', None),
-                'DateOfPosting': None,
-                'ViewCount': None,
-                'Likes': None,
-                'YouTubeAnalytics': None  # Not available
-            })
-        return post_prod_details
-
-    def _build_op_info_rows(self, pandas_data) -> List[dict]:
-        """
-        Construct rows for the OpInfo table from a DataFrame of Reddit posts.
-        """
-        op_details: List[dict] = []
-        for _, row in pandas_data.iterrows():
-            op_details.append({
-                'OpInfoId': row['author_fullname'],
-                'OpName': row['author'],
-                'OpFollowers': None  # TODO: populate from Reddit API when available
-            })
-        return op_details
-
-    def _build_reddit_post_rows(self, pandas_data, subreddit_name: str) -> List[dict]:
-        """
-        Construct rows for the RedditPostTable from a DataFrame of Reddit posts.
-        """
-        content_details: List[dict] = []
-        for _, row in pandas_data.iterrows():
-            content_details.append({
-                'PostId': row['id'],
-                'Content': row['selftext'],
-                'Type': None,  # TODO: determine from Reddit data
-                'MediaPath': None,  # TODO: determine from Reddit data
-                'SubredditName': subreddit_name,
-                'Rank': None,
-                'RankingAlgorithm': None,
-                'EngagmentTableId': None,
-                'OpInfoId': row['author'],  # Note: mirrors current pipeline behavior
-                'PostProductionTableId': None
-            })
-        return content_details
+
+    def _save_listing_cursors(self, pending_cursors: List[tuple]) -> None:
+        """
+        Store the listing cursors of a collection run in the transaction that saves the task, so they
+        advance past everything that was fetched (selected or not) only when the task is saved, and a
+        failed task leaves them where they were.
+        :param pending_cursors: (subreddit, listing, newest fetched post id, ETag, Last-Modified) tuples
+            from RedditDataCollector.
+        """
+        if not pending_cursors:
+            return
+        now = time.time()
+        self.logger.info(f"Storing {len(pending_cursors)} listing cursors")
+        self.db.execute_upsert_rows(
+            'ListingCursor',
+            ('SubredditName', 'Listing', 'LastSeenPostId', 'ETag', 'LastModified', 'UpdatedAt'),
+            [cursor + (now,) for cursor in pending_cursors]
+        )
+
+    def _build_rows(self, posts: List[PostData], subreddit_name: str) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+        """
+        Construct the OpInfo, RedditPostTable and PostProductionTable rows in one pass over the posts.
+        Rows are tuples in the order of the matching *_COLUMNS attribute.
+        """
+        op_rows: List[tuple] = []
+        post_rows: List[tuple] = []
+        post_prod_rows: List[tuple] = []
+        for post in posts:
+            op_rows.append((
+                post.author_fullname,
+                post.author,
+                None,  # OpFollowers: TODO populate from Reddit API when available
+            ))
+            post_rows.append((
+                post.id,
+                post.selftext,
+                None,  # Type: TODO determine from Reddit data
+                None,  # MediaPath: TODO determine from Reddit data
+                subreddit_name,
+                post.rank,
+                post.ranking_algorithm,
+                None,  # EngagmentTableId
+                post.author,  # OpInfoId: mirrors current pipeline behavior
+                None,  # PostProductionTableId
+            ))
+            post_prod_rows.append((
+                str(uuid.uuid4()),
+                post.id,
+                post.synthesized_audio_file_path,
+                post.video_file_path,
+                post.final_video_path,
+                post.narration,
+                post.rank,
+                post.ranking_algorithm,
+            ) + (None,) * 9)  # Channel, tags, posting details and YouTube analytics are not available yet
+        return op_rows, post_rows, post_prod_rows
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Persistent, content-addressed cache of chat completions stored in SQLite.
+    Entries are keyed by a hash of (system prompt, user prompt, model), so an
+    unchanged post never pays for a second completion.
+    """
+    def __init__(self, db_path: str = 'llm_cache.db', max_entries: int = 50000,
+                 max_age_seconds: float = 30 * 24 * 3600, evict_every: int = 100):
+        """
+        :param db_path: Path to the SQLite cache file.
+        :param max_entries: Least recently used entries beyond this count are evicted.
+        :param max_age_seconds: Entries older than this are treated as misses and evicted.
+        :param evict_every: Run eviction after this many writes.
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # Shared by the streaming executor's worker threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS LLMResponseCache (
+                CacheKey TEXT PRIMARY KEY,
+                Model VARCHAR(255),
+                Response TEXT,
+                CreatedAt REAL,
+                LastAccessedAt REAL,
+                HitCount INT DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS IdxLLMResponseCacheLastAccessedAt ON LLMResponseCache (LastAccessedAt)")
+        self.conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(system_prompt: str, user_prompt: str, model: str) -> str:
+        payload = json.dumps([system_prompt, user_prompt, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT Response, CreatedAt FROM LLMResponseCache WHERE CacheKey = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE LLMResponseCache SET LastAccessedAt = ?, HitCount = HitCount + 1 WHERE CacheKey = ?",
+                (now, key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO LLMResponseCache (CacheKey, Model, Response, CreatedAt, LastAccessedAt, HitCount)
+                VALUES (?, ?, ?, ?, ?, 0)
+                ON CONFLICT (CacheKey)
+                DO UPDATE SET Response=excluded.Response, CreatedAt=excluded.CreatedAt, LastAccessedAt=excluded.LastAccessedAt
+                """,
+                (key, model, response, now, now)
+            )
+            self.conn.commit()
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then the least recently used ones above max_entries.
+        :return: Number of evicted entries.
+        """
+        with self._lock:
+            expired = self.conn.execute(
+                "DELETE FROM LLMResponseCache WHERE CreatedAt < ?", (time.time() - self.max_age_seconds,)
+            ).rowcount
+            overflow = self.conn.execute(
+                """
+                DELETE FROM LLMResponseCache WHERE CacheKey IN (
+                    SELECT CacheKey FROM LLMResponseCache ORDER BY LastAccessedAt DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            ).rowcount
+            self.conn.commit()
+        if expired or overflow:
+            logger.info(f"Evicted {expired} expired and {overflow} least recently used LLM cache entries")
+        return expired + overflow
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, lifetime_hits = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(HitCount), 0) FROM LLMResponseCache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "lifetime_hits": lifetime_hits,
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,240 @@
+import logging
+import re
+import time
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class MinHasher:
+    """MinHash signatures of word shingles, computed with numpy across all permutations at once."""
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        """
+        :param num_perm: Hash functions per signature; the Jaccard estimate's error shrinks with sqrt(num_perm).
+        :param shingle_size: Words per shingle.
+        :param seed: Seed of the hash function coefficients; signatures are only comparable with the same seed.
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Multiply-shift hashing: the high 32 bits of (a * x + b) mod 2**64 with odd a, no division needed
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) << np.uint64(1) | np.uint64(1))[:, None]
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)[:, None]
+
+    def shingles(self, text: str) -> np.ndarray:
+        """32-bit hashes of the distinct word shingles of a text (a single shingle for very short texts)."""
+        words = WORD_PATTERN.findall((text or "").lower())
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+        word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+        # Each shingle is a polynomial fold of its word hashes, so no shingle string is ever built
+        size = min(self.shingle_size, len(words))
+        count = len(words) - size + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            shingles = shingles * SHINGLE_MULTIPLIER + word_hashes[offset:offset + count]
+        return np.unique(shingles & np.uint64(0xFFFFFFFF))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """uint32 signature of a text, or None when it has no words."""
+        shingles = self.shingles(text)
+        if not len(shingles):
+            return None
+        return ((self._a * shingles[None, :] + self._b) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Signatures of many texts.
+        :return: (uint32 matrix with one row per text, mask of the texts that have a signature)
+        """
+        signatures = [self.signature(text) for text in texts]
+        has_signature = np.fromiter((signature is not None for signature in signatures), dtype=np.bool_, count=len(signatures))
+        matrix = np.zeros((len(signatures), self.num_perm), dtype=np.uint32)
+        for row, signature in enumerate(signatures):
+            if signature is not None:
+                matrix[row] = signature
+        return matrix, has_signature
+
+
+def estimate_jaccard(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity between one signature and each row of others."""
+    return (others == signature).mean(axis=1)
+
+
+class MinHashLSHIndex:
+    """
+    Locality-sensitive hashing index of post bodies, persisted in the main database.
+
+    Each signature is cut into `bands` bands; posts sharing a band land in the same bucket. A query
+    reads only the buckets of its own bands (primary key lookups) and compares the signatures of the
+    candidates found there, so its cost follows the number of candidates, not the size of the history.
+    With 32 bands of 4 rows, a pair at Jaccard 0.5 becomes a candidate with probability ~0.87 and a
+    pair at 0.8 almost surely, so thresholds from about 0.5 up are served well.
+
+    The index is built from RedditPostTable.Content on first use and kept current by DataSaver.
+    """
+    MAX_IN_PARAMETERS = 900
+    BOOTSTRAP_CHUNK_SIZE = 5000
+
+    def __init__(self, db, num_perm: int = 128, bands: int = 32, shingle_size: int = 3, seed: int = 1):
+        """
+        :param db: LocalDatabase holding RedditPostTable; the index tables are created there if missing.
+        :param num_perm: Hash functions per signature; must be divisible by bands.
+        :param bands: LSH bands; more bands find less similar pairs at the cost of more candidates.
+        :param shingle_size: Words per shingle.
+        :param seed: Seed of the MinHash coefficients.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.db = db
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+        self.params = f"num_perm={num_perm} bands={bands} shingle_size={shingle_size} seed={seed}"
+        # Odd multipliers and per-band salts fold the rows of a band into one 64-bit bucket key
+        rng = np.random.default_rng(seed + 1)
+        self._band_multipliers = rng.integers(1, 2 ** 63, size=self.rows_per_band, dtype=np.uint64) | np.uint64(1)
+        self._band_salts = rng.integers(0, 2 ** 63, size=bands, dtype=np.uint64)
+        self._bootstrapped = False
+
+        for statement in (
+            "CREATE TABLE IF NOT EXISTS MinHashSignature (PostId VARCHAR(20) PRIMARY KEY, Signature BLOB)",
+            "CREATE TABLE IF NOT EXISTS MinHashBucket ("
+            "BucketKey INTEGER, PostId VARCHAR(20), PRIMARY KEY (BucketKey, PostId)) WITHOUT ROWID",
+            "CREATE TABLE IF NOT EXISTS MinHashIndexMeta (Key VARCHAR(100) PRIMARY KEY, Value TEXT)",
+        ):
+            self.db.execute_write(statement)
+
+    def bucket_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """int64 bucket key of every band of every signature, shape (len(signatures), bands)."""
+        banded = signatures.astype(np.uint64).reshape(len(signatures), self.bands, self.rows_per_band)
+        # uint64 arithmetic wraps, which is what the fold wants
+        keys = (banded * self._band_multipliers).sum(axis=2, dtype=np.uint64) ^ self._band_salts
+        return keys.view(np.int64)
+
+    def _read_meta(self) -> dict:
+        return dict(self.db.execute_read("SELECT Key, Value FROM MinHashIndexMeta"))
+
+    def bootstrap(self):
+        """
+        Index every RedditPostTable row that has no signature yet, once per database.
+        Signatures made with other parameters are dropped and rebuilt.
+        """
+        if self._bootstrapped:
+            return
+        meta = self._read_meta()
+        if meta.get("Params") == self.params and meta.get("Bootstrapped"):
+            self._bootstrapped = True
+            return
+
+        start = time.perf_counter()
+        with self.db.transaction():
+            if meta.get("Params") != self.params:
+                self.db.execute_write("DELETE FROM MinHashSignature")
+                self.db.execute_write("DELETE FROM MinHashBucket")
+            # Keyset pages over the primary key, so no read cursor stays open while the index tables are written.
+            # RedditPostTable.PostId has INT affinity: all-digit ids are stored as integers, which sort before
+            # any text, so paging starts below the smallest integer; the CAST lets the join use the TEXT key.
+            indexed, last_post_id = 0, -2 ** 63
+            while True:
+                rows = self.db.execute_read(
+                    "SELECT r.PostId, r.Content FROM RedditPostTable r "
+                    "LEFT JOIN MinHashSignature s ON s.PostId = CAST(r.PostId AS TEXT) "
+                    "WHERE r.PostId > ? AND s.PostId IS NULL ORDER BY r.PostId LIMIT ?",
+                    (last_post_id, self.BOOTSTRAP_CHUNK_SIZE)
+                )
+                if not rows:
+                    break
+                last_post_id = rows[-1][0]
+                indexed += self._add([str(post_id) for post_id, _ in rows], [content for _, content in rows])
+            self.db.execute_upsert_rows(
+                "MinHashIndexMeta", ("Key", "Value"), [("Params", self.params), ("Bootstrapped", "1")]
+            )
+        self._bootstrapped = True
+        logger.info(f"Built the near-duplicate index from {indexed} stored posts in {time.perf_counter() - start:.2f}s")
+
+    def add(self, post_ids: list[str], texts: list[str]) -> int:
+        """Index (or re-index) posts. Posts without words are skipped. Returns the number indexed."""
+        self.bootstrap()
+        with self.db.transaction():
+            return self._add(post_ids, texts)
+
+    def _add(self, post_ids: list[str], texts: list[str]) -> int:
+        signatures, has_signature = self.hasher.signatures(texts)
+        rows = np.flatnonzero(has_signature)
+        if not len(rows):
+            return 0
+        keys = self.bucket_keys(signatures[rows])
+        self.db.execute_upsert_rows(
+            "MinHashSignature", ("PostId", "Signature"),
+            ((post_ids[row], signatures[row].tobytes()) for row in rows)
+        )
+        # Buckets of an edited post's old text stay behind; they only add candidates that fail the similarity check
+        self.db.execute_upsert_rows(
+            "MinHashBucket", ("BucketKey", "PostId"),
+            ((int(key), post_ids[row]) for row, row_keys in zip(rows, keys) for key in row_keys)
+        )
+        return len(rows)
+
+    def _candidates(self, keys: np.ndarray) -> dict[int, set]:
+        """Bucket key -> stored post ids, for the given keys only."""
+        keys = [int(key) for key in np.unique(keys)]
+        buckets = {}
+        for offset in range(0, len(keys), self.MAX_IN_PARAMETERS):
+            chunk = keys[offset:offset + self.MAX_IN_PARAMETERS]
+            for key, post_id in self.db.conn.execute(
+                f"SELECT BucketKey, PostId FROM MinHashBucket WHERE BucketKey IN ({', '.join(['?'] * len(chunk))})",
+                chunk
+            ):
+                buckets.setdefault(key, set()).add(post_id)
+        return buckets
+
+    def _signatures(self, post_ids: list[str]) -> dict[str, np.ndarray]:
+        signatures = {}
+        for offset in range(0, len(post_ids), self.MAX_IN_PARAMETERS):
+            chunk = post_ids[offset:offset + self.MAX_IN_PARAMETERS]
+            for post_id, blob in self.db.conn.execute(
+                f"SELECT PostId, Signature FROM MinHashSignature WHERE PostId IN ({', '.join(['?'] * len(chunk))})",
+                chunk
+            ):
+                signatures[post_id] = np.frombuffer(blob, dtype=np.uint32)
+        return signatures
+
+    def query(self, signatures: np.ndarray, threshold: float,
+              exclude_ids: list[str] = None) -> list[Optional[tuple[str, float]]]:
+        """
+        Best stored match of each signature at or above threshold.
+        :param signatures: Signature matrix from hasher.signatures().
+        :param threshold: Minimum estimated Jaccard similarity.
+        :param exclude_ids: Per signature, a post id that must not match itself (e.g. the post's own id).
+        :return: (post id, estimated similarity) or None, per signature.
+        """
+        self.bootstrap()
+        matches = [None] * len(signatures)
+        if not len(signatures):
+            return matches
+        keys = self.bucket_keys(signatures)
+        buckets = self._candidates(keys)
+        candidates = [
+            set().union(*(buckets.get(int(key), ()) for key in row_keys)) - {exclude_ids[row] if exclude_ids else None}
+            for row, row_keys in enumerate(keys)
+        ]
+        stored = self._signatures(list(set().union(*candidates)))
+        for row, post_ids in enumerate(candidates):
+            post_ids = sorted(post_id for post_id in post_ids if post_id in stored)
+            if not post_ids:
+                continue
+            similarities = estimate_jaccard(signatures[row], np.stack([stored[post_id] for post_id in post_ids]))
+            best = int(similarities.argmax())
+            if similarities[best] >= threshold:
+                matches[row] = (post_ids[best], float(similarities[best]))
+        return matches
+
+    def __len__(self) -> int:
+        return self.db.execute_read("SELECT COUNT(*) FROM MinHashSignature")[0][0]
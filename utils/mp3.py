@@ -0,0 +1,133 @@
+"""
+Minimal MPEG audio frame scanner.
+Used to verify that an mp3 on disk is complete (interrupted stream_to_file writes
+leave a truncated last frame) and to compute exact durations without decoding.
+"""
+from typing import Optional
+
+# Bitrates in kbps indexed by [version_group][layer][bitrate_index]; version group 1 = MPEG1, 2 = MPEG2/2.5
+_BITRATES = {
+    1: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    2: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+# Sample rates indexed by the two version bits of the header
+_SAMPLE_RATES = {
+    0b11: [44100, 48000, 32000],  # MPEG1
+    0b10: [22050, 24000, 16000],  # MPEG2
+    0b00: [11025, 12000, 8000],   # MPEG2.5
+}
+_ID3V1_SIZE = 128
+
+
+class Mp3Info:
+    def __init__(self, frame_count: int, duration: float, sample_rate: int, complete: bool,
+                 audio_start: int, audio_end: int):
+        self.frame_count = frame_count
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.complete = complete
+        # Byte range holding the audio frames, excluding ID3 tags and the Xing/Info frame
+        self.audio_start = audio_start
+        self.audio_end = audio_end
+
+    def __str__(self):
+        return f"{self.frame_count} frames, {self.duration:.3f}s @ {self.sample_rate}Hz, complete={self.complete}"
+
+
+def _id3v2_size(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _parse_header(data: bytes, offset: int) -> Optional[tuple]:
+    """Return (frame_length, samples_per_frame, sample_rate) for a valid header at offset, else None."""
+    if offset + 4 > len(data):
+        return None
+    b1, b2 = data[offset + 1], data[offset + 2]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version_bits = (b1 >> 3) & 0b11
+    layer_bits = (b1 >> 1) & 0b11
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0b11
+    padding = (b2 >> 1) & 0b1
+    if version_bits == 0b01 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    version_group = 1 if version_bits == 0b11 else 2
+    bitrate = _BITRATES[version_group][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and version_group == 2:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def scan(data: bytes) -> Mp3Info:
+    """Walk the MPEG frames of an in-memory mp3."""
+    start = _id3v2_size(data)
+    end = len(data)
+    if end - start >= _ID3V1_SIZE and data[end - _ID3V1_SIZE:end - _ID3V1_SIZE + 3] == b"TAG":
+        end -= _ID3V1_SIZE
+
+    offset = start
+    frame_count = 0
+    samples = 0
+    sample_rate = 0
+    complete = False
+    while offset < end:
+        header = _parse_header(data, offset)
+        if header is None:
+            break
+        frame_length, frame_samples, frame_sample_rate = header
+        if offset + frame_length > end:
+            break  # truncated last frame
+        # A leading Xing/Info frame only carries encoder metadata, not audio
+        is_info_frame = frame_count == 0 and (
+            b"Xing" in data[offset:offset + frame_length] or b"Info" in data[offset:offset + frame_length]
+        )
+        offset += frame_length
+        frame_count += 1
+        if is_info_frame:
+            start = offset
+        else:
+            samples += frame_samples
+        sample_rate = frame_sample_rate
+    else:
+        complete = frame_count > 0
+
+    duration = samples / sample_rate if sample_rate else 0.0
+    return Mp3Info(frame_count, duration, sample_rate, complete, start, offset)
+
+
+def audio_frames(data: bytes) -> bytes:
+    """Strip tags and the Xing/Info frame so several mp3s can be concatenated into one stream."""
+    info = scan(data)
+    return data[info.audio_start:info.audio_end]
+
+
+def read_info(path: str) -> Mp3Info:
+    with open(path, "rb") as f:
+        return scan(f.read())
+
+
+def is_complete(path: str) -> bool:
+    """True if the file holds at least one frame and ends exactly on a frame boundary."""
+    try:
+        return read_info(path).complete
+    except OSError:
+        return False
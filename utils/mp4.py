@@ -0,0 +1,39 @@
+"""
+Minimal MP4 (ISO base media) box walker.
+Used to verify that a video on disk is complete: ffmpeg writes the moov box and the final
+mdat size when it finishes, so an interrupted write leaves boxes that do not reach the end
+of the file or no moov box at all. Only the top-level box headers are read.
+"""
+import os
+import struct
+
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+
+def is_complete(path: str) -> bool:
+    """True if the top-level boxes exactly cover the file and one of them is moov."""
+    try:
+        file_size = os.path.getsize(path)
+        has_moov = False
+        offset = 0
+        with open(path, "rb") as f:
+            while offset < file_size:
+                f.seek(offset)
+                header = f.read(16)
+                if len(header) < 8:
+                    return False
+                size, box_type = struct.unpack(">I4s", header[:8])
+                if size == 1:
+                    if len(header) < 16:
+                        return False
+                    size = struct.unpack(">Q", header[8:16])[0]
+                elif size == 0:
+                    # Box running to the end of the file: what an unfinished mdat looks like
+                    return False
+                if size < 8 or offset + size > file_size:
+                    return False
+                has_moov = has_moov or box_type == b"moov"
+                offset += size
+        return has_moov
+    except OSError:
+        return False
@@ -0,0 +1,106 @@
+import sys
+from typing import Any, Iterable
+
+import numpy as np
+
+
+class PostColumns:
+    """
+    Columnar store of the Reddit fields of a batch of posts.
+
+    Numeric fields live in NumPy arrays (with a mask for values Reddit left out) and strings in
+    plain lists, with the frequently repeated ones (ids, subreddit, authors) interned. Stages filter
+    and sort on the arrays; `row()` rebuilds the keyword arguments of a single PostData on demand.
+    """
+    STRING_FIELDS = ("id", "title", "selftext", "subreddit", "author_fullname", "author", "permalink")
+    INTERNED_FIELDS = ("id", "subreddit", "author_fullname", "author")
+    NUMERIC_FIELDS = {
+        "ups": (np.int64, 0),
+        "score": (np.int64, 0),
+        "num_comments": (np.int64, 0),
+        "created_utc": (np.float64, np.nan),
+        "upvote_ratio": (np.float64, np.nan),
+        "is_self": (np.bool_, False),
+        "over_18": (np.bool_, False),
+        "spoiler": (np.bool_, False),
+    }
+
+    def __init__(self, posts: Iterable[dict]):
+        """
+        :param posts: Raw post objects (the "data" of each listing child); fields not stored here are dropped.
+        """
+        self.strings = {field: [] for field in self.STRING_FIELDS}
+        raw_numbers = {field: [] for field in self.NUMERIC_FIELDS}
+        for post in posts:
+            for field, values in self.strings.items():
+                value = post.get(field)
+                if value is not None and field in self.INTERNED_FIELDS:
+                    value = sys.intern(value)
+                values.append(value)
+            for field, values in raw_numbers.items():
+                values.append(post.get(field))
+
+        self.ids = self.strings["id"]
+        self.numbers = {}
+        # Rows where Reddit sent no value, so PostData gets None back instead of the fill value
+        self.missing = {}
+        for field, (dtype, fill) in self.NUMERIC_FIELDS.items():
+            values = raw_numbers[field]
+            missing = np.fromiter((value is None for value in values), dtype=np.bool_, count=len(values))
+            self.numbers[field] = np.fromiter(
+                (fill if value is None else value for value in values), dtype=dtype, count=len(values)
+            )
+            if missing.any():
+                self.missing[field] = missing
+        self.filtered_out = np.ones(len(self.ids), dtype=np.bool_)
+        # Filled in by ClassificationAlgorithm; selection only considers eligible rows
+        self.labels = None
+        self.eligible = np.ones(len(self.ids), dtype=np.bool_)
+        # Filled in by NearDuplicateFilter: row -> id of the post it repeats
+        self.duplicate_of: dict[int, str] = {}
+        # Filled in by RankingAlgorithm: one array per registered score, and the rank within the subreddit
+        self.scores: dict[str, np.ndarray] = {}
+        self.rank = None
+        self.ranking_algorithm = None
+        self.index = {post_id: row for row, post_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, field: str) -> np.ndarray:
+        """Numeric column by PostData field name."""
+        return self.numbers[field]
+
+    def row(self, index: int) -> dict[str, Any]:
+        """Keyword arguments for the PostData of one row; fields Reddit left out are omitted, as in the raw post."""
+        values = {field: strings[index] for field, strings in self.strings.items() if strings[index] is not None}
+        for field, array in self.numbers.items():
+            missing = self.missing.get(field)
+            if missing is None or not missing[index]:
+                values[field] = array[index].item()
+        values["filtered_out"] = bool(self.filtered_out[index])
+        if self.labels is not None:
+            values["classification"] = self.labels[index]
+        if index in self.duplicate_of:
+            values["duplicate_of"] = self.duplicate_of[index]
+        if self.scores:
+            values["scores"] = {name: float(array[index]) for name, array in self.scores.items()}
+        if self.rank is not None:
+            values["rank"] = int(self.rank[index])
+            values["ranking_algorithm"] = self.ranking_algorithm
+        return values
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns, counting each distinct string object once."""
+        total = self.filtered_out.nbytes
+        total += sum(array.nbytes for array in self.numbers.values())
+        total += sum(mask.nbytes for mask in self.missing.values())
+        total += sum(array.nbytes for array in self.scores.values())
+        seen = set()
+        for values in self.strings.values():
+            total += sys.getsizeof(values)
+            for value in values:
+                if value is not None and id(value) not in seen:
+                    seen.add(id(value))
+                    total += sys.getsizeof(value)
+        return total
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from typing import Mapping
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every request to one API.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. The bucket also follows the
+    server's own accounting: X-Ratelimit-Remaining/-Reset caps the tokens left in the current window
+    and spreads them over the time until it resets, and Retry-After pauses every caller.
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: Steady-state requests per second.
+        :param capacity: Largest burst allowed; defaults to one second's worth of requests (at least 1).
+        """
+        self.default_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.throttle_events = 0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available and take it.
+        :return: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    if waited:
+                        self.throttle_events += 1
+                        self.throttled_seconds += waited
+                    return waited
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    delay = (1.0 - self.tokens) / self.rate if self.rate > 0 else 1.0
+            time.sleep(delay)
+            waited += delay
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adopt the server's view of the current window from X-Ratelimit-Remaining and X-Ratelimit-Reset."""
+        remaining = headers.get("X-Ratelimit-Remaining")
+        reset = headers.get("X-Ratelimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset = float(remaining), max(float(reset), 1.0)
+        except ValueError:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, remaining)
+            # Spend what is left evenly over the rest of the window, never faster than configured
+            self.rate = min(self.default_rate, remaining / reset) if remaining >= 1 else 0.0
+            if remaining < 1:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+                # Once the window resets the configured rate applies again
+                self.rate = self.default_rate
+                logger.warning(f"Rate limit exhausted, pausing requests for {reset:.0f}s")
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds`, e.g. for a Retry-After response."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f"Server asked to back off, pausing requests for {seconds:.1f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "tokens": self.tokens,
+                "throttle_events": self.throttle_events,
+                "throttled_seconds": self.throttled_seconds,
+            }
@@ -0,0 +1,173 @@
+import gzip
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+class ArchivedResponse:
+    def __init__(self, run_id: str, subreddit: str, listing: str, page: int, fetched_at: float, body: bytes):
+        self.run_id = run_id
+        self.subreddit = subreddit
+        self.listing = listing
+        self.page = page
+        self.fetched_at = fetched_at
+        self.body = body
+
+
+class ResponseArchive:
+    """
+    Append-only archive of raw API responses.
+
+    Each response body is compressed on its own (a gzip member or a zstd frame) and appended to the
+    current segment file; segments roll over at segment_max_bytes and are never rewritten. A SQLite
+    index maps (run, subreddit, listing, page) to the segment, offset and length of the record, so any
+    response can be read back with one seek and one decompression.
+    """
+    def __init__(self, root_dir: str = "data/response_archive", compression: str = "gzip",
+                 segment_max_bytes: int = 64 * 1024 * 1024, compression_level: int = 6):
+        """
+        :param root_dir: Directory holding the segment files and the index.
+        :param compression: "gzip" or "zstd"; zstd needs the zstandard package and falls back to gzip without it.
+        :param segment_max_bytes: Size at which a new segment file is started.
+        """
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, archiving responses with gzip")
+            compression = "gzip"
+        if compression not in ("gzip", "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.root_dir = root_dir
+        self.compression = compression
+        self.segment_max_bytes = segment_max_bytes
+        self.compression_level = compression_level
+        os.makedirs(root_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root_dir, "archive_index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ArchivedResponse (
+                RecordId INTEGER PRIMARY KEY AUTOINCREMENT,
+                RunId VARCHAR(64),
+                SubredditName VARCHAR(255),
+                Listing VARCHAR(100),
+                Page INT,
+                Segment VARCHAR(255),
+                Offset INT,
+                Length INT,
+                Compression VARCHAR(10),
+                RawBytes INT,
+                FetchedAt REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ArchivedResponseRun ON ArchivedResponse (SubredditName, RunId)")
+        self.conn.commit()
+        self._segment_index = self._last_segment_index()
+
+    def _last_segment_index(self) -> int:
+        segments = [name for name in os.listdir(self.root_dir) if name.startswith("segment-")]
+        return max((int(name.split("-")[1].split(".")[0]) for name in segments), default=1)
+
+    def _segment_name(self) -> str:
+        extension = "zst" if self.compression == "zstd" else "gz"
+        return f"segment-{self._segment_index:06d}.{extension}"
+
+    def _compress(self, body: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.compression_level).compress(body)
+        return gzip.compress(body, compresslevel=self.compression_level)
+
+    @staticmethod
+    def _decompress(record: bytes, compression: str) -> bytes:
+        if compression == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd archive segments")
+            return zstandard.ZstdDecompressor().decompress(record)
+        return gzip.decompress(record)
+
+    def append(self, run_id: str, subreddit: str, listing: str, page: int, body: bytes) -> None:
+        """Compress and append one response body. Index entries become visible after flush()."""
+        record = self._compress(body)
+        with self._lock:
+            path = os.path.join(self.root_dir, self._segment_name())
+            if os.path.exists(path) and os.path.getsize(path) + len(record) > self.segment_max_bytes:
+                self._segment_index += 1
+                path = os.path.join(self.root_dir, self._segment_name())
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(record)
+            self.conn.execute(
+                """
+                INSERT INTO ArchivedResponse (RunId, SubredditName, Listing, Page, Segment, Offset, Length, Compression, RawBytes, FetchedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, subreddit, listing, page, os.path.basename(path), offset, len(record), self.compression,
+                 len(body), time.time())
+            )
+
+    def flush(self) -> None:
+        """Commit the index entries of everything appended so far."""
+        with self._lock:
+            self.conn.commit()
+
+    def latest_run_id(self, subreddit: str = None) -> Optional[str]:
+        """Most recent run that archived anything (for subreddit, when given)."""
+        query = "SELECT RunId FROM ArchivedResponse"
+        params = ()
+        if subreddit is not None:
+            query += " WHERE SubredditName = ?"
+            params = (subreddit,)
+        with self._lock:
+            row = self.conn.execute(query + " ORDER BY RecordId DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def responses(self, subreddit: str, run_id: str = None) -> list[ArchivedResponse]:
+        """
+        Read back the responses archived for a subreddit in one run, in the order they were fetched.
+        :param run_id: Run to replay; defaults to the latest run that archived this subreddit.
+        """
+        run_id = run_id or self.latest_run_id(subreddit)
+        if run_id is None:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT Listing, Page, Segment, Offset, Length, Compression, FetchedAt FROM ArchivedResponse
+                WHERE SubredditName = ? AND RunId = ? ORDER BY RecordId
+                """,
+                (subreddit, run_id)
+            ).fetchall()
+
+        responses = []
+        for listing, page, segment, offset, length, compression, fetched_at in rows:
+            with open(os.path.join(self.root_dir, segment), "rb") as f:
+                f.seek(offset)
+                record = f.read(length)
+            responses.append(ArchivedResponse(
+                run_id, subreddit, listing, page, fetched_at, self._decompress(record, compression)
+            ))
+        return responses
+
+    def stats(self) -> dict:
+        with self._lock:
+            records, raw_bytes, stored_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(RawBytes), 0), COALESCE(SUM(Length), 0) FROM ArchivedResponse"
+            ).fetchone()
+        return {
+            "records": records,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": raw_bytes / stored_bytes if stored_bytes else 0.0,
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,123 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream on a stage queue
+_END_OF_STREAM = object()
+
+
+class PostWorkItem:
+    """A single post travelling through the per-post stages of the pipeline."""
+    def __init__(self, task, subreddit: str, post_data):
+        self.task = task
+        self.subreddit = subreddit
+        self.post_data = post_data
+        self.failed = False
+        self.error = None
+        self.stage_durations: Dict[str, float] = {}
+
+    def __str__(self):
+        return f"{self.task.name}/r/{self.subreddit}/{self.post_data.id}"
+
+
+class Stage:
+    """
+    One step of the streaming executor.
+    :param name: Stage name, used for logging and timing.
+    :param fn: Callable taking and returning a PostWorkItem.
+    :param workers: Number of worker threads pulling from this stage's queue.
+    """
+    def __init__(self, name: str, fn: Callable[[PostWorkItem], PostWorkItem], workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class StreamingStageExecutor:
+    """
+    Streams work items through a chain of stages connected by bounded queues.
+
+    Every stage owns `workers` threads, so post N can be in a later stage while
+    post N+1 is still in an earlier one. Stages that need processes (rendering)
+    hand their work to a process pool from inside their worker threads.
+    A failed item skips the remaining stages and is still delivered to on_done.
+    """
+    def __init__(self, stages: List[Stage], on_done: Callable[[PostWorkItem], None], queue_size: int = 8):
+        self.stages = stages
+        self.on_done = on_done
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.threads: List[threading.Thread] = []
+        self._remaining_workers = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._stage_worker, args=(index,), name=f"{stage.name}-{worker}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+        sink = threading.Thread(target=self._sink_worker, name="sink", daemon=True)
+        sink.start()
+        self.threads.append(sink)
+        self._started = True
+        logger.info(
+            "Streaming executor started with stages: "
+            + ", ".join(f"{stage.name}x{stage.workers}" for stage in self.stages)
+        )
+
+    def submit(self, item: PostWorkItem):
+        """Queue an item for the first stage, blocking while that queue is full."""
+        if not self._started:
+            raise RuntimeError("StreamingStageExecutor.start() must be called before submit()")
+        self.queues[0].put(item)
+
+    def close(self):
+        """Signal the end of input and wait until every submitted item has been delivered."""
+        for _ in range(self.stages[0].workers if self.stages else 1):
+            self.queues[0].put(_END_OF_STREAM)
+        for thread in self.threads:
+            thread.join()
+
+    def _stage_worker(self, index: int):
+        stage = self.stages[index]
+        in_queue, out_queue = self.queues[index], self.queues[index + 1]
+        while True:
+            item = in_queue.get()
+            if item is _END_OF_STREAM:
+                break
+            if not item.failed:
+                stage_start = time.time()
+                try:
+                    item = stage.fn(item)
+                except Exception as e:
+                    logger.error(f"Stage {stage.name} failed for {item}: {e}")
+                    item.failed = True
+                    item.error = e
+                item.stage_durations[stage.name] = time.time() - stage_start
+            out_queue.put(item)
+
+        # The last worker of a stage to finish forwards the end marker downstream
+        with self._lock:
+            self._remaining_workers[index] -= 1
+            last_worker = self._remaining_workers[index] == 0
+        if last_worker:
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            for _ in range(next_workers):
+                out_queue.put(_END_OF_STREAM)
+
+    def _sink_worker(self):
+        while True:
+            item = self.queues[-1].get()
+            if item is _END_OF_STREAM:
+                break
+            try:
+                self.on_done(item)
+            except Exception as e:
+                logger.error(f"Completion callback failed for {item}: {e}")
@@ -0,0 +1,112 @@
+import logging
+import time
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class SubredditYield:
+    """Running totals of one subreddit across runs, with the per-run and per-video means derived from them."""
+    def __init__(self, subreddit: str, runs: int = 0, requests: int = 0, posts_fetched: int = 0, new_posts: int = 0,
+                 posts_selected: int = 0, videos_produced: int = 0, processing_seconds: float = 0.0,
+                 last_run_at: float = None):
+        self.subreddit = subreddit
+        self.runs = runs
+        self.requests = requests
+        self.posts_fetched = posts_fetched
+        self.new_posts = new_posts
+        self.posts_selected = posts_selected
+        self.videos_produced = videos_produced
+        self.processing_seconds = processing_seconds
+        self.last_run_at = last_run_at
+
+    @property
+    def requests_per_run(self) -> float:
+        return self.requests / self.runs if self.runs else 0.0
+
+    @property
+    def requests_per_video(self) -> float:
+        return self.requests / self.videos_produced if self.videos_produced else float("inf")
+
+    @property
+    def seconds_per_video(self) -> float:
+        return self.processing_seconds / self.videos_produced if self.videos_produced else float("inf")
+
+    def __str__(self):
+        return (
+            f"r/{self.subreddit}: {self.runs} runs, {self.requests} requests, {self.new_posts}/{self.posts_fetched} new, "
+            f"{self.posts_selected} selected, {self.videos_produced} videos"
+        )
+
+
+class SubredditYieldStats:
+    """
+    Per-subreddit yield table in the main database.
+
+    Each finished run adds its counts to the subreddit's row with one upsert, and lookups read only
+    the rows of the subreddits asked for, by primary key, so neither grows with the table.
+    """
+    MAX_IN_PARAMETERS = 900
+    COUNTERS = ("Runs", "Requests", "PostsFetched", "NewPosts", "PostsSelected", "VideosProduced", "ProcessingSeconds")
+
+    def __init__(self, db):
+        """
+        :param db: LocalDatabase; the SubredditYield table is created there if missing.
+        """
+        self.db = db
+        self.db.execute_write("""
+            CREATE TABLE IF NOT EXISTS SubredditYield (
+                SubredditName VARCHAR(255) PRIMARY KEY,
+                Runs INT,
+                Requests INT,
+                PostsFetched INT,
+                NewPosts INT,
+                PostsSelected INT,
+                VideosProduced INT,
+                ProcessingSeconds REAL,
+                LastRunAt REAL
+            )
+        """)
+        # Counters are added to, not overwritten, so this cannot go through LocalDatabase's upsert
+        columns = ("SubredditName",) + self.COUNTERS + ("LastRunAt",)
+        self._record_statement = f"""
+            INSERT INTO SubredditYield ({', '.join(columns)})
+            VALUES ({', '.join(['?'] * len(columns))})
+            ON CONFLICT (SubredditName) DO UPDATE SET
+            {', '.join(f'{column} = {column} + excluded.{column}' for column in self.COUNTERS)},
+            LastRunAt = excluded.LastRunAt
+        """
+
+    def record(self, runs: Iterable[dict]) -> None:
+        """
+        Add the outcome of one run per subreddit.
+        :param runs: Dicts with subreddit, requests, posts_fetched, new_posts, posts_selected,
+            videos_produced and processing_seconds.
+        """
+        now = time.time()
+        rows = [
+            (
+                run["subreddit"], 1, run.get("requests", 0), run.get("posts_fetched", 0), run.get("new_posts", 0),
+                run.get("posts_selected", 0), run.get("videos_produced", 0), run.get("processing_seconds", 0.0), now
+            )
+            for run in runs
+        ]
+        if not rows:
+            return
+        with self.db.transaction():
+            self.db.cursor.executemany(self._record_statement, rows)
+        logger.info(f"Recorded yield of {len(rows)} subreddits")
+
+    def get(self, subreddits: Iterable[str]) -> dict[str, SubredditYield]:
+        """Yield rows of the given subreddits; subreddits never run are missing from the result."""
+        subreddits = list(dict.fromkeys(subreddits))
+        yields = {}
+        for offset in range(0, len(subreddits), self.MAX_IN_PARAMETERS):
+            chunk = subreddits[offset:offset + self.MAX_IN_PARAMETERS]
+            for row in self.db.conn.execute(
+                f"SELECT SubredditName, {', '.join(self.COUNTERS)}, LastRunAt FROM SubredditYield "
+                f"WHERE SubredditName IN ({', '.join(['?'] * len(chunk))})",
+                chunk
+            ):
+                yields[row[0]] = SubredditYield(*row)
+        return yields
@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Optional
+
+from utils.units import Transcription, TranscriptionWord
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """
+    Persistent cache of word-level transcriptions, keyed by a hash of the audio bytes and the model.
+    Words are stored as one newline-joined text column plus packed float32 start/end arrays,
+    so a re-render of the same narration skips transcription entirely.
+    """
+    def __init__(self, db_path: str = 'transcription_cache.db'):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS TranscriptionCache (
+                CacheKey TEXT PRIMARY KEY,
+                Model VARCHAR(255),
+                Text TEXT,
+                Duration REAL,
+                Words TEXT,
+                Starts BLOB,
+                Ends BLOB,
+                ComputeSeconds REAL,
+                CreatedAt REAL,
+                HitCount INT DEFAULT 0
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(audio_path: str, model: str) -> str:
+        digest = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(model.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Transcription]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT Text, Duration, Words, Starts, Ends, ComputeSeconds FROM TranscriptionCache WHERE CacheKey = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE TranscriptionCache SET HitCount = HitCount + 1 WHERE CacheKey = ?", (key,))
+            self.conn.commit()
+            self.hits += 1
+            self.seconds_saved += row[5] or 0.0
+
+        text, duration, words, starts, ends, _ = row
+        start_values, end_values = array("f"), array("f")
+        start_values.frombytes(starts)
+        end_values.frombytes(ends)
+        return Transcription(
+            text=text,
+            duration=duration,
+            words=[
+                TranscriptionWord(word=word, start=start, end=end)
+                for word, start, end in zip(words.split("\n") if words else [], start_values, end_values)
+            ]
+        )
+
+    def put(self, key: str, model: str, transcription: Transcription, compute_seconds: float) -> None:
+        words = [word.word for word in transcription.words]
+        starts = array("f", [word.start for word in transcription.words]).tobytes()
+        ends = array("f", [word.end for word in transcription.words]).tobytes()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO TranscriptionCache (CacheKey, Model, Text, Duration, Words, Starts, Ends, ComputeSeconds, CreatedAt, HitCount)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT (CacheKey)
+                DO UPDATE SET Text=excluded.Text, Duration=excluded.Duration, Words=excluded.Words, Starts=excluded.Starts,
+                              Ends=excluded.Ends, ComputeSeconds=excluded.ComputeSeconds
+                """,
+                (key, model, transcription.text, transcription.duration, "\n".join(words), starts, ends,
+                 compute_seconds, time.time())
+            )
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, lifetime_hits, lifetime_seconds_saved = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(HitCount), 0), COALESCE(SUM(HitCount * ComputeSeconds), 0) FROM TranscriptionCache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "lifetime_hits": lifetime_hits,
+            "lifetime_seconds_saved": lifetime_seconds_saved,
+        }
+
+    def close(self):
+        self.conn.close()
@@ -1,10 +1,19 @@
+from collections.abc import Mapping
 from enum import Enum
 from pydantic import BaseModel
+from utils.post_store import PostColumns
 import pandas as pd
 import logging
 logger = logging.getLogger(__name__)
 
 
+# Story subreddits whose posts narrate well
+DEFAULT_CANDIDATE_SUBREDDITS = (
+    "AmItheAsshole", "tifu", "TrueOffMyChest", "relationship_advice", "confessions",
+    "pettyrevenge", "ProRevenge", "MaliciousCompliance", "entitledparents", "AITAH",
+)
+
+
 class Task:
     # Flags for each pipeline step
     def __init__(self, name=None, description=None, status=None):
@@ -12,8 +21,25 @@ class Task:
         self.description = description
         self.status = status
         self.possible_subreddits = []
+        # Pool SubredditFinder picks possible_subreddits from, and the fetch requests it may plan for (None: no limit)
+        self.candidate_subreddits = list(DEFAULT_CANDIDATE_SUBREDDITS)
+        self.subreddit_fetch_budget = 12
+        # Filled in as the task runs and recorded in the subreddit yield table when it finishes
+        self.subreddit_fetch_stats: dict[str, dict] = {}
+        self.post_seconds: dict[str, float] = {}
+        # Listing cursors of the collected listings, stored by DataSaver together with the task's posts
+        self.listing_cursors: list[tuple] = []
         self.reddit_datas = RedditDataList([])
         self.post_selection_strategy = PostSelectionStrategyEnum.MOST_UPVOTED
+        # Posts selected per subreddit, with per-subreddit overrides, and an optional cap across all subreddits
+        self.posts_per_subreddit = 3
+        self.posts_per_subreddit_overrides: dict[str, int] = {}
+        self.max_total_posts = None
+        # Posts whose body has at least this estimated Jaccard similarity to an earlier post are dropped; None keeps them
+        self.near_duplicate_threshold = 0.8
+        self.listing_types = [ListingTypeEnum.HOT]
+        # ffmpeg writes the same streams as moviepy (libx264/yuv420p, stereo 128k mp3 at 44.1kHz) and falls back to it
+        self.render_backend = RenderBackendEnum.FFMPEG
         # Pipeline step flags
         self.should_find_subreddit = True
         self.should_collect_reddit_data = True
@@ -37,6 +63,27 @@ class PostSelectionStrategyEnum(Enum):
     MOST_RECENT = "MostRecentPostStrategy"
     MOST_CONTROVERSIAL = "MostControversialPostStrategy"
 
+class ListingTypeEnum(Enum):
+    HOT = "hot"
+    NEW = "new"  # newest first, so paging can stop exactly at the last post seen
+    TOP_DAY = "top_day"  # top of the last 24 hours
+
+class TranscriptionModeEnum(Enum):
+    LOCAL = "local"  # align the known narration against the decoded audio
+    WHISPER = "whisper"  # upload the audio to whisper-1
+
+class RenderBackendEnum(Enum):
+    FFMPEG = "ffmpeg"  # single ffmpeg run with burned-in ASS subtitles, falls back to moviepy
+    MOVIEPY = "moviepy"  # frames composited in Python
+
+class CaptionRendererEnum(Enum):
+    COMPOSITOR = "compositor"  # cached word sprites blended onto each frame
+    TEXT_CLIP = "text_clip"  # one full-frame moviepy TextClip per word
+
+class ExecutorModeEnum(Enum):
+    SEQUENTIAL = "sequential"  # every stage runs for the whole task before the next one starts
+    STREAMING = "streaming"  # posts stream through the per-post stages independently
+
 class PostData(BaseModel):
     id: str
     title: str
@@ -54,21 +101,56 @@ class PostData(BaseModel):
     over_18: bool = None
     spoiler: bool = None
     filtered_out: bool = True
+    classification: str = None  # ClassificationAlgorithm label, e.g. usable / nsfw / off_topic
+    duplicate_of: str = None  # id of the earlier post this one nearly repeats
+    scores: dict[str, float] = None  # every registered RankingAlgorithm score
+    rank: int = None  # position within the subreddit by ranking_algorithm, 1 is best
+    ranking_algorithm: str = None
     narration: str = None
     synthesized_audio_file_path: str = None
+    narration_chunks: list[str] = None  # set when the narration was voiced in chunks
+    audio_chunk_durations: list[float] = None  # exact duration of each voiced chunk, in order
     video_file_path: str = None
+    video_start_offset: float = None  # seconds into video_file_path where the background segment starts
     final_video_path: str = None
 
     def __str__(self):
         return f"{self.id}: {self.title} - {self.selftext} - {self.subreddit}"
 
 
+class TranscriptionWord(BaseModel):
+    word: str
+    start: float
+    end: float
+
+
+class Transcription(BaseModel):
+    """Word-level timing of a narration, shaped like whisper-1's verbose_json response."""
+    text: str = None
+    duration: float
+    words: list[TranscriptionWord]
+
+
+class LazyPostDataDict(Mapping):
+    """Read-only post_id -> PostData view of a RedditData that builds each PostData on first access."""
+    def __init__(self, reddit_data: "RedditData"):
+        self._reddit_data = reddit_data
+
+    def __getitem__(self, post_id: str) -> PostData:
+        return self._reddit_data.get_post(post_id)
+
+    def __iter__(self):
+        return iter(self._reddit_data.columns.ids)
+
+    def __len__(self) -> int:
+        return len(self._reddit_data.columns)
+
+
 class RedditData:
     def __init__(self, subreddit: str, data: dict, distinct_available_post_ids:set):
         self.subreddit = subreddit
-        self.data = data
-        # Complete: create a dict mapping post_id to post_data for all posts in the subreddit data
-        self.post_data_dict = {}
+        # The raw listing is only needed while parsing; collectors archive it, so it is not kept here
+        raw_posts = {}
         for post_data in data.get("data", {}).get("children", []):
             post_id = post_data.get("data", {}).get("id")
             if post_id is None:
@@ -76,30 +158,76 @@ class RedditData:
             if post_id in distinct_available_post_ids:
                 logger.info(f"Post id {post_id} already processed, skipping.")
                 continue
-            self.post_data_dict[post_id] = PostData(**post_data.get("data"))
+            raw_posts[post_id] = post_data.get("data")
+        # Posts are kept as columns; PostData models are only built for posts that are looked up or selected
+        self.columns = PostColumns(raw_posts.values())
+        self._models: dict[int, PostData] = {}
+        self.post_data_dict = LazyPostDataDict(self)
 
     def __str__(self):
-        return f"{self.subreddit}: {self.data}"
-    
+        return f"{self.subreddit}: {len(self.columns)} posts"
+
+    def __len__(self):
+        return len(self.columns)
+
+    def get_post(self, post_id: str) -> PostData:
+        """Return the PostData of a post, building it from the columns on first access."""
+        row = self.columns.index[post_id]
+        model = self._models.get(row)
+        if model is None:
+            model = PostData(**self.columns.row(row))
+            self._models[row] = model
+        return model
+
+    def set_labels(self, labels: list[str], eligible):
+        """Store classification labels and selection eligibility for every post."""
+        self.columns.labels = labels
+        self.columns.eligible = eligible
+        for row, model in self._models.items():
+            model.classification = labels[row]
+
+    def mark_duplicates(self, duplicate_of: dict[str, str]):
+        """Exclude near-duplicate posts from selection, recording the post each one repeats."""
+        for post_id, original_id in duplicate_of.items():
+            row = self.columns.index[post_id]
+            self.columns.duplicate_of[row] = original_id
+            self.columns.eligible[row] = False
+            if row in self._models:
+                self._models[row].duplicate_of = original_id
+
+    def set_scores(self, scores: dict, rank, ranking_algorithm: str):
+        """Store ranking results for every post, updating PostData models that were already built."""
+        self.columns.scores = scores
+        self.columns.rank = rank
+        self.columns.ranking_algorithm = ranking_algorithm
+        for row, model in self._models.items():
+            model.scores = {name: float(values[row]) for name, values in scores.items()}
+            model.rank = int(rank[row])
+            model.ranking_algorithm = ranking_algorithm
+
+    def select_posts(self, post_ids: list[str]):
+        """Mark posts as selected for the rest of the pipeline (filtered_out = False)."""
+        for post_id in post_ids:
+            self.columns.filtered_out[self.columns.index[post_id]] = False
+            self.get_post(post_id).filtered_out = False
+
     def get_unfiltered_data(self):
         return self.post_data_dict
     
     def get_all_posts(self, filter_out=True):
-        return [post for post in list(self.post_data_dict.values()) if filter_out and not post.filtered_out]
+        """Selected posts in listing order, or every post (building all models) when filter_out is False."""
+        if not filter_out:
+            return [self.get_post(post_id) for post_id in self.columns.ids]
+        # Only materialized posts can have been selected
+        return [self._models[row] for row in sorted(self._models) if not self._models[row].filtered_out]
 
     def to_pandas_dataframe(self, filter_out = True):
         """
         Converts the RedditData's posts into a pandas DataFrame.
         Each row corresponds to a post, with columns for all PostData attributes.
+        Stages on the hot path should use `columns` instead.
         """
-
-        rows = []
-        for post_id, post_data in self.post_data_dict.items():
-            if filter_out and post_data.filtered_out == True:
-                continue
-            row = post_data.dict()
-            rows.append(row)
-        return pd.DataFrame(rows)
+        return pd.DataFrame([post_data.dict() for post_data in self.get_all_posts(filter_out=filter_out)])
 
 class RedditDataList:
     def __init__(self, reddit_datas: list[RedditData]=[]):
@@ -0,0 +1,125 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    """
+    Persistent float32 matrix of embeddings keyed by id.
+
+    Vectors are appended as raw rows to vectors.f32 and read back through a memory map, so only the
+    pages of the rows actually used are loaded. A SQLite index maps each id to its row. Nothing is
+    read at construction time; the map is opened on first lookup and re-opened when the file grows.
+    """
+    # Stays below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds (999)
+    MAX_IN_PARAMETERS = 900
+
+    def __init__(self, root_dir: str = "data/embeddings", model: str = None):
+        """
+        :param root_dir: Directory holding vectors.f32 and the index.
+        :param model: Embedding model the vectors come from; a store never mixes models.
+        """
+        os.makedirs(root_dir, exist_ok=True)
+        self.root_dir = root_dir
+        self.vectors_path = os.path.join(root_dir, "vectors.f32")
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root_dir, "vector_index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS VectorIndex (VectorId TEXT PRIMARY KEY, Row INT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS VectorStoreMeta (Key TEXT PRIMARY KEY, Value TEXT)")
+        self.conn.commit()
+        meta = dict(self.conn.execute("SELECT Key, Value FROM VectorStoreMeta").fetchall())
+        self.model = meta.get("Model") or None
+        self.dim = int(meta["Dim"]) if "Dim" in meta else None
+        if model is not None and self.model is not None and model != self.model:
+            raise ValueError(f"{root_dir} holds {self.model} vectors, not {model}")
+        self.model = self.model or model
+        self._matrix: Optional[np.memmap] = None
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * 4
+
+    def _row_count(self) -> int:
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // self.row_bytes
+
+    def _map(self, rows_needed: int) -> np.memmap:
+        """Memory-map the vector file, re-mapping when rows were appended since the last map."""
+        if self._matrix is None or len(self._matrix) < rows_needed:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._row_count(), self.dim))
+        return self._matrix
+
+    def _rows(self, ids: list[str]) -> dict[str, int]:
+        rows = {}
+        for offset in range(0, len(ids), self.MAX_IN_PARAMETERS):
+            chunk = ids[offset:offset + self.MAX_IN_PARAMETERS]
+            rows.update(self.conn.execute(
+                f"SELECT VectorId, Row FROM VectorIndex WHERE VectorId IN ({', '.join(['?'] * len(chunk))})", chunk
+            ).fetchall())
+        return rows
+
+    def get_many(self, ids: Iterable[str]) -> tuple[list[str], np.ndarray]:
+        """
+        Look up stored vectors.
+        :return: (ids that were found, float32 matrix of their vectors in the same order)
+        """
+        ids = list(dict.fromkeys(ids))
+        with self._lock:
+            if self.dim is None:
+                return [], np.empty((0, 0), dtype=np.float32)
+            rows = self._rows(ids)
+            found = [vector_id for vector_id in ids if vector_id in rows]
+            if not found:
+                return [], np.empty((0, self.dim), dtype=np.float32)
+            row_numbers = np.fromiter((rows[vector_id] for vector_id in found), dtype=np.int64, count=len(found))
+            matrix = self._map(int(row_numbers.max()) + 1)
+            return found, np.array(matrix[row_numbers])
+
+    def add(self, ids: list[str], vectors: np.ndarray) -> None:
+        """Append vectors for ids that are not stored yet; ids already present keep their vector."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors differ in length")
+        if not len(ids):
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO VectorStoreMeta (Key, Value) VALUES (?, ?)",
+                    [("Dim", str(self.dim)), ("Model", self.model or "")]
+                )
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            existing = self._rows(list(ids))
+            keep = [index for index, vector_id in enumerate(ids) if vector_id not in existing]
+            keep = list({ids[index]: index for index in keep}.values())
+            if not keep:
+                return
+            # A torn write from an interrupted run leaves a partial row at the end; drop it
+            first_row = self._row_count()
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(first_row * self.row_bytes)
+                f.write(vectors[keep].tobytes())
+            self.conn.executemany(
+                "INSERT INTO VectorIndex (VectorId, Row) VALUES (?, ?)",
+                [(ids[index], first_row + position) for position, index in enumerate(keep)]
+            )
+            self.conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM VectorIndex").fetchone()[0]
+
+    def close(self):
+        self._matrix = None
+        self.conn.close()
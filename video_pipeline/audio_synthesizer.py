@@ -1,27 +1,118 @@
-from scripts.LLM import LLMClient
+from scripts.LLM import LLMClient, split_narration
 import os
-from utils.units import Task
+import shutil
+from typing import Callable
+from utils.units import Task, PostData
+from utils.audio_store import AudioStore
 
 class AudioSynthesizer:
     """Synthesizes audio from generated text."""
-    def __init__(self, output_dir="generated_audio"):
+    def __init__(self, output_dir="generated_audio", store: AudioStore = None, voice: str = "onyx", model: str = "tts-1",
+                 chunked: bool = True, max_chunk_chars: int = 1000, chunk_workers: int = 4):
+        """
+        :param store: Optional content-addressed store used to reuse audio across tasks.
+        :param chunked: Voice long narrations as concurrent sentence-aligned chunks.
+        :param max_chunk_chars: Maximum characters per chunk request (chunked mode).
+        :param chunk_workers: Maximum concurrent chunk requests per narration (chunked mode).
+        """
         self.llm = LLMClient()
         self.output_dir = output_dir
+        self.store = store
+        self.voice = voice
+        self.model = model
+        self.chunked = chunked
+        self.max_chunk_chars = max_chunk_chars
+        self.chunk_workers = chunk_workers
         os.makedirs(output_dir, exist_ok=True)
 
-    def synthesize(self, task: Task):
-
+    def synthesize(self, task: Task, skip_post_ids: set = None):
+        """:param skip_post_ids: Posts whose audio already exists (e.g. restored from a checkpoint)."""
+        skip_post_ids = skip_post_ids or set()
         for subreddit, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items():
-            subreddit_dir = os.path.join(self.output_dir, subreddit)
-            os.makedirs(subreddit_dir, exist_ok=True)
-            for post_id, post_data in reddit_data.post_data_dict.items():
-                if not post_data.filtered_out:
-                    file_path = os.path.join(subreddit_dir, f"post_{post_id}_{task.name}.mp3")
-                    try:
-                        self.llm.synthesize_speech(post_data.narration, file_path)
-                        print(f"[AudioSynthesizer] Audio saved: {file_path}")
-                    except Exception as e:
-                        print(f"[AudioSynthesizer] Error generating audio for r/{subreddit} post {post_id}: {e}")
-                    post_data.synthesized_audio_file_path = file_path
+            for post_data in reddit_data.get_all_posts():
+                if post_data.id in skip_post_ids:
+                    continue
+                self.synthesize_post(post_data, subreddit, task.name)
 
         return task
+
+    def synthesize_post(self, post_data: PostData, subreddit: str, task_name: str,
+                        on_chunk: Callable[[PostData, int, float, str], None] = None) -> PostData:
+        """
+        :param on_chunk: Called as on_chunk(post_data, index, duration, chunk_path), in narration order, as
+            soon as each leading chunk is voiced (chunked mode only). chunk_path is a complete mp3 of that
+            chunk alone, kept next to the post's audio, so it can be played before the narration is done.
+            Audio reused from the store is complete at once and delivers no chunks.
+        """
+        subreddit_dir = os.path.join(self.output_dir, subreddit)
+        os.makedirs(subreddit_dir, exist_ok=True)
+        file_path = os.path.join(subreddit_dir, f"post_{post_data.id}_{task_name}.mp3")
+        chunk_writer = None
+        if on_chunk is not None:
+            chunk_dir = os.path.join(subreddit_dir, f"post_{post_data.id}_{task_name}_chunks")
+            chunk_writer = self._chunk_writer(post_data, chunk_dir, on_chunk)
+        try:
+            if self.store is None:
+                self._voice(post_data, file_path, chunk_writer)
+                print(f"[AudioSynthesizer] Audio saved: {file_path}")
+            else:
+                self._synthesize_through_store(post_data, file_path, chunk_writer)
+        except Exception as e:
+            print(f"[AudioSynthesizer] Error generating audio for r/{subreddit} post {post_data.id}: {e}")
+        post_data.synthesized_audio_file_path = file_path
+        return post_data
+
+    @staticmethod
+    def _chunk_writer(post_data: PostData, chunk_dir: str, on_chunk):
+        """Write each voiced chunk to its own file in chunk_dir and pass its path on to on_chunk."""
+        # Chunks of an earlier narration of the same post must not be mistaken for this one's
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        os.makedirs(chunk_dir)
+
+        def write_chunk(index: int, duration: float, frames: bytes):
+            chunk_path = os.path.join(chunk_dir, f"chunk_{index:03d}.mp3")
+            # Renamed into place, so a consumer never sees a partly written chunk
+            with open(chunk_path + ".part", "wb") as f:
+                f.write(frames)
+            os.replace(chunk_path + ".part", chunk_path)
+            on_chunk(post_data, index, duration, chunk_path)
+        return write_chunk
+
+    def _voice(self, post_data: PostData, path: str, chunk_writer=None) -> list[float]:
+        if not self.chunked:
+            self.llm.synthesize_speech(post_data.narration, path, self.voice, self.model)
+            return None
+        durations = self.llm.synthesize_speech_chunked(
+            post_data.narration, path, self.voice, self.model,
+            max_chunk_chars=self.max_chunk_chars, max_workers=self.chunk_workers, on_chunk=chunk_writer
+        )
+        self._record_chunks(post_data, durations)
+        return durations
+
+    def _record_chunks(self, post_data: PostData, durations: list[float]):
+        chunks = split_narration(post_data.narration, self.max_chunk_chars)
+        if durations and len(durations) == len(chunks):
+            post_data.narration_chunks = chunks
+            post_data.audio_chunk_durations = durations
+
+    def _synthesize_through_store(self, post_data: PostData, file_path: str, chunk_writer=None):
+        key = AudioStore.make_key(post_data.narration, self.voice, self.model)
+        if self.store.lookup(key) is not None:
+            try:
+                self.store.link_to(key, file_path)
+                self._record_chunks(post_data, self.store.chunk_durations(key))
+                print(f"[AudioSynthesizer] Reused stored audio: {file_path}")
+                return
+            except FileNotFoundError:
+                # Evicted by another worker since the lookup; voice it again
+                pass
+        temp_path = self.store.temp_path(key)
+        try:
+            # Chunks go to their own files, never to the store's temporary file
+            durations = self._voice(post_data, temp_path, chunk_writer)
+            self.store.commit(key, temp_path, durations)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.store.link_to(key, file_path)
+        print(f"[AudioSynthesizer] Audio saved: {file_path}")
@@ -0,0 +1,79 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+class CaptionLayer:
+    """
+    Word-by-word captions drawn straight onto video frames.
+
+    Each distinct word is rendered once into a small premultiplied RGBA sprite. At frame
+    time the active word is found by binary search over the start times and only the
+    sprite's bounding box is alpha-blended, instead of compositing a full-frame TextClip
+    per word. Layout matches TextClip(size=frame_size) with centered text.
+    """
+    def __init__(self, words: list[tuple[str, float, float]], frame_size: tuple[int, int],
+                 font_size: int = 70, color: str = 'white', font: str = None):
+        """
+        :param words: (word, start, end) tuples sorted by start time.
+        :param frame_size: (width, height) of the frames the captions are drawn on.
+        :param font: Path to a TrueType font; Pillow's default font when None, like TextClip.
+        """
+        self.frame_width, self.frame_height = frame_size
+        self.color = color
+        self.pil_font = ImageFont.truetype(font, font_size) if font else ImageFont.load_default(font_size)
+        self.texts = [word for word, _, _ in words]
+        self.starts = np.array([start for _, start, _ in words], dtype=np.float64)
+        self.ends = np.array([end for _, _, end in words], dtype=np.float64)
+        self._sprites = {text: self._render_sprite(text) for text in set(self.texts)}
+
+    def _render_sprite(self, text: str):
+        """Return (x, y, premultiplied_rgb, alpha) for text placed in the frame, or None if it is empty."""
+        ascent, descent = self.pil_font.getmetrics()
+        left, top, right, bottom = self.pil_font.getbbox(text, anchor="ls")
+        width, height = right - left, bottom - top
+        if width <= 0 or height <= 0:
+            return None
+
+        image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        ImageDraw.Draw(image).text((-left, -top), text, fill=self.color, font=self.pil_font, anchor="ls")
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        alpha = pixels[..., 3:4]
+        premultiplied = pixels[..., :3] * alpha * 255.0
+
+        # Center the text block the way TextClip does, relative to the baseline
+        x = int((self.frame_width - width) / 2)
+        baseline = (self.frame_height - (ascent + descent)) / 2 + ascent
+        y = int(baseline + top)
+
+        # Clip sprites that do not fit in the frame
+        crop_left, crop_top = max(0, -x), max(0, -y)
+        crop_right = max(0, x + width - self.frame_width)
+        crop_bottom = max(0, y + height - self.frame_height)
+        premultiplied = premultiplied[crop_top:height - crop_bottom, crop_left:width - crop_right]
+        alpha = alpha[crop_top:height - crop_bottom, crop_left:width - crop_right]
+        if premultiplied.size == 0:
+            return None
+        return max(0, x), max(0, y), premultiplied, alpha
+
+    def active_word(self, t: float):
+        index = int(np.searchsorted(self.starts, t, side="right")) - 1
+        if index < 0 or t >= self.ends[index]:
+            return None
+        return self.texts[index]
+
+    def draw(self, frame: np.ndarray, t: float) -> np.ndarray:
+        text = self.active_word(t)
+        sprite = self._sprites.get(text) if text is not None else None
+        if sprite is None:
+            return frame
+        x, y, premultiplied, alpha = sprite
+        height, width = alpha.shape[:2]
+        # Frames handed out by moviepy may be shared, so never draw in place
+        output = np.array(frame, copy=True)
+        region = output[y:y + height, x:x + width].astype(np.float32)
+        output[y:y + height, x:x + width] = (premultiplied + region * (1.0 - alpha)).astype(np.uint8)
+        return output
+
+    def apply(self, clip):
+        """Return clip with the captions drawn onto every frame."""
+        return clip.transform(lambda get_frame, t: self.draw(get_frame(t), t))
@@ -0,0 +1,103 @@
+import logging
+import os
+import subprocess
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+logger = logging.getLogger(__name__)
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 2
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,{font},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,0,0,5,0,0,0,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def _ass_timestamp(seconds: float) -> str:
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def _ass_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("\n", " ")
+
+
+def write_ass(words: list[tuple[str, float, float]], path: str, frame_size: tuple[int, int],
+              font: str = "DejaVu Sans", font_size: int = 70, max_end: float = None) -> str:
+    """
+    Write one centered ASS event per word, matching the white centered captions of the moviepy path.
+    :param max_end: Words starting after this time are dropped and the rest are clamped to it.
+    """
+    width, height = frame_size
+    lines = [ASS_HEADER.format(width=width, height=height, font=font, font_size=font_size)]
+    for word, start, end in words:
+        if max_end is not None:
+            if start >= max_end:
+                continue
+            end = min(end, max_end)
+        lines.append(
+            f"Dialogue: 0,{_ass_timestamp(start)},{_ass_timestamp(end)},Default,,0,0,0,,{_ass_escape(word)}\n"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    return path
+
+
+def _filter_path(path: str) -> str:
+    # Paths inside a filter graph need ':' and '\' escaped, and quoting for everything else
+    return "'" + os.path.abspath(path).replace("\\", "/").replace(":", "\\:").replace("'", "\\'") + "'"
+
+
+def render_with_ffmpeg(video_path: str, audio_path: str, output_path: str,
+                       words: list[tuple[str, float, float]], transcription_duration: float,
+                       ffmpeg_threads: int = None, font: str = "DejaVu Sans", start_offset: float = 0.0) -> float:
+    """
+    Render background clip + narration + burned-in word captions in a single ffmpeg run.
+    Uses the same duration rule and output codecs as the moviepy path
+    (libx264/yuv420p video at the source fps, stereo 128k libmp3lame audio at 44.1kHz).
+    :param start_offset: Seconds into the background clip to start from; cheap when it is a keyframe.
+    :return: Duration of the rendered video in seconds.
+    :raises subprocess.CalledProcessError: If ffmpeg fails.
+    """
+    video_infos = ffmpeg_parse_infos(video_path)
+    audio_infos = ffmpeg_parse_infos(audio_path, decode_file=False)
+    min_duration = min(transcription_duration, video_infos["duration"] - start_offset, audio_infos["duration"])
+
+    subtitle_path = os.path.splitext(output_path)[0] + ".ass"
+    write_ass(words, subtitle_path, tuple(video_infos["video_size"]), font=font, max_end=min_duration)
+
+    command = [
+        FFMPEG_BINARY, "-y", "-v", "error",
+        "-ss", f"{start_offset:.6f}", "-t", f"{min_duration:.6f}", "-i", video_path,
+        "-t", f"{min_duration:.6f}", "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-vf", f"ass={_filter_path(subtitle_path)}",
+        "-c:v", "libx264", "-preset", "medium", "-pix_fmt", "yuv420p",
+        # moviepy decodes the narration to stereo and leaves libmp3lame at its 128k default
+        "-c:a", "libmp3lame", "-ar", "44100", "-ac", "2", "-b:a", "128k",
+        "-t", f"{min_duration:.6f}",
+    ]
+    if ffmpeg_threads:
+        command += ["-threads", str(ffmpeg_threads)]
+    command.append(output_path)
+
+    logger.info(f"Rendering {output_path} with ffmpeg ({min_duration:.2f}s, {len(words)} words)")
+    try:
+        subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    finally:
+        if os.path.exists(subtitle_path):
+            os.remove(subtitle_path)
+    return min_duration
@@ -0,0 +1,188 @@
+import logging
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from array import array
+from typing import Optional
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm", ".m4v")
+
+
+class FootageSegment:
+    def __init__(self, path: str, start: float, duration: float):
+        self.path = path
+        self.start = start
+        self.duration = duration
+
+    def __str__(self):
+        return f"{self.path} [{self.start:.2f}s +{self.duration:.2f}s]"
+
+
+class FootageLibrary:
+    """
+    SQLite index of the background clips in the video store.
+
+    Each clip is probed once for duration, resolution, fps and keyframe timestamps; later
+    refreshes only stat the directory and probe files that are new or changed. Selection
+    hands out (file, start offset) segments that start on a keyframe, cover the requested
+    length and do not overlap segments used by recent videos.
+    """
+    def __init__(self, store_dir: str = "media/video_store", index_path: str = None, recent_window: int = 50,
+                 seed: int = None):
+        """
+        :param store_dir: Directory scanned for background clips.
+        :param index_path: SQLite index file; defaults to footage_index.db inside store_dir.
+        :param recent_window: Number of most recent segments that new selections must not overlap.
+        """
+        self.store_dir = store_dir
+        self.index_path = index_path or os.path.join(store_dir, "footage_index.db")
+        self.recent_window = recent_window
+        self.random = random.Random(seed)
+        os.makedirs(store_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS FootageClip (
+                Path TEXT PRIMARY KEY,
+                SizeBytes INT,
+                ModifiedAt REAL,
+                Duration REAL,
+                Width INT,
+                Height INT,
+                Fps REAL,
+                Keyframes BLOB,
+                IndexedAt REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS FootageUsage (
+                UsageId INTEGER PRIMARY KEY AUTOINCREMENT,
+                Path TEXT,
+                StartOffset REAL,
+                Duration REAL,
+                UsedAt REAL
+            )
+        """)
+        self.conn.commit()
+
+    def refresh(self) -> int:
+        """
+        Bring the index in line with the store directory, probing only new or modified files.
+        :return: Number of clips probed.
+        """
+        on_disk = {}
+        for name in sorted(os.listdir(self.store_dir)):
+            path = os.path.join(self.store_dir, name)
+            if name.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(path):
+                stat = os.stat(path)
+                on_disk[path] = (stat.st_size, stat.st_mtime)
+
+        with self._lock:
+            indexed = {
+                path: (size, modified_at)
+                for path, size, modified_at in self.conn.execute("SELECT Path, SizeBytes, ModifiedAt FROM FootageClip")
+            }
+            removed = [path for path in indexed if path not in on_disk]
+            self.conn.executemany("DELETE FROM FootageClip WHERE Path = ?", [(path,) for path in removed])
+            self.conn.commit()
+
+        probed = 0
+        for path, (size, modified_at) in on_disk.items():
+            if indexed.get(path) == (size, modified_at):
+                continue
+            try:
+                self.register(path)
+                probed += 1
+            except Exception as e:
+                logger.error(f"Failed to index footage {path}: {e}")
+        if probed or removed:
+            logger.info(f"Footage index refreshed: {probed} clips probed, {len(removed)} removed")
+        return probed
+
+    def register(self, path: str):
+        """Probe a clip and add or update its index entry."""
+        infos = ffmpeg_parse_infos(path)
+        keyframes = self._probe_keyframes(path) or [0.0]
+        stat = os.stat(path)
+        width, height = infos["video_size"]
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO FootageClip (Path, SizeBytes, ModifiedAt, Duration, Width, Height, Fps, Keyframes, IndexedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (Path)
+                DO UPDATE SET SizeBytes=excluded.SizeBytes, ModifiedAt=excluded.ModifiedAt, Duration=excluded.Duration,
+                              Width=excluded.Width, Height=excluded.Height, Fps=excluded.Fps,
+                              Keyframes=excluded.Keyframes, IndexedAt=excluded.IndexedAt
+                """,
+                (path, stat.st_size, stat.st_mtime, infos["duration"], width, height, infos["video_fps"],
+                 array("d", keyframes).tobytes(), time.time())
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def _probe_keyframes(path: str) -> list[float]:
+        # Decoding only keyframes keeps this cheap even for long clips
+        command = [
+            FFMPEG_BINARY, "-hide_banner", "-loglevel", "info", "-skip_frame", "nokey",
+            "-i", path, "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"
+        ]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        return sorted(float(value) for value in re.findall(rb"pts_time:\s*([0-9.]+)", result.stderr))
+
+    def select(self, duration: float) -> Optional[FootageSegment]:
+        """
+        Pick a keyframe-aligned segment of at least `duration` seconds that does not overlap recent usage,
+        and record it as used. Falls back to the least recently used clip when nothing fits.
+        """
+        with self._lock:
+            clips = self.conn.execute("SELECT Path, Duration, Keyframes FROM FootageClip").fetchall()
+            if not clips:
+                return None
+            recent = self.conn.execute(
+                "SELECT Path, StartOffset, Duration FROM FootageUsage ORDER BY UsageId DESC LIMIT ?",
+                (self.recent_window,)
+            ).fetchall()
+            last_used = dict(self.conn.execute("SELECT Path, MAX(UsedAt) FROM FootageUsage GROUP BY Path").fetchall())
+
+            candidates = []
+            for path, clip_duration, keyframe_bytes in clips:
+                keyframes = array("d")
+                keyframes.frombytes(keyframe_bytes)
+                for start in keyframes:
+                    if start + duration > clip_duration:
+                        break
+                    overlaps = any(
+                        used_path == path and start < used_start + used_duration and used_start < start + duration
+                        for used_path, used_start, used_duration in recent
+                    )
+                    if not overlaps:
+                        candidates.append((path, start))
+
+            if candidates:
+                path, start = self.random.choice(candidates)
+            else:
+                # Nothing long enough and unused: reuse the least recently used clip from its start
+                path = min(clips, key=lambda clip: (last_used.get(clip[0], 0.0), -clip[1]))[0]
+                start = 0.0
+                logger.warning(f"No unused footage segment of {duration:.2f}s available, reusing {path}")
+
+            self.conn.execute(
+                "INSERT INTO FootageUsage (Path, StartOffset, Duration, UsedAt) VALUES (?, ?, ?, ?)",
+                (path, start, duration, time.time())
+            )
+            self.conn.commit()
+        return FootageSegment(path, start, duration)
+
+    def close(self):
+        self.conn.close()
@@ -1,24 +1,80 @@
+import asyncio
 import pandas as pd
-from utils.units import Task
-from scripts.LLM import LLMClient
+from utils.units import Task, PostData
+from scripts.LLM import LLMClient, AsyncLLMClient
+from utils.llm_cache import LLMResponseCache
 
 class TextGenerator:
-    def __init__(self):
-        self.llm = LLMClient()
+    def __init__(self, use_async: bool = True, max_concurrency: int = 8, request_timeout: float = 60.0,
+                 cache: LLMResponseCache = None):
+        """
+        :param use_async: Generate all narrations of a task concurrently instead of one after another.
+        :param max_concurrency: Maximum number of narration requests in flight at once (async path).
+        :param request_timeout: Seconds to wait for a single narration before falling back (async path).
+        :param cache: Optional narration cache shared by the sync and async clients.
+        """
+        self.cache = cache
+        self.llm = LLMClient(cache=cache)
+        self.use_async = use_async
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
 
-    def generate(self, task: Task):
+    def generate(self, task: Task, skip_post_ids: set = None):
+        """:param skip_post_ids: Posts that already have their narration (e.g. restored from a checkpoint)."""
+        skip_post_ids = skip_post_ids or set()
+        selected = [
+            (subreddit, post_data)
+            for subreddit, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items()
+            for post_data in reddit_data.get_all_posts()
+            if post_data.id not in skip_post_ids
+        ]
+        if self.use_async and selected:
+            asyncio.run(self._generate_concurrently(selected))
+        else:
+            for subreddit, post_data in selected:
+                self.generate_post(post_data, subreddit)
+        if self.cache is not None:
+            print(f"[TextGenerator] Narration cache: {self.cache.stats()}")
+        return task
 
-        for subreddit, reddit_data in task.reddit_datas.subreddit_to_reddit_data.items():
+    def generate_post(self, post_data: PostData, subreddit: str) -> PostData:
+        title = post_data.title
+        body = post_data.selftext
 
-            for post_id, post_data in reddit_data.post_data_dict.items():
-                if not post_data.filtered_out:
-                    title = post_data.title
-                    body = post_data.selftext
+        try:
+            narration = self.llm.generate_narration(title, body, subreddit)
+        except Exception as e:
+            print(f"[TextGenerator] LLM error for r/{subreddit}: {e}")
+            narration = f"{title}. {body}"
+        post_data.narration = narration
+        return post_data
 
-                    try:
-                        narration = self.llm.generate_narration(title, body, subreddit)
-                    except Exception as e:
-                        print(f"[TextGenerator] LLM error for r/{subreddit}: {e}")
-                        narration = f"{title}. {body}"
-                    post_data.narration = narration
-        return task
+    async def _generate_concurrently(self, selected: list[tuple[str, PostData]]):
+        # The async client is bound to the running event loop, so it lives only for this batch
+        llm = AsyncLLMClient(cache=self.cache)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.gather(*(
+                self._generate_post_async(llm, semaphore, post_data, subreddit)
+                for subreddit, post_data in selected
+            ))
+        finally:
+            await llm.close()
+
+    async def _generate_post_async(self, llm: AsyncLLMClient, semaphore: asyncio.Semaphore,
+                                   post_data: PostData, subreddit: str):
+        title = post_data.title
+        body = post_data.selftext
+
+        async with semaphore:
+            try:
+                narration = await asyncio.wait_for(
+                    llm.generate_narration(title, body, subreddit), timeout=self.request_timeout
+                )
+            except asyncio.TimeoutError:
+                print(f"[TextGenerator] LLM timed out after {self.request_timeout}s for r/{subreddit} post {post_data.id}")
+                narration = f"{title}. {body}"
+            except Exception as e:
+                print(f"[TextGenerator] LLM error for r/{subreddit}: {e}")
+                narration = f"{title}. {body}"
+        post_data.narration = narration
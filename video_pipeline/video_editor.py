@@ -1,8 +1,15 @@
 from turtle import position
-from utils.units import Task, PostData
+from utils.units import Task, PostData, TranscriptionModeEnum, CaptionRendererEnum, RenderBackendEnum, Transcription, TranscriptionWord
+from utils.transcription_cache import TranscriptionCache
 from scripts.LLM import LLMClient
+from video_pipeline.word_aligner import LocalWordAligner
+from video_pipeline.caption_layer import CaptionLayer
+from video_pipeline.ffmpeg_renderer import render_with_ffmpeg
 from moviepy import VideoFileClip, TextClip, CompositeVideoClip, AudioFileClip
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
+import subprocess
+import time
 import logging
 
 # Configure logging
@@ -15,12 +22,136 @@ logging.basicConfig(
     ]
 )
 
+WHISPER_MODEL = "whisper-1"
+# Cache model name for local alignments; bump the version when the aligner's output changes
+LOCAL_ALIGNER_MODEL = "local-aligner-v1"
+
+class RenderJob:
+    """
+    Everything a render worker needs for one post. Only plain paths and word timings,
+    so it pickles cheaply and the LLM client never crosses the process boundary.
+    """
+    def __init__(self, post_id: str, video_path: str, audio_path: str, output_path: str,
+                 words: list[tuple[str, float, float]], transcription_duration: float, ffmpeg_threads: int = None,
+                 caption_renderer: CaptionRendererEnum = CaptionRendererEnum.COMPOSITOR,
+                 render_backend: RenderBackendEnum = RenderBackendEnum.MOVIEPY, video_start_offset: float = 0.0):
+        self.post_id = post_id
+        self.video_path = video_path
+        self.audio_path = audio_path
+        self.output_path = output_path
+        self.words = words
+        self.transcription_duration = transcription_duration
+        self.ffmpeg_threads = ffmpeg_threads
+        self.caption_renderer = caption_renderer
+        self.render_backend = render_backend
+        self.video_start_offset = video_start_offset
+
+
+def render_job(job: RenderJob):
+    """
+    Render one post; safe to run in a worker process.
+    Returns (post_id, success, render_seconds).
+    """
+    logger = logging.getLogger(__name__)
+    render_start = time.time()
+    # Rendered next to the output and renamed into place, so output_path only ever holds a finished video
+    root, extension = os.path.splitext(job.output_path)
+    temp_path = f"{root}.part{extension}"
+    if job.render_backend == RenderBackendEnum.FFMPEG:
+        try:
+            render_with_ffmpeg(job.video_path, job.audio_path, temp_path, job.words,
+                               job.transcription_duration, job.ffmpeg_threads, start_offset=job.video_start_offset)
+            os.replace(temp_path, job.output_path)
+            render_seconds = time.time() - render_start
+            logger.info(f"Post {job.post_id}: Video generation completed with ffmpeg in {render_seconds:.2f}s")
+            return job.post_id, True, render_seconds
+        except Exception as e:
+            details = e.stderr.decode(errors="replace").strip() if isinstance(e, subprocess.CalledProcessError) else str(e)
+            logger.warning(f"Post {job.post_id}: ffmpeg render failed, falling back to moviepy: {details}")
+
+    try:
+        # Load video and cut to first 10 seconds
+        logger.info(f"Post {job.post_id}: Loading video file")
+        video = VideoFileClip(job.video_path, audio=False)
+        video_duration = video.duration - job.video_start_offset
+        logger.info(f"Post {job.post_id}: Video loaded, duration: {video_duration}s")
+
+        logger.info(f"Post {job.post_id}: Loading audio file")
+        new_audio = AudioFileClip(job.audio_path)
+        audio_duration = new_audio.duration
+        logger.info(f"Post {job.post_id}: Audio loaded, duration: {audio_duration}s")
+
+        min_duration = min(job.transcription_duration, video_duration, audio_duration)
+        logger.info(f"Post {job.post_id}: Using minimum duration: {min_duration}s")
+
+        video = video.subclipped(job.video_start_offset, job.video_start_offset + min_duration)
+        new_audio = new_audio.subclipped(0, min_duration)
+
+        if job.caption_renderer == CaptionRendererEnum.COMPOSITOR:
+            logger.info(f"Post {job.post_id}: Drawing captions for {len(job.words)} words")
+            final = CaptionLayer(job.words, video.size).apply(video).with_audio(new_audio)
+        else:
+            final = _composite_text_clips(job, video).with_audio(new_audio)
+
+        # Write the result
+        logger.info(f"Post {job.post_id}: Writing final video to {job.output_path}")
+        final.write_videofile(temp_path, threads=job.ffmpeg_threads)
+        os.replace(temp_path, job.output_path)
+        render_seconds = time.time() - render_start
+        logger.info(f"Post {job.post_id}: Video generation completed successfully in {render_seconds:.2f}s")
+        return job.post_id, True, render_seconds
+
+    except Exception as e:
+        logger.error(f"Post {job.post_id}: Error during video generation: {str(e)}", exc_info=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return job.post_id, False, time.time() - render_start
+
+
+def _composite_text_clips(job: RenderJob, video):
+    composite_video_list = [video]
+    logger = logging.getLogger(__name__)
+    logger.info(f"Post {job.post_id}: Creating text overlays for {len(job.words)} words")
+
+    for i, (word, start, end) in enumerate(job.words):
+        if i % 50 == 0:  # Log progress every 50 words
+            logger.info(f"Post {job.post_id}: Processing word {i+1}/{len(job.words)}")
+
+        composite_video_list.append(
+            TextClip(
+                text=word,
+                font_size=70,
+                color='white',
+                size=video.size
+            ).with_position('center').with_start(start).with_duration(end - start)
+        )
+
+    logger.info(f"Post {job.post_id}: Creating composite video")
+    return CompositeVideoClip(composite_video_list)
+
+
 class VideoEditor:
     """Edits video clips and synchronizes with audio."""
-    def __init__(self) -> None:
+    def __init__(self, transcription_mode: TranscriptionModeEnum = TranscriptionModeEnum.LOCAL,
+                 transcription_cache: TranscriptionCache = None,
+                 render_workers: int = None, ffmpeg_threads: int = None,
+                 caption_renderer: CaptionRendererEnum = CaptionRendererEnum.COMPOSITOR) -> None:
+        """
+        :param render_workers: Number of render processes used by edit(). Defaults to a quarter of the cores.
+        :param ffmpeg_threads: ffmpeg threads per render. Defaults to an even share of the cores per worker,
+            so render_workers * ffmpeg_threads never oversubscribes the machine.
+        :param caption_renderer: How word captions are drawn onto the video.
+        """
         self.logger = logging.getLogger(__name__)
         self.logger.info("Initializing VideoEditor")
         self.llm = LLMClient()
+        self.transcription_mode = transcription_mode
+        self.transcription_cache = transcription_cache
+        self.word_aligner = LocalWordAligner()
+        cpu_count = os.cpu_count() or 1
+        self.render_workers = render_workers or max(1, cpu_count // 4)
+        self.ffmpeg_threads = ffmpeg_threads or max(1, cpu_count // self.render_workers)
+        self.caption_renderer = caption_renderer
         self.output_parent_path = "media/final_output"
         if not os.path.exists(self.output_parent_path):
             self.logger.info(f"Creating output directory: {self.output_parent_path}")
@@ -28,112 +159,173 @@ class VideoEditor:
         else:
             self.logger.info(f"Output directory already exists: {self.output_parent_path}")
 
-    def edit(self, task: Task):
+    def edit(self, task: Task, skip_post_ids: set = None):
+        """:param skip_post_ids: Posts whose final video already exists (e.g. restored from a checkpoint)."""
         self.logger.info(f"Starting video editing for task with {len(task.reddit_datas.get_all_posts())} posts")
 
+        skip_post_ids = skip_post_ids or set()
         post_datas = task.reddit_datas.get_all_posts()
-        results = {}
-
-        self.logger.info(f"Processing {len(post_datas)} posts using ProcessPoolExecutor")
+        # Posts rendered on an earlier run count as successes
+        results = {post_data.id: True for post_data in post_datas if post_data.id in skip_post_ids}
+        jobs = {}
 
-        # For each post, generate the final video by calling generate_video, and store the result (True/False) in results[post_id]
+        # Transcription needs the LLM client and caches, so it stays in this process
         for post_data in post_datas:
+            if post_data.id in skip_post_ids:
+                continue
             try:
-                result = self.generate_video(post_data)
-                results[post_data.id] = result
+                job = self.prepare_render_job(post_data, task.render_backend)
             except Exception as e:
-                self.logger.error(f"Error editing video for post {post_data.id}: {e}")
+                self.logger.error(f"Error preparing video for post {post_data.id}: {e}")
+                job = None
+            if job is None:
                 results[post_data.id] = False
+            else:
+                jobs[post_data.id] = job
+
+        self.logger.info(
+            f"Processing {len(jobs)} posts using ProcessPoolExecutor "
+            f"({self.render_workers} workers x {self.ffmpeg_threads} ffmpeg threads)"
+        )
+        posts_by_id = {post_data.id: post_data for post_data in post_datas}
+        render_times = {}
+        with ProcessPoolExecutor(max_workers=self.render_workers) as pool:
+            futures = {pool.submit(render_job, job): post_id for post_id, job in jobs.items()}
+            for future in as_completed(futures):
+                post_id = futures[future]
+                try:
+                    _, success, render_seconds = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error editing video for post {post_id}: {e}")
+                    success, render_seconds = False, None
+                results[post_id] = success
+                if success:
+                    posts_by_id[post_id].final_video_path = jobs[post_id].output_path
+                if render_seconds is not None:
+                    render_times[post_id] = render_seconds
+                    self.logger.info(f"Post {post_id}: rendered in {render_seconds:.2f}s (success: {success})")
 
         # Set task.success based on all results (True if all succeeded, else False)
         task.success = all(results.values()) if results else False
         success_count = sum(results.values())
         total_count = len(results)
         self.logger.info(f"Video editing completed. Success: {success_count}/{total_count} posts")
+        if render_times:
+            self.logger.info(
+                f"Render time per post: mean {sum(render_times.values()) / len(render_times):.2f}s, "
+                f"max {max(render_times.values()):.2f}s"
+            )
         self.logger.info(f"Overall task success: {task.success}")
+        if self.transcription_cache is not None:
+            self.logger.info(f"Transcription cache: {self.transcription_cache.stats()}")
         return task   
-    
-    def generate_video(self, post_data:PostData):
-        self.logger.info(f"Starting video generation for post {post_data.id}")
-        try:
-            video_path = post_data.video_file_path
-            audio_path = post_data.synthesized_audio_file_path
-            output_path = os.path.join(self.output_parent_path, f"post_id_{post_data.id}_final.mp4")
 
-            self.logger.info(f"Post {post_data.id}: Video path: {video_path}")
-            self.logger.info(f"Post {post_data.id}: Audio path: {audio_path}")
-            self.logger.info(f"Post {post_data.id}: Output path: {output_path}")
+    def prepare_render_job(self, post_data: PostData,
+                           render_backend: RenderBackendEnum = RenderBackendEnum.MOVIEPY) -> RenderJob:
+        """Check inputs and transcribe the narration; returns None if the post cannot be rendered."""
+        video_path = post_data.video_file_path
+        audio_path = post_data.synthesized_audio_file_path
+        output_path = os.path.join(self.output_parent_path, f"post_id_{post_data.id}_final.mp4")
 
-            # Check if input files exist
-            if not os.path.exists(video_path):
-                self.logger.error(f"Post {post_data.id}: Video file not found: {video_path}")
-                return False
-            if not os.path.exists(audio_path):
-                self.logger.error(f"Post {post_data.id}: Audio file not found: {audio_path}")
-                return False
+        self.logger.info(f"Post {post_data.id}: Video path: {video_path}")
+        self.logger.info(f"Post {post_data.id}: Audio path: {audio_path}")
+        self.logger.info(f"Post {post_data.id}: Output path: {output_path}")
 
-            self.logger.info(f"Post {post_data.id}: Generating transcription")
-            transcription = self.generate_transcription(audio_path)
-            self.logger.info(f"Post {post_data.id}: Transcription completed with {len(transcription.words)} words")
-
-            # Load video and cut to first 10 seconds
-            self.logger.info(f"Post {post_data.id}: Loading video file")
-            video = VideoFileClip(video_path, audio=False)
-            video_duration = video.duration
-            self.logger.info(f"Post {post_data.id}: Video loaded, duration: {video_duration}s")
-
-            self.logger.info(f"Post {post_data.id}: Loading audio file")
-            new_audio = AudioFileClip(audio_path)
-            audio_duration = new_audio.duration
-            self.logger.info(f"Post {post_data.id}: Audio loaded, duration: {audio_duration}s")
-
-            min_duration = min(transcription.duration, video_duration, audio_duration)
-            self.logger.info(f"Post {post_data.id}: Using minimum duration: {min_duration}s")
-
-            video = video.subclipped(0, min_duration)
-            new_audio = new_audio.subclipped(0, min_duration)
-
-            composite_video_list = [video]
-            self.logger.info(f"Post {post_data.id}: Creating text overlays for {len(transcription.words)} words")
-            
-            for i, word in enumerate(transcription.words):
-                if i % 50 == 0:  # Log progress every 50 words
-                    self.logger.info(f"Post {post_data.id}: Processing word {i+1}/{len(transcription.words)}")
-                
-                composite_video_list.append(
-                    TextClip(
-                        text=word.word,
-                        font_size=70,
-                        color='white',
-                        size=video.size
-                    ).with_position('center').with_start(word.start).with_duration(word.end - word.start)
-                )
+        # Check if input files exist
+        if not video_path or not os.path.exists(video_path):
+            self.logger.error(f"Post {post_data.id}: Video file not found: {video_path}")
+            return None
+        if not audio_path or not os.path.exists(audio_path):
+            self.logger.error(f"Post {post_data.id}: Audio file not found: {audio_path}")
+            return None
 
-            self.logger.info(f"Post {post_data.id}: Creating composite video")
-            final = CompositeVideoClip(composite_video_list).with_audio(new_audio)
+        self.logger.info(f"Post {post_data.id}: Generating transcription")
+        transcription = self.generate_transcription(audio_path, post_data)
+        self.logger.info(f"Post {post_data.id}: Transcription completed with {len(transcription.words)} words")
 
-            # Write the result
-            self.logger.info(f"Post {post_data.id}: Writing final video to {output_path}")
-            final.write_videofile(output_path)
-            self.logger.info(f"Post {post_data.id}: Video generation completed successfully")
-            post_data.final_video_path = output_path
-            return True
+        return RenderJob(
+            post_id=post_data.id,
+            video_path=video_path,
+            audio_path=audio_path,
+            output_path=output_path,
+            words=[(word.word, word.start, word.end) for word in transcription.words],
+            transcription_duration=transcription.duration,
+            ffmpeg_threads=self.ffmpeg_threads,
+            caption_renderer=self.caption_renderer,
+            render_backend=render_backend,
+            video_start_offset=post_data.video_start_offset or 0.0,
+        )
+
+    def generate_video(self, post_data:PostData):
+        self.logger.info(f"Starting video generation for post {post_data.id}")
+        try:
+            job = self.prepare_render_job(post_data)
+            if job is None:
+                return False
+            _, success, _ = render_job(job)
+            if success:
+                post_data.final_video_path = job.output_path
+            return success
 
         except Exception as e:
             self.logger.error(f"Post {post_data.id}: Error during video generation: {str(e)}", exc_info=True)
             return False
     
-    def generate_transcription(self, audio_path):
+    def generate_transcription(self, audio_path, post_data: PostData = None):
+        use_local = self.transcription_mode == TranscriptionModeEnum.LOCAL and post_data is not None and post_data.narration
+        if use_local:
+            cached = self._cached_transcription(audio_path, LOCAL_ALIGNER_MODEL)
+            if cached is not None:
+                return cached
+            self.logger.info(f"Aligning narration locally for audio: {audio_path}")
+            try:
+                start_time = time.time()
+                transcription = self.word_aligner.align(
+                    audio_path, post_data.narration, post_data.narration_chunks, post_data.audio_chunk_durations
+                )
+                self._cache_transcription(audio_path, LOCAL_ALIGNER_MODEL, transcription, time.time() - start_time)
+                return transcription
+            except Exception as e:
+                self.logger.warning(f"Local alignment failed, falling back to Whisper: {str(e)}")
+
+        cached = self._cached_transcription(audio_path, WHISPER_MODEL)
+        if cached is not None:
+            return cached
+        start_time = time.time()
+        transcription = self.generate_whisper_transcription(audio_path)
+        self._cache_transcription(audio_path, WHISPER_MODEL, transcription, time.time() - start_time)
+        return transcription
+
+    def _cached_transcription(self, audio_path, model: str):
+        if self.transcription_cache is None:
+            return None
+        cached = self.transcription_cache.get(TranscriptionCache.make_key(audio_path, model))
+        if cached is not None:
+            self.logger.info(f"Using cached {model} transcription for audio: {audio_path}")
+        return cached
+
+    def _cache_transcription(self, audio_path, model: str, transcription: Transcription, compute_seconds: float):
+        if self.transcription_cache is not None:
+            self.transcription_cache.put(
+                TranscriptionCache.make_key(audio_path, model), model, transcription, compute_seconds
+            )
+
+    def generate_whisper_transcription(self, audio_path) -> Transcription:
         self.logger.info(f"Generating transcription for audio: {audio_path}")
         try:
-            transcription = self.llm.client.audio.transcriptions.create(
-                    file=open(audio_path, "rb"),
-                    model="whisper-1",
-                    response_format="verbose_json",  # or "vtt" for web captions
-                    timestamp_granularities=["word"]
-                )
+            with open(audio_path, "rb") as audio_file:
+                response = self.llm.client.audio.transcriptions.create(
+                        file=audio_file,
+                        model=WHISPER_MODEL,
+                        response_format="verbose_json",  # or "vtt" for web captions
+                        timestamp_granularities=["word"]
+                    )
             self.logger.info(f"Transcription completed successfully")
-            return transcription
+            return Transcription(
+                text=response.text,
+                duration=response.duration,
+                words=[TranscriptionWord(word=word.word, start=word.start, end=word.end) for word in response.words]
+            )
         except Exception as e:
             self.logger.error(f"Error during transcription: {str(e)}", exc_info=True)
             raise
@@ -1,8 +1,47 @@
-from utils.units import Task
+import logging
+import os
+from utils.units import Task, PostData
+from utils import mp3
+from video_pipeline.footage_library import FootageLibrary
+
+logger = logging.getLogger(__name__)
 
 class VideoSelectionAlgorithm:
     """Selects video clips based on synthesized audio or other criteria."""
-    def select_video(self, task: Task):
+    def __init__(self, library: FootageLibrary = None, fallback_duration: float = 60.0):
+        """
+        :param library: Footage index to pick segments from; one over media/video_store by default.
+        :param fallback_duration: Segment length requested when the narration length is unknown.
+        """
+        self.library = library or FootageLibrary()
+        self.fallback_duration = fallback_duration
+        # Only new or modified clips are probed; the rest come straight from the index
+        self.library.refresh()
+
+    def select_video(self, task: Task, skip_post_ids: set = None):
+        """:param skip_post_ids: Posts that already have footage (e.g. restored from a checkpoint)."""
+        skip_post_ids = skip_post_ids or set()
         for post in task.reddit_datas.get_all_posts():
+            if post.id not in skip_post_ids:
+                self.select_post_video(post)
+        return task  # Logic to select video clips
+
+    def select_post_video(self, post: PostData) -> PostData:
+        segment = self.library.select(self._narration_duration(post))
+        if segment is None:
+            logger.warning(f"Footage library is empty, using the default clip for post {post.id}")
             post.video_file_path = "media/video_store/video_1.mp4"
-        return task  # Logic to select video clips 
\ No newline at end of file
+            post.video_start_offset = 0.0
+            return post
+        post.video_file_path = segment.path
+        post.video_start_offset = segment.start
+        logger.info(f"Post {post.id}: selected footage {segment}")
+        return post
+
+    def _narration_duration(self, post: PostData) -> float:
+        audio_path = post.synthesized_audio_file_path
+        if audio_path and os.path.exists(audio_path):
+            info = mp3.read_info(audio_path)
+            if info.duration > 0:
+                return info.duration
+        return self.fallback_duration
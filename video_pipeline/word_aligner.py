@@ -0,0 +1,146 @@
+import logging
+import re
+import subprocess
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+from utils.units import Transcription, TranscriptionWord
+
+logger = logging.getLogger(__name__)
+
+
+class LocalWordAligner:
+    """
+    Produces word timestamps for a narration we generated ourselves, without Whisper.
+
+    The audio is decoded to mono PCM and split into speech and pauses by frame energy.
+    Each word gets a share of the speech time proportional to its length, so pauses
+    between sentences are skipped over rather than stretched into the neighbouring words.
+    When the audio was voiced in chunks, the chunk boundaries are used as exact anchors.
+    """
+    def __init__(self, sample_rate: int = 16000, frame_seconds: float = 0.01, min_pause_seconds: float = 0.12):
+        """
+        :param sample_rate: Rate the audio is decoded at for analysis.
+        :param frame_seconds: Length of one energy frame.
+        :param min_pause_seconds: Quieter stretches shorter than this are treated as speech (stops, consonants).
+        """
+        self.sample_rate = sample_rate
+        self.frame_seconds = frame_seconds
+        self.min_pause_frames = max(1, int(round(min_pause_seconds / frame_seconds)))
+
+    def align(self, audio_path: str, narration: str, chunk_texts: list[str] = None,
+              chunk_durations: list[float] = None) -> Transcription:
+        samples = self._decode(audio_path)
+        duration = len(samples) / self.sample_rate
+        voiced = self._voiced_frames(samples)
+
+        if chunk_texts and chunk_durations and len(chunk_texts) == len(chunk_durations):
+            spans, offset = [], 0.0
+            for text, chunk_duration in zip(chunk_texts, chunk_durations):
+                spans.append((offset, min(offset + chunk_duration, duration), text))
+                offset += chunk_duration
+        else:
+            spans = [(0.0, duration, narration)]
+
+        words = []
+        for start, end, text in spans:
+            words.extend(self._align_span(voiced, start, end, text))
+        return Transcription(text=narration, duration=duration, words=words)
+
+    def _decode(self, audio_path: str) -> np.ndarray:
+        command = [
+            FFMPEG_BINARY, "-v", "error", "-i", audio_path,
+            "-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate), "-"
+        ]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        return np.frombuffer(result.stdout, dtype=np.float32)
+
+    def _voiced_frames(self, samples: np.ndarray) -> np.ndarray:
+        """Boolean mask over frames, True where speech is present."""
+        frame_size = int(self.sample_rate * self.frame_seconds)
+        frame_count = len(samples) // frame_size
+        if frame_count == 0:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+        energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+        floor, peak = np.percentile(energy_db, 5), np.percentile(energy_db, 99)
+        voiced = energy_db > floor + 0.25 * (peak - floor)
+
+        # Fill quiet runs that are too short to be a real pause
+        edges = np.diff(np.concatenate(([1], voiced.astype(np.int8), [1])))
+        run_starts, run_ends = np.flatnonzero(edges == -1), np.flatnonzero(edges == 1)
+        for run_start, run_end in zip(run_starts, run_ends):
+            if run_end - run_start < self.min_pause_frames:
+                voiced[run_start:run_end] = True
+        return voiced
+
+    def _align_span(self, voiced: np.ndarray, start: float, end: float, text: str) -> list[TranscriptionWord]:
+        raw_tokens = text.split()
+        tokens = [re.sub(r"^[^\w']+|[^\w']+$", "", token) for token in raw_tokens]
+        kept = [i for i, token in enumerate(tokens) if token]
+        if not kept or end <= start:
+            return []
+        tokens = [tokens[i] for i in kept]
+        # 2 = sentence end, 1 = clause end, 0 = no break after the word
+        breaks = [
+            2 if re.search(r"[.!?]['\"]?$", raw_tokens[i]) else 1 if re.search(r"[,;:]['\"]?$", raw_tokens[i]) else 0
+            for i in kept
+        ]
+
+        first_frame = int(start / self.frame_seconds)
+        last_frame = max(first_frame + 1, min(len(voiced), int(np.ceil(end / self.frame_seconds))))
+        frame_times = np.arange(first_frame, last_frame) * self.frame_seconds
+        span_voiced = voiced[first_frame:last_frame] if last_frame <= len(voiced) else np.ones(len(frame_times), bool)
+        if not span_voiced.any():
+            span_voiced = np.ones(len(frame_times), dtype=bool)
+        speech_times = frame_times[span_voiced]
+
+        # Spoken length grows roughly with the number of characters, plus a fixed cost per word
+        weights = np.array([len(token) + 2 for token in tokens], dtype=np.float64)
+        cumulative = np.concatenate(([0.0], np.cumsum(weights)))
+        anchor_weights, anchor_positions = self._pause_anchors(span_voiced, cumulative, breaks)
+        boundaries = np.interp(cumulative, anchor_weights, anchor_positions)
+
+        first = np.minimum(np.floor(boundaries[:-1]).astype(int), len(speech_times) - 1)
+        last = np.minimum(np.maximum(np.ceil(boundaries[1:]).astype(int) - 1, first), len(speech_times) - 1)
+        word_starts = speech_times[first]
+        word_ends = np.minimum(speech_times[last] + self.frame_seconds, end)
+        return [
+            TranscriptionWord(word=token, start=float(word_start), end=float(max(word_end, word_start + self.frame_seconds)))
+            for token, word_start, word_end in zip(tokens, word_starts, word_ends)
+        ]
+
+    def _pause_anchors(self, span_voiced: np.ndarray, cumulative: np.ndarray, breaks: list[int],
+                       tolerance: float = 0.15):
+        """
+        Pin sentence- and clause-ending words to the pauses found in the audio, preferring sentence ends.
+        Returns matching arrays of (cumulative word weight, speech frame position) anchors,
+        which map word weights onto speech frames piecewise-linearly.
+        """
+        total_weight, total_speech = cumulative[-1], int(span_voiced.sum())
+        edges = np.diff(np.concatenate(([1], span_voiced.astype(np.int8), [1])))
+        pause_starts = np.flatnonzero(edges == -1)
+        # Speech frames preceding each interior pause
+        pause_positions = [int(span_voiced[:pause_start].sum()) for pause_start in pause_starts]
+        pause_positions = [position for position in pause_positions if 0 < position < total_speech]
+
+        break_weights = [cumulative[i + 1] for i, strength in enumerate(breaks[:-1]) if strength]
+        # Clause breaks have to be closer to a pause than sentence breaks to claim it
+        break_penalties = [1.0 if strength == 2 else 1.5 for strength in breaks[:-1] if strength]
+        anchor_weights, anchor_positions = [0.0], [0.0]
+        next_break = 0
+        for position in pause_positions:
+            expected = position / total_speech
+            best = None
+            for candidate in range(next_break, len(break_weights)):
+                distance = abs(break_weights[candidate] / total_weight - expected) * break_penalties[candidate]
+                if distance <= tolerance and (best is None or distance < best[1]):
+                    best = (candidate, distance)
+            if best is not None:
+                anchor_weights.append(break_weights[best[0]])
+                anchor_positions.append(float(position))
+                next_break = best[0] + 1
+        anchor_weights.append(total_weight)
+        anchor_positions.append(float(total_speech))
+        return np.array(anchor_weights), np.array(anchor_positions)